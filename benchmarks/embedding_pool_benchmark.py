@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""
+Compare query embedding in the server process with the embedding worker pool.
+
+For each configuration, reports the latency of single queries sent one at a
+time, then the throughput of many queries sent at once from concurrent threads
+(as several sessions would), along with how the pool batched them.
+
+    PYTHONPATH=src python benchmarks/embedding_pool_benchmark.py --workers 1 2 4
+    PYTHONPATH=src python benchmarks/embedding_pool_benchmark.py --embedding-function mpnet-768
+
+hash-768 costs almost nothing to compute, so with it the numbers show the pool's
+overhead; use mpnet-768 (needs sentence-transformers) to see the throughput gain.
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from chroma_mcp.embedding_pool import DEFAULT_EMBEDDING_BATCH_SIZE, EmbeddingWorkerPool
+from chroma_mcp.embeddings import (
+    EMBEDDING_FUNCTION_CHOICES,
+    HASH_768,
+    embedding_function_config,
+    get_embedding_function,
+)
+
+
+def measure(embed, queries, concurrency):
+    """Return (median single-query latency in ms, queries per second under concurrency)."""
+    latencies = []
+    for text in queries[:50]:
+        started = time.perf_counter()
+        embed([text])
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(lambda text: embed([text]), queries))
+    return statistics.median(latencies), len(queries) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4],
+                        help="Pool sizes to try")
+    parser.add_argument("--queries", type=int, default=400,
+                        help="Queries in the concurrent run")
+    parser.add_argument("--concurrency", type=int, default=16,
+                        help="Threads sending queries at once")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_EMBEDDING_BATCH_SIZE)
+    parser.add_argument("--embedding-function", choices=EMBEDDING_FUNCTION_CHOICES,
+                        default=HASH_768)
+    args = parser.parse_args()
+
+    queries = [f"query {index} about the statute of limitations" for index in range(args.queries)]
+    ef_config = embedding_function_config(args.embedding_function)
+
+    embedding_function = get_embedding_function(args.embedding_function)
+    embedding_function(["warm-up"])
+    latency, throughput = measure(embedding_function, queries, args.concurrency)
+    print(f"{'in-process':<12} single p50 {latency:8.2f} ms  "
+          f"concurrent {throughput:9.1f} queries/s")
+
+    for workers in args.workers:
+        pool = EmbeddingWorkerPool(workers, args.batch_size, preload=ef_config)
+        try:
+            pool.warm_up()
+            latency, throughput = measure(
+                pool.embedding_function(ef_config), queries, args.concurrency
+            )
+            stats = pool.stats()
+            print(
+                f"{f'{workers} workers':<12} single p50 {latency:8.2f} ms  "
+                f"concurrent {throughput:9.1f} queries/s  "
+                f"({stats['batches']} batches, {stats['mean_batch_texts']} texts each)"
+            )
+        finally:
+            pool.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
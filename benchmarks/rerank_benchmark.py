@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+"""
+Measure what the rerank stage costs and what it buys.
+
+Builds a synthetic collection in an ephemeral Chroma client: each labeled query
+has one answer chunk containing its phrase, a few distractors sharing some of
+its words, and filler. Every query runs through the server's query path with
+reranking off and with each requested reranker, reporting latency (cold, then
+again with the score cache warm) and hit@1, hit@k and MRR against the labels.
+
+    PYTHONPATH=src python benchmarks/rerank_benchmark.py
+    PYTHONPATH=src python benchmarks/rerank_benchmark.py --rerankers lexical cross-encoder \\
+        --embedding-function mpnet-768 --chunks 5000
+
+hash-768 embeddings ignore meaning, so with them the numbers only show the
+reranker's overhead and lexical gains; use mpnet-768 and cross-encoder (which
+need sentence-transformers and download their models) for quality numbers.
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+
+from chroma_mcp import server
+from chroma_mcp.embeddings import EMBEDDING_FUNCTION_CHOICES, HASH_768
+from chroma_mcp.rerank import RERANKER_CHOICES, RERANKER_NONE
+
+COLLECTION_NAME = "rerank_benchmark"
+
+WORDS = (
+    "court motion statute contract breach damages appeal discovery deposition witness "
+    "exhibit plaintiff defendant counsel hearing order judgment settlement negligence "
+    "liability injunction evidence testimony verdict jury subpoena filing deadline "
+    "jurisdiction venue remedy clause tenant landlord lease warranty fraud estoppel "
+    "indemnity arbitration mediation sanction privilege waiver remand custody probate"
+).split()
+
+
+def build_corpus(chunk_count, query_count, distractors, seed):
+    """Return (ids, documents, metadatas, queries) where queries are (text, answer id)."""
+    rng = random.Random(seed)
+    ids, documents, metadatas, queries = [], [], [], []
+
+    def add(text, source):
+        chunk_id = f"chunk_{len(ids):06d}"
+        ids.append(chunk_id)
+        documents.append(text)
+        metadatas.append({"source": source, "filename": source, "chunk_index": len(ids)})
+        return chunk_id
+
+    def filler(length):
+        return " ".join(rng.choice(WORDS) for _ in range(length))
+
+    for query_idx in range(query_count):
+        phrase = [f"term{query_idx:04d}{letter}" for letter in "abcd"]
+        answer = add(f"{filler(20)} {' '.join(phrase)} {filler(20)}", f"q{query_idx}.pdf")
+        for _ in range(distractors):
+            partial = rng.sample(phrase, 2) + [rng.choice(WORDS) for _ in range(2)]
+            rng.shuffle(partial)
+            add(f"{filler(15)} {' '.join(partial)} {filler(25)}", f"q{query_idx}.pdf")
+        queries.append((" ".join(phrase), answer))
+
+    while len(ids) < chunk_count:
+        add(filler(45), f"filler{len(ids) % 50}.pdf")
+    return ids, documents, metadatas, queries
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run(queries, n_results, rerank):
+    """Run every query once; return latencies in ms and the 1-based rank of each answer."""
+    latencies, ranks = [], []
+    for text, answer in queries:
+        started = time.perf_counter()
+        results = server._query_documents(
+            COLLECTION_NAME, [text], n_results, None, None, ["distances"], rerank=rerank
+        )
+        latencies.append((time.perf_counter() - started) * 1000)
+        hits = results["ids"][0]
+        ranks.append(hits.index(answer) + 1 if answer in hits else None)
+    return latencies, ranks
+
+
+def report(label, latencies, ranks):
+    hit1 = sum(1 for rank in ranks if rank == 1) / len(ranks)
+    hitk = sum(1 for rank in ranks if rank) / len(ranks)
+    mrr = sum(1 / rank for rank in ranks if rank) / len(ranks)
+    print(
+        f"{label:<28} p50 {statistics.median(latencies):8.2f} ms  "
+        f"p95 {percentile(latencies, 0.95):8.2f} ms  "
+        f"hit@1 {hit1:.3f}  hit@k {hitk:.3f}  MRR {mrr:.3f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--chunks", type=int, default=2000,
+                        help="Chunks in the synthetic collection")
+    parser.add_argument("--queries", type=int, default=100, help="Labeled queries")
+    parser.add_argument("--distractors", type=int, default=4, help="Near-miss chunks per query")
+    parser.add_argument("--n-results", type=int, default=5, help="k for hit@k")
+    parser.add_argument("--rerankers", nargs="+", default=["lexical"],
+                        choices=[name for name in RERANKER_CHOICES if name != RERANKER_NONE])
+    parser.add_argument("--reranker-model", help="Model for the cross-encoder reranker")
+    parser.add_argument("--embedding-function", choices=EMBEDDING_FUNCTION_CHOICES,
+                        default=HASH_768)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    server.get_chroma_client(server.create_parser().parse_args(
+        ["--client-type", "ephemeral", "--embedding-function", args.embedding_function]
+    ))
+    ids, documents, metadatas, queries = build_corpus(
+        args.chunks, args.queries, args.distractors, args.seed
+    )
+
+    server._create_collection(COLLECTION_NAME, None, "cosine")
+    collection = server.get_collection(COLLECTION_NAME)
+    started = time.perf_counter()
+    for i in range(0, len(ids), 500):
+        collection.add(
+            ids=ids[i:i + 500], documents=documents[i:i + 500], metadatas=metadatas[i:i + 500]
+        )
+    print(f"Indexed {len(ids):,} chunks in {time.perf_counter() - started:.2f}s "
+          f"({args.embedding_function}); {len(queries)} queries, k={args.n_results}")
+
+    # Warm the embedding model and query caches so every row times the same work
+    server._query_result_cache.resize(0)
+    run(queries, args.n_results, rerank=False)
+    report("vector only", *run(queries, args.n_results, rerank=False))
+
+    for name in args.rerankers:
+        server.configure_reranker(name, args.reranker_model)
+        started = time.perf_counter()
+        server._reranker.load()
+        print(f"{name} loaded in {time.perf_counter() - started:.2f}s")
+        report(f"{name} (cold scores)", *run(queries, args.n_results, rerank=True))
+        report(f"{name} (cached scores)", *run(queries, args.n_results, rerank=True))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,5 @@
 #!/Users/brain/work/gits/parabeagle/.venv/bin/python
 
-import chromadb
 import sys
 import os
 import uuid
@@ -9,8 +8,17 @@ import re
 
 from common import (
     get_active_directory,
+    get_persistent_client,
+    bump_collection_generation,
+    index_chunks,
+    record_document_chunks,
+    list_collection_documents,
+    add_embedding_function_argument,
+    add_profile_argument,
+    profile_run,
+    select_embedding_function,
     calculate_sha256,
-    extract_text_from_pdf,
+    extract_pdf_pages,
     Logger,
 )
 
@@ -153,7 +161,7 @@ def add_pdfs_to_collection(data_dir, collection_name, pdf_paths, max_chunk_size=
     start_time = time.time()
 
     try:
-        client = chromadb.PersistentClient(path=data_dir)
+        client = get_persistent_client(data_dir)
 
         # Get or create the collection
         try:
@@ -161,7 +169,7 @@ def add_pdfs_to_collection(data_dir, collection_name, pdf_paths, max_chunk_size=
             if verbose:
                 log(f"Using existing collection '{collection_name}'")
         except Exception:
-            # Use mpnet-768 embedding function from common
+            # Use the selected embedding function from common (mpnet-768 by default)
             embedding_function = get_embedding_function()
             configuration = CreateCollectionConfiguration(embedding_function=embedding_function)
             collection = client.create_collection(
@@ -176,13 +184,12 @@ def add_pdfs_to_collection(data_dir, collection_name, pdf_paths, max_chunk_size=
         metadatas = []
         ids = []
 
-        # Get existing hashes from collection to detect duplicates
+        # Get existing hashes from the document manifest to detect duplicates
         existing_hashes = set()
         if collection.count() > 0:
-            all_docs = collection.get(include=['metadatas'])
-            for metadata in all_docs['metadatas']:
-                if metadata and 'sha256' in metadata:
-                    existing_hashes.add(metadata['sha256'])
+            for document in list_collection_documents(data_dir, collection):
+                if document['sha256']:
+                    existing_hashes.add(document['sha256'])
 
         for pdf_path in pdf_paths:
             # Always use absolute path
@@ -207,7 +214,7 @@ def add_pdfs_to_collection(data_dir, collection_name, pdf_paths, max_chunk_size=
                     log(pdf_path)
                 continue
 
-            text = extract_text_from_pdf(pdf_path)
+            text, page_count = extract_pdf_pages(pdf_path)
 
             if not text:
                 log(f"error: {pdf_path}")
@@ -238,7 +245,8 @@ def add_pdfs_to_collection(data_dir, collection_name, pdf_paths, max_chunk_size=
                     "total_chunks": len(chunks),
                     "chunk_type": "semantic",
                     "char_count": len(chunk),
-                    "sha256": pdf_hash
+                    "sha256": pdf_hash,
+                    "page_count": page_count
                 })
                 ids.append(f"{pdf_name}_semantic_chunk_{i}_{str(uuid.uuid4())[:8]}")
 
@@ -252,19 +260,27 @@ def add_pdfs_to_collection(data_dir, collection_name, pdf_paths, max_chunk_size=
         batch_size = 100
         total_added = 0
 
-        for i in range(0, len(documents), batch_size):
-            batch_docs = documents[i:i+batch_size]
-            batch_metas = metadatas[i:i+batch_size]
-            batch_ids = ids[i:i+batch_size]
-
-            collection.add(
-                documents=batch_docs,
-                metadatas=batch_metas,
-                ids=batch_ids
+        try:
+            for i in range(0, len(documents), batch_size):
+                batch_docs = documents[i:i+batch_size]
+                batch_metas = metadatas[i:i+batch_size]
+                batch_ids = ids[i:i+batch_size]
+
+                collection.add(
+                    documents=batch_docs,
+                    metadatas=batch_metas,
+                    ids=batch_ids
+                )
+                index_chunks(data_dir, str(collection.id), batch_ids, batch_docs)
+                record_document_chunks(data_dir, str(collection.id), batch_ids, batch_metas)
+                total_added += len(batch_docs)
+                if verbose:
+                    log(f"  Added batch {i//batch_size + 1}: {total_added}/{len(documents)} chunks")
+        finally:
+            # Invalidate a running MCP server's cached results, even after a partial add
+            bump_collection_generation(
+                data_dir, str(collection.id), indexed=total_added == len(documents)
             )
-            total_added += len(batch_docs)
-            if verbose:
-                log(f"  Added batch {i//batch_size + 1}: {total_added}/{len(documents)} chunks")
 
         elapsed_time = time.time() - start_time
         if verbose:
@@ -310,7 +326,11 @@ Examples:
     parser.add_argument("--verbose", "-v", action="store_true",
                        help="Show detailed progress including chunk counts, batch progress, and execution time")
 
+    add_embedding_function_argument(parser)
+    add_profile_argument(parser)
+
     args = parser.parse_args()
+    select_embedding_function(args.embedding_function)
 
     # Try to get active directory first, fall back to provided/env directory
     data_dir = args.data_dir
@@ -356,7 +376,7 @@ Examples:
 
     # Use context manager for logger
     log_path = os.path.join(os.getcwd(), "parabeagle.log")
-    with Logger(log_path) as logger:
+    with Logger(log_path) as logger, profile_run("addpdf", args.profile):
         exit_code = add_pdfs_to_collection(
             data_dir,
             collection_name,
@@ -1,18 +1,21 @@
 #!/Users/brain/work/gits/parabeagle/.venv/bin/python
 
-import chromadb
 import sys
 import os
-from pathlib import Path
-from collections import defaultdict
 
-from common import get_active_directory
+from common import (
+    get_active_directory,
+    get_persistent_client,
+    list_collection_documents,
+    add_embedding_function_argument,
+    select_embedding_function,
+)
 
 
 def list_files_in_collection(data_dir, collection_name, names_only=False):
     """List all original files in a collection."""
     try:
-        client = chromadb.PersistentClient(path=data_dir)
+        client = get_persistent_client(data_dir)
         
         # Get the collection
         try:
@@ -25,43 +28,19 @@ def list_files_in_collection(data_dir, collection_name, names_only=False):
             print(f"Collection '{collection_name}' is empty.")
             return 0
         
-        # Get all documents with metadata
-        results = collection.get(include=['metadatas'])
-        metadatas = results['metadatas']
-        
-        if not metadatas:
-            print(f"No metadata found in collection '{collection_name}'.")
-            return 0
-        
-        # Collect file information
-        files = {}  # source_path -> {filename, chunk_count, total_size}
-        
-        for metadata in metadatas:
-            if metadata and 'source' in metadata:
-                source = metadata['source']
-                filename = metadata.get('filename', Path(source).name)
-                char_count = metadata.get('char_count', 0)
-                
-                if source not in files:
-                    files[source] = {
-                        'filename': filename,
-                        'chunk_count': 0,
-                        'total_chars': 0
-                    }
-                
-                files[source]['chunk_count'] += 1
-                files[source]['total_chars'] += char_count
+        # Read the file list from the document manifest
+        files = list_collection_documents(data_dir, collection)
         
         if not files:
             print(f"No source files found in collection '{collection_name}'.")
             return 0
         
         # Display results - clean output for Unix chains
-        for source_path, info in sorted(files.items()):
+        for info in files:
             if names_only:
                 print(info['filename'])
             else:
-                print(source_path)
+                print(info['source'])
         
         return 0
         
@@ -96,7 +75,10 @@ Examples:
     parser.add_argument("-n", "--names-only", action="store_true",
                        help="Show only filenames, not full paths")
     
+    add_embedding_function_argument(parser)
+
     args = parser.parse_args()
+    select_embedding_function(args.embedding_function)
     
     # Try to get active directory first, fall back to provided/env directory
     data_dir = args.data_dir
@@ -7,13 +7,16 @@ This module provides common functionality used across multiple CLI tools:
 - Logging utilities
 - SHA256 hashing for duplicate detection
 - PDF text extraction
-- Embedding function configuration
+- Embedding function configuration and Chroma client creation
+
+chromadb and the embedding models are imported inside the functions that need
+them, so tools that only read SQLite start in milliseconds.
 """
 
 import os
 import sqlite3
 import hashlib
-from typing import Optional
+from typing import Optional, Tuple
 
 # Database filename used across all tools
 DB_FILENAME = 'chroma_directories.sqlite3'
@@ -223,6 +226,19 @@ def extract_text_from_pdf(pdf_path: str) -> Optional[str]:
     Returns:
         Extracted text, or None if extraction failed
     """
+    text, _ = extract_pdf_pages(pdf_path)
+    return text
+
+
+def extract_pdf_pages(pdf_path: str) -> Tuple[Optional[str], int]:
+    """Extract text from a PDF file using pypdf, along with its page count.
+
+    Args:
+        pdf_path: Path to the PDF file
+
+    Returns:
+        Tuple of (extracted text or None if extraction failed, page count)
+    """
     try:
         import pypdf
         with open(pdf_path, 'rb') as file:
@@ -230,26 +246,220 @@ def extract_text_from_pdf(pdf_path: str) -> Optional[str]:
             text = ""
             for page in reader.pages:
                 text += page.extract_text() + "\n"
-        return text.strip()
+        return text.strip(), len(reader.pages)
     except ImportError:
         print("pypdf not installed. Install with: pip install pypdf")
-        return None
+        return None, 0
     except Exception:
         # Return None to signal error, let caller handle printing
-        return None
+        return None, 0
 
 
 # =============================================================================
 # Embedding Functions
 # =============================================================================
 
+def add_profile_argument(parser) -> None:
+    """Add the --profile option for writing cProfile output.
+
+    Args:
+        parser: argparse.ArgumentParser to extend
+    """
+    from chroma_mcp.profiling import PROFILE_ENV
+    parser.add_argument("--profile", metavar="DIR",
+                       default=os.getenv(PROFILE_ENV),
+                       help="Profile this run with cProfile, writing a .prof file and "
+                            "a top-functions summary to DIR (default: PARABEAGLE_PROFILE)")
+
+
+def profile_run(label: str, profile_dir: Optional[str]):
+    """Context manager that profiles the enclosed block when profile_dir is set.
+
+    Args:
+        label: Tool name used in the output file names
+        profile_dir: Value of --profile
+    """
+    from chroma_mcp.profiling import profile_directory, profiled
+    return profiled(label, profile_directory(profile_dir) if profile_dir else None)
+
+
+def add_embedding_function_argument(parser) -> None:
+    """Add the --embedding-function option shared by all CLI tools.
+
+    Args:
+        parser: argparse.ArgumentParser to extend
+    """
+    from chroma_mcp.embeddings import (
+        EMBEDDING_FUNCTION_CHOICES,
+        EMBEDDING_FUNCTION_ENV,
+        MPNET_768,
+    )
+    parser.add_argument("--embedding-function",
+                       choices=EMBEDDING_FUNCTION_CHOICES,
+                       default=os.getenv(EMBEDDING_FUNCTION_ENV, MPNET_768),
+                       help="Embedding function for new collections "
+                            "(default: PARABEAGLE_EMBEDDING_FUNCTION or mpnet-768; "
+                            "hash-768 is a fast deterministic stub for tests)")
+
+
+def select_embedding_function(name: Optional[str]) -> None:
+    """Select the embedding function used for collections created by this process.
+
+    Args:
+        name: Embedding function name from --embedding-function
+    """
+    from chroma_mcp.embeddings import select_embedding_function as _select
+    _select(name)
+
+
+def get_embedding_function_name() -> str:
+    """Get the name of the selected embedding function (mpnet-768 or hash-768)."""
+    from chroma_mcp.embeddings import get_embedding_function_name as _get_name
+    return _get_name()
+
+
 def get_embedding_function():
-    """Get the mpnet-768 embedding function.
+    """Get the selected embedding function (mpnet-768 by default).
 
     Returns:
-        SentenceTransformerEmbeddingFunction configured with all-mpnet-base-v2
+        SentenceTransformerEmbeddingFunction configured with all-mpnet-base-v2,
+        or the deterministic hash-768 stub when selected
     """
-    from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
-    return SentenceTransformerEmbeddingFunction(
-        model_name="sentence-transformers/all-mpnet-base-v2"
-    )
+    from chroma_mcp.embeddings import get_embedding_function as _get
+    return _get()
+
+
+def get_persistent_client(data_dir: str):
+    """Open a Chroma PersistentClient with Parabeagle's embedding functions registered.
+
+    Collections remember which embedding function created them, so the hash-768
+    stub has to be registered before a collection using it can be opened.
+
+    Args:
+        data_dir: Chroma data directory
+
+    Returns:
+        chromadb.PersistentClient for data_dir
+    """
+    import chromadb
+
+    from chroma_mcp.embeddings import register_embedding_functions
+    register_embedding_functions()
+    return chromadb.PersistentClient(path=data_dir)
+
+
+def bump_collection_generation(data_dir: str, collection_id: str, indexed: bool = False) -> None:
+    """Record a write to a collection in the sidecar database.
+
+    The MCP server keys its query result cache on this generation, so bumping it
+    after an ingest or delete keeps a running server from serving stale results.
+
+    Args:
+        data_dir: Chroma data directory
+        collection_id: Collection UUID (str(collection.id))
+        indexed: Every chunk written was also added to the full-text index, so the
+            server doesn't need to rebuild it
+    """
+    from chroma_mcp import sidecar
+    sidecar.bump_generation(data_dir, collection_id, indexed=indexed)
+
+
+def index_chunks(data_dir: str, collection_id: str, ids: list, documents: list) -> None:
+    """Add chunk text to the sidecar's full-text index used by hybrid queries.
+
+    Args:
+        data_dir: Chroma data directory
+        collection_id: Collection UUID (str(collection.id))
+        ids: Chunk IDs as added to Chroma
+        documents: Chunk text, parallel to ids
+    """
+    from chroma_mcp import sidecar
+    sidecar.index_chunks(data_dir, collection_id, ids, documents)
+
+
+def record_document_chunks(data_dir: str, collection_id: str, ids: list, metadatas: list) -> None:
+    """Add chunks to the sidecar's document manifest (grouped by their "source" metadata).
+
+    Args:
+        data_dir: Chroma data directory
+        collection_id: Collection UUID (str(collection.id))
+        ids: Chunk IDs as added to Chroma
+        metadatas: Chunk metadata, parallel to ids
+    """
+    from chroma_mcp import sidecar
+    sidecar.record_chunks(data_dir, collection_id, ids, metadatas)
+
+
+def list_collection_documents(data_dir: str, collection, source: Optional[str] = None,
+                              sha256: Optional[str] = None) -> list:
+    """List the source files in a collection from the sidecar's document manifest.
+
+    The manifest is rebuilt first if it is missing or out of date.
+
+    Args:
+        data_dir: Chroma data directory
+        collection: chromadb Collection
+        source: Only the document with this source path
+        sha256: Only documents with this file hash
+
+    Returns:
+        List of dicts with source, filename, sha256, chunk_count, total_chars,
+        page_count and ingested_at, sorted by source
+    """
+    from chroma_mcp import sidecar
+    sidecar.ensure_manifest(data_dir, collection)
+    return sidecar.list_documents(data_dir, str(collection.id), source=source, sha256=sha256)
+
+
+def get_document_chunk_ids(data_dir: str, collection, source: str) -> list:
+    """Get the chunk IDs of one source file, in chunk order, from the document manifest."""
+    from chroma_mcp import sidecar
+    sidecar.ensure_manifest(data_dir, collection)
+    return sidecar.document_chunk_ids(data_dir, str(collection.id), source)
+
+
+def remove_indexed_chunks(data_dir: str, collection_id: str, ids: list) -> None:
+    """Remove deleted chunks from the sidecar's full-text index and document manifest."""
+    from chroma_mcp import sidecar
+    sidecar.remove_chunks(data_dir, collection_id, ids)
+
+
+def drop_collection_index(data_dir: str, collection_id: str) -> None:
+    """Remove everything the sidecar indexed for a deleted collection."""
+    from chroma_mcp import sidecar
+    sidecar.drop_collection(data_dir, collection_id)
+
+
+def read_collection_counts(data_dir: str) -> Optional[list]:
+    """Read collection names and document counts straight from chroma.sqlite3.
+
+    This avoids importing chromadb for metadata-only commands. Chroma's SQLite
+    metadata segment is written synchronously, so the counts match collection.count().
+
+    Args:
+        data_dir: Chroma data directory
+
+    Returns:
+        List of (name, count) tuples sorted by name, or None if the database is
+        missing or its schema is not the one expected (callers fall back to chromadb)
+    """
+    db_path = os.path.join(data_dir, "chroma.sqlite3")
+    if not os.path.exists(db_path):
+        return None
+
+    try:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT c.name,
+                       (SELECT COUNT(*) FROM embeddings e WHERE e.segment_id = s.id)
+                FROM collections c
+                JOIN segments s ON s.collection = c.id AND s.scope = 'METADATA'
+                ORDER BY c.name
+            ''')
+            return [(row[0], row[1]) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
@@ -1,27 +1,36 @@
 #!/Users/brain/work/gits/parabeagle/.venv/bin/python
 
-import chromadb
 import sys
 import os
 
-from common import get_directory_by_name, resolve_data_directory
+from common import (
+    get_directory_by_name,
+    resolve_data_directory,
+    get_persistent_client,
+    read_collection_counts,
+    add_embedding_function_argument,
+    select_embedding_function,
+)
 
 
 def list_collections(data_dir):
     """List all collections in the specified Chroma data directory."""
     try:
-        client = chromadb.PersistentClient(path=data_dir)
-        collections = client.list_collections()
-        
-        if not collections:
+        # Read names and counts from SQLite directly; only load chromadb if that fails
+        counts = read_collection_counts(data_dir)
+        if counts is None:
+            client = get_persistent_client(data_dir)
+            counts = [(collection.name, collection.count())
+                      for collection in client.list_collections()]
+
+        if not counts:
             print("No collections found in the database.")
             return
-        
-        print(f"Found {len(collections)} collection(s):")
-        for collection in collections:
-            count = collection.count()
-            print(f"  - {collection.name} ({count} documents)")
-            
+
+        print(f"Found {len(counts)} collection(s):")
+        for name, count in counts:
+            print(f"  - {name} ({count} documents)")
+
     except Exception as e:
         print(f"Error accessing Chroma database: {e}")
         return 1
@@ -53,7 +62,10 @@ Examples:
     parser.add_argument("-n", "--directory-name",
                        help="Name of a specific directory to use (overrides active directory)")
 
+    add_embedding_function_argument(parser)
+
     args = parser.parse_args()
+    select_embedding_function(args.embedding_function)
 
     # Resolve the data directory
     data_dir = resolve_data_directory(args.data_dir, args.directory_name)
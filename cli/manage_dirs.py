@@ -7,7 +7,6 @@ import argparse
 import re
 import shutil
 from pathlib import Path
-import chromadb
 
 def get_directory_db_path(base_dir: str) -> str:
     """Get the path to the directory management database."""
@@ -96,7 +95,9 @@ def add_directory(db_path: str, name: str, base_data_dir: str = None):
     # Initialize ChromaDB in the new directory
     print(f"Initializing ChromaDB in {full_path}...")
     try:
-        # Create a PersistentClient to initialize the ChromaDB database
+        # Create a PersistentClient to initialize the ChromaDB database; chromadb is
+        # imported here so listing and switching directories stays fast
+        import chromadb
         client = chromadb.PersistentClient(path=full_path)
         # Verify initialization by checking the heartbeat
         client.heartbeat()
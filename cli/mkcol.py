@@ -1,17 +1,22 @@
 #!/Users/brain/work/gits/parabeagle/.venv/bin/python
 
-import chromadb
 import sys
 import os
-from chromadb.api.collection_configuration import CreateCollectionConfiguration
 
-from common import get_embedding_function, resolve_data_directory
+from common import (
+    get_embedding_function,
+    get_embedding_function_name,
+    resolve_data_directory,
+    get_persistent_client,
+    add_embedding_function_argument,
+    select_embedding_function,
+)
 
 
 def add_collection(data_dir, collection_name):
     """Create a new collection in the specified Chroma data directory."""
     try:
-        client = chromadb.PersistentClient(path=data_dir)
+        client = get_persistent_client(data_dir)
         
         # Check if collection already exists
         try:
@@ -22,7 +27,8 @@ def add_collection(data_dir, collection_name):
             # Collection doesn't exist, which is what we want
             pass
         
-        # Create collection with mpnet-768 embedding function and cosine distance
+        # Create collection with the selected embedding function and cosine distance
+        from chromadb.api.collection_configuration import CreateCollectionConfiguration
         embedding_function = get_embedding_function()
         configuration = CreateCollectionConfiguration(embedding_function=embedding_function)
         collection = client.create_collection(
@@ -31,7 +37,8 @@ def add_collection(data_dir, collection_name):
             metadata={'hnsw:space': 'cosine'}
         )
         
-        print(f"Successfully created collection '{collection_name}' with mpnet-768 embeddings")
+        print(f"Successfully created collection '{collection_name}' "
+              f"with {get_embedding_function_name()} embeddings")
         return 0
             
     except Exception as e:
@@ -66,7 +73,10 @@ Examples:
     parser.add_argument("-n", "--directory-name",
                        help="Name of a specific directory to use (overrides active directory)")
 
+    add_embedding_function_argument(parser)
+
     args = parser.parse_args()
+    select_embedding_function(args.embedding_function)
 
     # Resolve the data directory
     data_dir = resolve_data_directory(args.data_dir, args.directory_name)
@@ -0,0 +1,100 @@
+#!/Users/brain/work/gits/parabeagle/.venv/bin/python
+
+import os
+import sys
+import time
+
+from common import (
+    add_embedding_function_argument,
+    get_persistent_client,
+    resolve_data_directory,
+    select_embedding_function,
+)
+
+
+def reindex_collections(data_dir, collection_names=None):
+    """Rebuild the sidecar indexes and document manifests for collections.
+
+    addpdf.py and the MCP server keep them current as they write. This backfills
+    collections created before they existed, or repairs them after the collection
+    was written to by other means.
+    """
+    from chroma_mcp import sidecar
+
+    try:
+        client = get_persistent_client(data_dir)
+        available = [collection.name for collection in client.list_collections()]
+
+        if collection_names:
+            missing = [name for name in collection_names if name not in available]
+            if missing:
+                print(f"Error: Collection(s) not found: {', '.join(missing)}")
+                return 1
+        else:
+            collection_names = available
+
+        if not collection_names:
+            print("No collections found in the database.")
+            return 0
+
+        for name in collection_names:
+            start_time = time.time()
+            collection = client.get_collection(name)
+            count = sidecar.rebuild_collection(data_dir, collection)
+            sidecar.bump_generation(data_dir, str(collection.id), indexed=True)
+            print(f"  - {name}: indexed {count:,} chunks in {time.time() - start_time:.2f}s")
+
+        return 0
+
+    except Exception as e:
+        print(f"Error rebuilding indexes: {e}")
+        return 1
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Rebuild Parabeagle's full-text indexes and document manifests "
+                    "for Chroma collections",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Rebuild indexes for every collection in the active directory
+  python reindex.py
+
+  # Rebuild one collection
+  python reindex.py -c MyDocs
+
+  # Rebuild collections in a specific directory by name
+  python reindex.py -n case-2024-001 -c MyDocs OtherDocs
+        """
+    )
+
+    parser.add_argument("-d", "--data-dir", "--data-directory",
+                       default=os.getenv('CHROMADIR'),
+                       help="Directory for Chroma database storage "
+                            "(default: CHROMADIR environment variable)")
+    parser.add_argument("-c", "--collection-name", nargs="+",
+                       help="Collection(s) to reindex (default: all collections)")
+    parser.add_argument("-n", "--directory-name",
+                       help="Name of a specific directory to use (overrides active directory)")
+
+    add_embedding_function_argument(parser)
+
+    args = parser.parse_args()
+    select_embedding_function(args.embedding_function)
+
+    # Resolve the data directory
+    data_dir = resolve_data_directory(args.data_dir, args.directory_name)
+
+    if args.directory_name and not data_dir:
+        print(f"Error: Directory '{args.directory_name}' not found")
+        sys.exit(1)
+
+    if not data_dir:
+        print("Error: Data directory must be provided via --data-dir flag "
+              "or CHROMADIR environment variable")
+        sys.exit(1)
+
+    exit_code = reindex_collections(data_dir, args.collection_name)
+    sys.exit(exit_code)
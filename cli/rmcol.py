@@ -1,17 +1,23 @@
 #!/Users/brain/work/gits/parabeagle/.venv/bin/python
 
-import chromadb
 import sys
 import os
 from pathlib import Path
 
-from common import resolve_data_directory
+from common import (
+    resolve_data_directory,
+    get_persistent_client,
+    bump_collection_generation,
+    drop_collection_index,
+    add_embedding_function_argument,
+    select_embedding_function,
+)
 
 
 def delete_collection(data_dir, collection_name, confirm=False):
     """Delete a collection from the Chroma database."""
     try:
-        client = chromadb.PersistentClient(path=data_dir)
+        client = get_persistent_client(data_dir)
         
         # Check if collection exists
         try:
@@ -34,6 +40,8 @@ def delete_collection(data_dir, collection_name, confirm=False):
         
         # Delete the collection
         client.delete_collection(collection_name)
+        bump_collection_generation(data_dir, str(collection.id))
+        drop_collection_index(data_dir, str(collection.id))
         print(f"Collection '{collection_name}' has been deleted successfully.")
         return 0
         
@@ -44,7 +52,7 @@ def delete_collection(data_dir, collection_name, confirm=False):
 def list_all_collections(data_dir):
     """List all collections for reference."""
     try:
-        client = chromadb.PersistentClient(path=data_dir)
+        client = get_persistent_client(data_dir)
         collections = client.list_collections()
         
         if not collections:
@@ -99,7 +107,10 @@ Examples:
     parser.add_argument("-n", "--directory-name",
                        help="Name of a specific directory to use (overrides active directory)")
 
+    add_embedding_function_argument(parser)
+
     args = parser.parse_args()
+    select_embedding_function(args.embedding_function)
 
     # Resolve the data directory
     data_dir = resolve_data_directory(args.data_dir, args.directory_name)
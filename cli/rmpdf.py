@@ -1,18 +1,102 @@
 #!/Users/brain/work/gits/parabeagle/.venv/bin/python
 
-import chromadb
 import sys
 import os
-from pathlib import Path
+import re
+import glob
+from pathlib import PurePath
 
-from common import get_active_directory, Logger
+from common import (
+    get_active_directory,
+    get_persistent_client,
+    bump_collection_generation,
+    remove_indexed_chunks,
+    list_collection_documents,
+    get_document_chunk_ids,
+    add_embedding_function_argument,
+    add_profile_argument,
+    profile_run,
+    select_embedding_function,
+    Logger,
+)
+
+# Chunks deleted per collection.delete call
+DELETE_BATCH_SIZE = 500
+
+_SHA256_RE = re.compile(r"^[0-9a-fA-F]{64}$")
 
 # Global logger
 _logger = None
 
 
-def remove_pdf_from_collection(data_dir, collection_name, pdf_path, dry_run=False, logger=None):
-    """Remove all documents from a PDF file from a Chroma collection."""
+def read_target_file(list_path):
+    """Read PDF paths, globs or sha256 values from a file, one per line.
+
+    Blank lines and lines starting with # are ignored.
+    """
+    with open(list_path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+
+
+def match_documents(documents, targets, sha256_values=()):
+    """Match manifest documents against paths, globs and sha256 values.
+
+    A target that is a 64-character hex string and not an existing path is taken
+    as a sha256; one containing *, ? or [ is a glob over absolute source paths,
+    matched one path segment at a time, so * never crosses a directory.
+
+    Args:
+        documents: Documents from the collection's manifest
+        targets: Paths, globs or sha256 values
+        sha256_values: Additional sha256 values
+
+    Returns:
+        Tuple of (matched documents in source order, targets that matched nothing)
+    """
+    by_source = {os.path.abspath(document['source']): document for document in documents}
+    by_hash = {}
+    for document in documents:
+        if document['sha256']:
+            by_hash.setdefault(document['sha256'].lower(), []).append(document)
+
+    lookups = [("sha256", value) for value in sha256_values]
+    for target in targets:
+        if _SHA256_RE.match(target) and not os.path.exists(target):
+            lookups.append(("sha256", target))
+        elif glob.has_magic(target):
+            lookups.append(("glob", target))
+        else:
+            lookups.append(("path", target))
+
+    matched = {}
+    unmatched = []
+    for kind, value in lookups:
+        if kind == "sha256":
+            hits = by_hash.get(value.lower(), [])
+        elif kind == "glob":
+            pattern = os.path.abspath(value)
+            hits = [document for source, document in by_source.items()
+                    if PurePath(source).match(pattern)]
+        else:
+            document = by_source.get(os.path.abspath(value))
+            hits = [document] if document else []
+
+        if not hits:
+            unmatched.append(value)
+        for document in hits:
+            matched[document['source']] = document
+
+    return [matched[source] for source in sorted(matched)], unmatched
+
+
+def remove_pdfs_from_collection(data_dir, collection_name, targets, sha256_values=(),
+                                dry_run=False, logger=None):
+    """Remove all documents from the given PDF files from a Chroma collection.
+
+    Files are found in the collection's document manifest by path, glob or sha256,
+    so they don't have to exist on disk any more, and their chunks are deleted in
+    batches of DELETE_BATCH_SIZE.
+    """
     def log(msg):
         if logger:
             logger.log(msg)
@@ -20,7 +104,7 @@ def remove_pdf_from_collection(data_dir, collection_name, pdf_path, dry_run=Fals
             print(msg)
 
     try:
-        client = chromadb.PersistentClient(path=data_dir)
+        client = get_persistent_client(data_dir)
 
         # Get the collection
         try:
@@ -33,64 +117,84 @@ def remove_pdf_from_collection(data_dir, collection_name, pdf_path, dry_run=Fals
             log(f"Collection '{collection_name}' is empty.")
             return 0
 
-        # Get absolute path for consistent matching
-        pdf_path = os.path.abspath(pdf_path)
-        pdf_name = Path(pdf_path).name
-
-        log(f"Looking for documents from: {pdf_path}")
+        documents = list_collection_documents(data_dir, collection)
+        matched, unmatched = match_documents(documents, targets, sha256_values)
 
-        # Get all documents with metadata to find matches
-        all_docs = collection.get(include=['metadatas'])
-        metadatas = all_docs['metadatas']
-        ids = all_docs['ids']
+        for target in unmatched:
+            log(f"No chunks found for {target} in collection '{collection_name}'")
 
-        # Find IDs that match this PDF
-        matching_ids = []
-        for i, metadata in enumerate(metadatas):
-            if metadata and 'source' in metadata:
-                doc_source = os.path.abspath(metadata['source'])
-                if doc_source == pdf_path:
-                    matching_ids.append(ids[i])
-
-        if not matching_ids:
-            log(f"No chunks found from {pdf_name} in collection '{collection_name}'")
+        if not matched:
             return 0
 
-        log(f"Found {len(matching_ids)} chunks from {pdf_name}")
+        # Find the chunk IDs of every matched PDF in the document manifest
+        matching_ids = []
+        for document in matched:
+            chunk_ids = get_document_chunk_ids(data_dir, collection, document['source'])
+            log(f"Found {len(chunk_ids)} chunks from {document['filename']}")
+            matching_ids.extend(chunk_ids)
 
         if dry_run:
             log("DRY RUN - would delete:")
             for doc_id in matching_ids:
                 log(f"  - {doc_id}")
-            log(f"Total: {len(matching_ids)} chunks from 1 file")
+            log(f"Total: {len(matching_ids)} chunks from {len(matched)} file(s)")
             return 0
 
-        # Delete the matching documents
-        collection.delete(ids=matching_ids)
+        # Delete the matching documents in batches
+        deleted = 0
+        try:
+            for i in range(0, len(matching_ids), DELETE_BATCH_SIZE):
+                batch_ids = matching_ids[i:i+DELETE_BATCH_SIZE]
+                collection.delete(ids=batch_ids)
+                remove_indexed_chunks(data_dir, str(collection.id), batch_ids)
+                deleted += len(batch_ids)
+        finally:
+            # Each batch was also removed from the text index, which stays current
+            # unless a delete failed part way
+            bump_collection_generation(
+                data_dir, str(collection.id), indexed=deleted == len(matching_ids)
+            )
 
-        log(f"Successfully deleted {len(matching_ids)} chunks from 1 file in collection '{collection_name}'")
+        log(f"Successfully deleted {deleted} chunks from {len(matched)} file(s) "
+            f"in collection '{collection_name}'")
         return 0
 
     except Exception as e:
         log(f"Error removing PDF from collection: {e}")
         return 1
 
+
+def remove_pdf_from_collection(data_dir, collection_name, pdf_path, dry_run=False, logger=None):
+    """Remove all documents from a PDF file from a Chroma collection."""
+    return remove_pdfs_from_collection(data_dir, collection_name, [pdf_path],
+                                       dry_run=dry_run, logger=logger)
+
 if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser(
-        description="Remove all documents from a PDF file from a Chroma collection",
+        description="Remove all documents from PDF files from a Chroma collection",
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
 Examples:
   # Remove documents from a PDF
-  python remove_pdf_from_collection.py -c MyDocs document.pdf
+  python rmpdf.py -c MyDocs document.pdf
+
+  # Remove several PDFs, or every PDF under a directory (quote globs)
+  python rmpdf.py -c MyDocs one.pdf two.pdf '/cases/exhibits/withdrawn/*.pdf'
+
+  # Remove the PDFs listed in a file (paths, globs or sha256 values, one per line)
+  python rmpdf.py -c MyDocs --from-file withdrawn.txt
+
+  # Remove a PDF by its sha256, even if the file is gone
+  python rmpdf.py -c MyDocs \
+      --sha256 9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08
 
   # Dry run to see what would be deleted
-  python remove_pdf_from_collection.py -c MyDocs document.pdf --dry-run
+  python rmpdf.py -c MyDocs document.pdf --dry-run
 
   # With custom data directory
-  python remove_pdf_from_collection.py -d /Users/brain/work/chroma/ -c MyDocs document.pdf
+  python rmpdf.py -d /Users/brain/work/chroma/ -c MyDocs document.pdf
         """
     )
 
@@ -99,11 +203,20 @@ Examples:
                        help="Directory for Chroma database storage (default: CHROMADIR environment variable)")
     parser.add_argument("-c", "--collection-name", required=True,
                        help="Name of the collection to remove documents from")
-    parser.add_argument("pdf_path", help="PDF file to remove from collection")
+    parser.add_argument("pdf_paths", nargs="*",
+                       help="PDF files, globs or sha256 values to remove from the collection")
+    parser.add_argument("-f", "--from-file",
+                       help="File listing PDF paths, globs or sha256 values, one per line")
+    parser.add_argument("--sha256", nargs="+", default=[],
+                       help="sha256 values of PDFs to remove")
     parser.add_argument("--dry-run", action="store_true",
                        help="Show what would be deleted without actually deleting")
 
+    add_embedding_function_argument(parser)
+    add_profile_argument(parser)
+
     args = parser.parse_args()
+    select_embedding_function(args.embedding_function)
 
     # Try to get active directory first, fall back to provided/env directory
     data_dir = args.data_dir
@@ -116,22 +229,30 @@ Examples:
         print("Error: Data directory must be provided via --data-dir flag or CHROMADIR environment variable")
         sys.exit(1)
 
-    if not os.path.exists(args.pdf_path):
-        print(f"Error: PDF file {args.pdf_path} does not exist")
+    targets = list(args.pdf_paths)
+    if args.from_file:
+        if not os.path.exists(args.from_file):
+            print(f"Error: List file {args.from_file} does not exist")
+            sys.exit(1)
+        targets.extend(read_target_file(args.from_file))
+
+    if not targets and not args.sha256:
+        print("Error: Give at least one PDF path, glob, --from-file or --sha256 value")
         sys.exit(1)
 
-    if not args.pdf_path.lower().endswith('.pdf'):
-        print(f"Error: File {args.pdf_path} is not a PDF")
+    for invalid in [value for value in args.sha256 if not _SHA256_RE.match(value)]:
+        print(f"Error: {invalid} is not a sha256 value")
         sys.exit(1)
 
     # Use context manager for logger
     log_path = os.path.join(os.getcwd(), "parabeagle.log")
-    with Logger(log_path) as logger:
-        exit_code = remove_pdf_from_collection(
+    with Logger(log_path) as logger, profile_run("rmpdf", args.profile):
+        exit_code = remove_pdfs_from_collection(
             data_dir,
             args.collection_name,
-            args.pdf_path,
+            targets,
+            sha256_values=args.sha256,
             dry_run=args.dry_run,
             logger=logger
         )
-    sys.exit(exit_code)
\ No newline at end of file
+    sys.exit(exit_code)
@@ -1,6 +1,5 @@
 #!/Users/brain/work/gits/parabeagle/.venv/bin/python
 
-import chromadb
 import sys
 import os
 import json
@@ -13,6 +12,19 @@ import shutil
 from collections import defaultdict
 import tempfile
 
+# The helpers shared by the CLI tools live in ../cli
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "cli"))
+from common import (
+    add_embedding_function_argument,
+    add_profile_argument,
+    get_persistent_client,
+    profile_run,
+    select_embedding_function,
+)
+
+from chroma_mcp import sidecar
+
+
 def get_active_directory(base_dir):
     """Get the currently active directory from the directory database."""
     if not base_dir:
@@ -65,7 +77,7 @@ def get_segment_ids(data_dir, collection_id):
 def export_collection(data_dir, collection_name, output_path, include_pdfs=True):
     """Export a Chroma collection to a tar.gz archive."""
     try:
-        client = chromadb.PersistentClient(path=data_dir)
+        client = get_persistent_client(data_dir)
 
         # Get the collection
         try:
@@ -95,24 +107,16 @@ def export_collection(data_dir, collection_name, output_path, include_pdfs=True)
             }
         }
 
-        # Collect PDF information
+        # Collect PDF information from the document manifest
+        sidecar.ensure_manifest(data_dir, collection)
         pdf_files = {}  # source_path -> {filename, chunks, size}
-        chunk_count = 0
-
-        for metadata in metadatas:
-            if metadata and 'source' in metadata:
-                source = metadata['source']
-                filename = metadata.get('filename', Path(source).name)
-
-                if source not in pdf_files:
-                    pdf_files[source] = {
-                        'filename': filename,
-                        'chunks': 0,
-                        'size_bytes': 0
-                    }
-
-                pdf_files[source]['chunks'] += 1
-                chunk_count += 1
+        for document in sidecar.list_documents(data_dir, collection_id):
+            pdf_files[document['source']] = {
+                'filename': document['filename'] or Path(document['source']).name,
+                'chunks': document['chunk_count'],
+                'size_bytes': 0
+            }
+        chunk_count = sum(info['chunks'] for info in pdf_files.values())
 
         print(f"  Chunks: {chunk_count}")
         print(f"  Source PDFs: {len(pdf_files)}")
@@ -187,7 +191,12 @@ def export_collection(data_dir, collection_name, output_path, include_pdfs=True)
                     segment['path'] = f"chroma/{segment_id}"
 
             # Create manifest
-            embedding_fn = "mpnet-768"  # Default, could be extracted from collection metadata
+            from chroma_mcp.embeddings import HASH_768, HASH_EMBEDDING_NAME, MPNET_768
+
+            embedding_fn = MPNET_768  # Default
+            ef_config = collection.configuration_json.get('embedding_function') or {}
+            if ef_config.get('name') == HASH_EMBEDDING_NAME:
+                embedding_fn = HASH_768
             if collection.metadata and 'embedding_function' in collection.metadata:
                 embedding_fn = collection.metadata['embedding_function']
 
@@ -286,8 +295,11 @@ Examples:
                        help="Output path (file or directory). Default: <collection_name>.zip in current directory")
     parser.add_argument("--no-pdfs", action="store_true",
                        help="Don't include original PDF files in the archive")
+    add_embedding_function_argument(parser)
+    add_profile_argument(parser)
 
     args = parser.parse_args()
+    select_embedding_function(args.embedding_function)
 
     # Try to get active directory first, fall back to provided/env directory
     data_dir = args.data_dir
@@ -300,10 +312,11 @@ Examples:
         print("Error: Data directory must be provided via --data-dir flag or CHROMADIR environment variable")
         sys.exit(1)
 
-    exit_code = export_collection(
-        data_dir,
-        args.collection_name,
-        args.output,
-        include_pdfs=not args.no_pdfs
-    )
+    with profile_run("export_collection", args.profile):
+        exit_code = export_collection(
+            data_dir,
+            args.collection_name,
+            args.output,
+            include_pdfs=not args.no_pdfs
+        )
     sys.exit(exit_code)
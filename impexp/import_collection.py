@@ -1,6 +1,5 @@
 #!/Users/brain/work/gits/parabeagle/.venv/bin/python
 
-import chromadb
 import sys
 import os
 import json
@@ -11,6 +10,21 @@ import tempfile
 from pathlib import Path
 from datetime import datetime
 
+# The helpers shared by the CLI tools live in ../cli
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "cli"))
+from common import (
+    add_embedding_function_argument,
+    add_profile_argument,
+    get_embedding_function,
+    get_embedding_function_name,
+    get_persistent_client,
+    profile_run,
+    select_embedding_function,
+)
+
+from chroma_mcp import sidecar
+
+
 def get_active_directory(base_dir):
     """Get the currently active directory from the directory database."""
     if not base_dir:
@@ -102,7 +116,7 @@ def import_collection(data_dir, archive_path, collection_name=None, pdf_dir=None
             print(f"  Distance metric: {manifest['distance_metric']}")
 
             # Check if collection already exists
-            client = chromadb.PersistentClient(path=data_dir)
+            client = get_persistent_client(data_dir)
             collection_exists = False
             try:
                 existing = client.get_collection(target_collection_name)
@@ -115,20 +129,23 @@ def import_collection(data_dir, archive_path, collection_name=None, pdf_dir=None
 
                 print("Deleting existing collection...")
                 client.delete_collection(target_collection_name)
+                sidecar.bump_generation(data_dir, str(existing.id))
+                sidecar.drop_collection(data_dir, str(existing.id))
             except Exception:
                 pass
 
-            # Create collection with mpnet-768 embedding function
-            from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+            # Create collection with the selected embedding function (mpnet-768 by default)
             from chromadb.api.collection_configuration import CreateCollectionConfiguration
 
-            embedding_fn_name = manifest.get('embedding_function', 'mpnet-768')
-            if embedding_fn_name != 'mpnet-768':
-                print(f"Note: Archive was created with '{embedding_fn_name}', importing with 'mpnet-768'")
+            from chroma_mcp.embeddings import MPNET_768
 
-            embedding_function = SentenceTransformerEmbeddingFunction(
-                model_name="sentence-transformers/all-mpnet-base-v2"
-            )
+            target_embedding_fn = get_embedding_function_name()
+            embedding_fn_name = manifest.get('embedding_function', MPNET_768)
+            if embedding_fn_name != target_embedding_fn:
+                print(f"Note: Archive was created with '{embedding_fn_name}', "
+                      f"importing with '{target_embedding_fn}'")
+
+            embedding_function = get_embedding_function()
             configuration = CreateCollectionConfiguration(embedding_function=embedding_function)
 
             # Prepare collection metadata
@@ -180,18 +197,26 @@ def import_collection(data_dir, archive_path, collection_name=None, pdf_dir=None
             batch_size = 100
             total_added = 0
 
-            for i in range(0, len(documents), batch_size):
-                batch_docs = documents[i:i+batch_size]
-                batch_metas = metadatas[i:i+batch_size]
-                batch_ids = ids[i:i+batch_size]
-
-                collection.add(
-                    documents=batch_docs,
-                    metadatas=batch_metas,
-                    ids=batch_ids
-                )
-                total_added += len(batch_docs)
-                print(f"  Progress: {total_added}/{len(documents)} chunks")
+            indexed = False
+            try:
+                for i in range(0, len(documents), batch_size):
+                    batch_docs = documents[i:i+batch_size]
+                    batch_metas = metadatas[i:i+batch_size]
+                    batch_ids = ids[i:i+batch_size]
+
+                    collection.add(
+                        documents=batch_docs,
+                        metadatas=batch_metas,
+                        ids=batch_ids
+                    )
+                    sidecar.index_chunks(data_dir, str(collection.id), batch_ids, batch_docs)
+                    sidecar.record_chunks(data_dir, str(collection.id), batch_ids, batch_metas)
+                    total_added += len(batch_docs)
+                    print(f"  Progress: {total_added}/{len(documents)} chunks")
+                indexed = True
+            finally:
+                # Invalidate a running MCP server's cached results for this collection
+                sidecar.bump_generation(data_dir, str(collection.id), indexed=indexed)
 
             print(f"\n✓ Successfully imported collection '{target_collection_name}'")
             print(f"  Total documents: {collection.count()}")
@@ -243,8 +268,11 @@ Examples:
                        help="Directory to extract PDF files to. If not specified, PDFs will be extracted to current directory's 'pdfs/' folder")
     parser.add_argument("--force", action="store_true",
                        help="Overwrite existing collection if it exists")
+    add_embedding_function_argument(parser)
+    add_profile_argument(parser)
 
     args = parser.parse_args()
+    select_embedding_function(args.embedding_function)
 
     # Try to get active directory first, fall back to provided/env directory
     data_dir = args.data_dir
@@ -262,11 +290,12 @@ Examples:
     if pdf_dir is None:
         pdf_dir = os.path.join(os.getcwd(), "pdfs")
 
-    exit_code = import_collection(
-        data_dir,
-        args.archive,
-        collection_name=args.collection_name,
-        pdf_dir=pdf_dir,
-        force=args.force
-    )
+    with profile_run("import_collection", args.profile):
+        exit_code = import_collection(
+            data_dir,
+            args.archive,
+            collection_name=args.collection_name,
+            pdf_dir=pdf_dir,
+            force=args.force
+        )
     sys.exit(exit_code)
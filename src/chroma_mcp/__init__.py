@@ -1,7 +1,11 @@
 # This file can be empty
 
-from .server import main
 
-__all__ = ["main"]
+def main():
+    """Entry point for the parabeagle script; imports the server only when run."""
+    from .server import main as server_main
+
+    return server_main()
 
 
+__all__ = ["main"]
@@ -0,0 +1,112 @@
+"""
+Deadlines, cancellation and progress for tool calls.
+
+A tool call's blocking work runs on a worker thread, where neither an asyncio
+timeout nor the client's notifications/cancelled can interrupt it. Each call
+therefore carries a CallControl: the event loop marks it cancelled when the
+client cancels the request or the call runs past its deadline, and the worker
+checks it at safe points (between query stages, between batches of rows or
+documents, and before a collection is dropped) and stops there by raising
+CallCancelled. Writes made before that point are kept.
+
+The worker also reports progress through it, which the server forwards to the
+client as MCP progress notifications when the request asked for them.
+
+Only the standard library is imported here.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+ProgressCallback = Callable[[float, Optional[float]], None]
+
+
+class CallCancelled(Exception):
+    """A tool call was cancelled by the client or ran past its deadline."""
+
+
+class CallControl:
+    """Cancellation flag, deadline and progress callback shared by a call's loop and worker."""
+
+    def __init__(self, tool_name: str, timeout: Optional[float] = None,
+                 on_progress: Optional[ProgressCallback] = None):
+        """
+        Args:
+            tool_name: Tool the call belongs to, for error messages
+            timeout: Seconds from now the call may run, or None for no deadline
+            on_progress: Called with (done, total) for each progress report;
+                must be safe to call from any thread
+        """
+        self.tool_name = tool_name
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.reason = None
+        self._cancelled = threading.Event()
+        self._on_progress = on_progress
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline (at least 0), or None without one."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def cancel(self, reason: str) -> None:
+        """Ask the worker to stop at its next checkpoint; the first reason given is kept."""
+        if not self._cancelled.is_set():
+            self.reason = reason
+            self._cancelled.set()
+
+    def check(self) -> None:
+        """Raise CallCancelled if the call was cancelled or its deadline has passed."""
+        if not self._cancelled.is_set() and self.expired:
+            self.cancel(f"ran past its {self.timeout:g}s deadline")
+        if self._cancelled.is_set():
+            raise CallCancelled(f"{self.tool_name} {self.reason}")
+
+    def progress(self, done: float, total: Optional[float] = None) -> None:
+        """Report how much of the call's work is done."""
+        if self._on_progress is not None:
+            self._on_progress(done, total)
+
+
+_local = threading.local()
+
+
+@contextmanager
+def controlled(control: CallControl):
+    """Make control the current call's control on this thread for the enclosed block."""
+    previous = getattr(_local, "control", None)
+    _local.control = control
+    try:
+        yield control
+    finally:
+        _local.control = previous
+
+
+def current_control() -> Optional[CallControl]:
+    """Get the control of the call running on this thread, if any."""
+    return getattr(_local, "control", None)
+
+
+def checkpoint() -> None:
+    """Stop the current call here if it was cancelled or ran out of time; a no-op outside a call."""
+    control = current_control()
+    if control is not None:
+        control.check()
+
+
+def report_progress(done: float, total: Optional[float] = None) -> None:
+    """Report progress for the current call; a no-op outside a call."""
+    control = current_control()
+    if control is not None:
+        control.progress(done, total)
@@ -0,0 +1,235 @@
+"""
+LRU pool of open Chroma PersistentClients, keyed by data directory.
+
+Switching the active directory used to drop the client and open a new one. The pool
+keeps recently used directories open so switching back is instant, while bounding
+how many stay resident: the least recently used client is released once the pool is
+full, and clients idle for longer than idle_seconds are released on the next access.
+One directory (the server's active one) can be pinned so it is never released.
+
+Releasing a client drops, through on_release, whatever the caller cached for the
+directory, then closes it: its System is stopped and removed from chromadb's per-path
+cache, so the memory and file handles it held are freed. Work that uses pooled
+clients runs inside lease(); a client released while a lease taken before the
+release is still open is kept until that lease ends, and reopening its directory in
+the meantime takes it back rather than starting a second System over the same files,
+which would not see the first one's writes.
+"""
+
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+DEFAULT_MAX_CLIENTS = 4
+DEFAULT_IDLE_SECONDS = 1800
+
+
+def open_persistent_client(path: str):
+    """Open a chromadb PersistentClient for a data directory."""
+    import chromadb
+
+    return chromadb.PersistentClient(path=path)
+
+
+def close_persistent_client(client) -> None:
+    """Stop a PersistentClient's System and drop it from chromadb's per-path cache."""
+    from chromadb.api.shared_system_client import SharedSystemClient
+
+    system = SharedSystemClient._identifier_to_system.pop(client._identifier, None)
+    if system is not None:
+        system.stop()
+
+
+class ClientPool:
+    """Thread-safe LRU pool of PersistentClients keyed by absolute directory path."""
+
+    def __init__(
+        self,
+        max_clients: int = DEFAULT_MAX_CLIENTS,
+        idle_seconds: float = DEFAULT_IDLE_SECONDS,
+        factory: Callable[[str], Any] = open_persistent_client,
+        on_release: Optional[Callable[[str], None]] = None,
+        closer: Callable[[Any], None] = close_persistent_client,
+    ):
+        """
+        Args:
+            max_clients: Most clients kept open at once (at least 1)
+            idle_seconds: Release clients unused for this long; 0 keeps them until evicted
+            factory: Opens a client for a path
+            on_release: Called with the path after a client is released, so callers
+                can drop anything they cached for that directory
+            closer: Closes a released client once no lease can still be using it
+        """
+        self.factory = factory
+        self.on_release = on_release
+        self.closer = closer
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.closed = 0
+        self._clients = OrderedDict()  # path -> (client, last_used)
+        self._retired: Dict[str, Tuple[Any, int]] = {}  # path -> (client, released at ticket)
+        self._tickets = itertools.count()
+        self._leases: Set[int] = set()  # tickets of the open leases
+        self._pinned = None
+        self._lock = threading.Lock()
+        self.configure(max_clients, idle_seconds)
+
+    def configure(self, max_clients: int, idle_seconds: float) -> None:
+        """Change the pool limits; excess clients are released on the next access."""
+        if max_clients < 1:
+            raise ValueError("Client pool size must be at least 1")
+        if idle_seconds < 0:
+            raise ValueError("Client idle timeout cannot be negative")
+        self.max_clients = max_clients
+        self.idle_seconds = idle_seconds
+
+    def pin(self, path: Optional[str]) -> None:
+        """Keep a directory's client open regardless of idle time and pool size.
+
+        Only one directory is pinned at a time; None unpins.
+        """
+        with self._lock:
+            self._pinned = os.path.abspath(path) if path else None
+
+    @contextmanager
+    def lease(self):
+        """Keep clients released during the block open until it ends.
+
+        Wrap any work that gets clients from the pool and uses them.
+        """
+        with self._lock:
+            ticket = next(self._tickets)
+            self._leases.add(ticket)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._leases.discard(ticket)
+                self._close_retired_locked()
+
+    def get(self, path: str):
+        """Get the open client for a directory, opening it if needed."""
+        path = os.path.abspath(path)
+        with self._lock:
+            entry = self._clients.get(path)
+            if entry is not None:
+                self.hits += 1
+                self._clients[path] = (entry[0], time.monotonic())
+                self._clients.move_to_end(path)
+                released = self._collect_locked(keep=path)
+                client = entry[0]
+            elif path in self._retired:
+                # Released but still in use: take it back rather than open a second System
+                self.hits += 1
+                client = self._retired.pop(path)[0]
+                self._clients[path] = (client, time.monotonic())
+                released = self._collect_locked(keep=path)
+            else:
+                self.misses += 1
+                client = None
+        if client is not None:
+            self._finish_release(released)
+            return client
+
+        # Open outside the lock so other directories stay usable meanwhile
+        client = self.factory(path)
+        with self._lock:
+            entry = self._clients.get(path)
+            if entry is not None:
+                client = entry[0]
+            self._clients[path] = (client, time.monotonic())
+            self._clients.move_to_end(path)
+            released = self._collect_locked(keep=path)
+        self._finish_release(released)
+        return client
+
+    def release(self, path: str) -> bool:
+        """Release the client for a directory if it is open."""
+        path = os.path.abspath(path)
+        with self._lock:
+            entry = self._clients.pop(path, None)
+            if entry is not None:
+                self.evictions += 1
+                self._retire_locked(path, entry[0])
+        if entry is not None:
+            self._finish_release([path])
+        return entry is not None
+
+    def clear(self) -> None:
+        """Release every client."""
+        with self._lock:
+            paths = list(self._clients)
+            for path in paths:
+                self._retire_locked(path, self._clients[path][0])
+            self._clients.clear()
+        self._finish_release(paths)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get pool occupancy and counters."""
+        now = time.monotonic()
+        with self._lock:
+            open_clients: List[Dict[str, Any]] = [
+                {"path": path, "idle_seconds": round(now - last_used, 1)}
+                for path, (_, last_used) in reversed(self._clients.items())
+            ]
+            return {
+                "open": open_clients,
+                "pinned": self._pinned,
+                "max_clients": self.max_clients,
+                "idle_seconds": self.idle_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "closed": self.closed,
+                "awaiting_close": sorted(self._retired),
+            }
+
+    def _collect_locked(self, keep: str) -> List[str]:
+        """Release idle and over-limit clients, never the one just requested or the pinned one."""
+        released = []
+        now = time.monotonic()
+        # Least recently used first
+        candidates = [path for path in self._clients if path not in (keep, self._pinned)]
+        for path in candidates:
+            if self.idle_seconds and now - self._clients[path][1] > self.idle_seconds:
+                released.append(path)
+                self._retire_locked(path, self._clients.pop(path)[0])
+        for path in candidates:
+            if len(self._clients) <= self.max_clients:
+                break
+            if path in self._clients:
+                released.append(path)
+                self._retire_locked(path, self._clients.pop(path)[0])
+        self.evictions += len(released)
+        return released
+
+    def _retire_locked(self, path: str, client: Any) -> None:
+        # Leases with a lower ticket began before the release and may still use the client
+        self._retired[path] = (client, next(self._tickets))
+
+    def _close_retired_locked(self) -> None:
+        """Close the retired clients no open lease began before.
+
+        Closing under the lock means a directory is never reopened while its old
+        System is being stopped.
+        """
+        oldest = min(self._leases, default=None)
+        for path, (client, ticket) in list(self._retired.items()):
+            if oldest is None or oldest > ticket:
+                del self._retired[path]
+                self.closer(client)
+                self.closed += 1
+
+    def _finish_release(self, paths: List[str]) -> None:
+        if not paths:
+            return
+        if self.on_release:
+            for path in paths:
+                self.on_release(path)
+        with self._lock:
+            self._close_retired_locked()
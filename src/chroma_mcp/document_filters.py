@@ -0,0 +1,189 @@
+"""
+Planning for where_document filters against the sidecar's trigram index.
+
+A where_document filter is narrowed to a set of candidate chunk ids that is
+guaranteed to contain every chunk the filter matches. Chroma still applies the
+filter itself to those candidates, so results are identical to an unindexed
+query; the index only spares it from scanning chunks that cannot match.
+
+Only the standard library is imported here.
+"""
+
+from typing import Callable, Dict, List, Optional, Sequence, Set
+
+from .sidecar import TRIGRAM_LENGTH
+
+# Escapes that stand for a class of characters or a position, never a literal
+_CLASS_ESCAPES = set("dDwWsSbBAz")
+
+
+def required_literals(pattern: str) -> List[str]:
+    """Find literal substrings that every match of a regex must contain.
+
+    The scan is deliberately conservative and only understands the regex syntax
+    shared by Python and Rust (which Chroma uses): anything it is unsure about ends
+    the current literal, and patterns with top-level alternation or inline flags
+    yield nothing at all. An empty list means the pattern cannot be narrowed.
+    """
+    literals: List[str] = []
+    run: List[str] = []
+
+    def end_run():
+        if run:
+            literals.append("".join(run))
+            run.clear()
+
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            if i + 1 >= len(pattern):
+                return []
+            escaped = pattern[i + 1]
+            if escaped in _CLASS_ESCAPES:
+                end_run()
+            elif escaped.isalnum():
+                # \x41, \u{..}, \p{L}, \n ... spell characters we don't decode
+                return []
+            else:
+                run.append(escaped)
+            i += 2
+            continue
+        if char == "|":
+            return []
+        if char == "(":
+            if pattern.startswith("(?", i) and not pattern.startswith("(?:", i):
+                # Inline flags such as (?i) or (?x) change how literals match
+                return []
+            end_run()
+            i = _skip_group(pattern, i)
+            if i is None:
+                return []
+            continue
+        if char == "[":
+            end_run()
+            i = _skip_class(pattern, i)
+            if i is None:
+                return []
+            continue
+        if char in "*?{":
+            # The previous atom may be absent
+            if run:
+                run.pop()
+            end_run()
+            if char == "{":
+                close = pattern.find("}", i)
+                if close < 0:
+                    return []
+                i = close
+            i += 1
+            continue
+        if char == "+":
+            # The previous atom is present but may repeat, so the literal stops here
+            end_run()
+            i += 1
+            continue
+        if char in ".^$)]}":
+            end_run()
+            i += 1
+            continue
+        run.append(char)
+        i += 1
+    end_run()
+    return literals
+
+
+def _skip_group(pattern: str, start: int) -> Optional[int]:
+    """Return the index just past the group opening at start, or None if unbalanced."""
+    depth = 0
+    i = start
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == "[":
+            i = _skip_class(pattern, i)
+            if i is None:
+                return None
+            continue
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return None
+
+
+def _skip_class(pattern: str, start: int) -> Optional[int]:
+    """Return the index just past the character class opening at start, or None."""
+    i = start + 1
+    if i < len(pattern) and pattern[i] == "^":
+        i += 1
+    # A ] right after [ or [^ is a literal member
+    if i < len(pattern) and pattern[i] == "]":
+        i += 1
+    depth = 1
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == "[":
+            # Rust allows nested classes such as [a-z&&[^aeiou]]
+            depth += 1
+        elif char == "]":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return None
+
+
+def _indexable(literals: Sequence[str]) -> List[str]:
+    return [literal for literal in literals if len(literal) >= TRIGRAM_LENGTH]
+
+
+def resolve_candidates(
+    where_document: Dict, lookup: Callable[[List[str]], Set[str]]
+) -> Optional[Set[str]]:
+    """Narrow a where_document filter to the ids of chunks that could match it.
+
+    Args:
+        where_document: Chroma where_document filter
+        lookup: Returns the ids of chunks containing every given substring
+
+    Returns:
+        A superset of the matching ids, or None when the filter can't be narrowed
+        (negations, short substrings, patterns without required literals)
+    """
+    if not isinstance(where_document, dict) or len(where_document) != 1:
+        return None
+    (operator, operand), = where_document.items()
+
+    if operator == "$contains" and isinstance(operand, str):
+        literals = _indexable([operand])
+        if not literals:
+            return None
+        return lookup(literals)
+    if operator == "$regex" and isinstance(operand, str):
+        literals = _indexable(required_literals(operand))
+        if not literals:
+            return None
+        return lookup(literals)
+    if operator == "$and" and isinstance(operand, list):
+        # Clauses that can't be narrowed don't constrain the candidates
+        narrowed = [resolve_candidates(clause, lookup) for clause in operand]
+        narrowed = [candidates for candidates in narrowed if candidates is not None]
+        if not narrowed:
+            return None
+        return set.intersection(*narrowed)
+    if operator == "$or" and isinstance(operand, list):
+        # One clause that can't be narrowed could match anything
+        narrowed = [resolve_candidates(clause, lookup) for clause in operand]
+        if not narrowed or any(candidates is None for candidates in narrowed):
+            return None
+        return set.union(*narrowed)
+    return None
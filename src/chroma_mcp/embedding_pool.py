@@ -0,0 +1,201 @@
+"""
+Query embedding in worker processes, with micro-batching.
+
+Embedding a query holds the GIL in the server process, so concurrent sessions
+queue behind each other and behind everything else the server does. With
+--embedding-workers N, query texts are embedded by N worker processes that each
+hold their own copy of the model.
+
+Requests go through one dispatcher thread. When a worker is idle, a request is
+sent to it at once, so a lone query pays only the round trip to the worker.
+While every worker is busy, requests wait in the queue and the next idle worker
+takes all of those waiting for the same model (up to the batch size) as a single
+batch, so throughput rises with load instead of each query being embedded on its
+own.
+
+Workers are started with "spawn", as forking a process that already runs
+threads (and possibly torch) is unsafe.
+"""
+
+import concurrent.futures
+import functools
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+from .embeddings import build_embedding_function, embedding_model_key
+
+DEFAULT_EMBEDDING_BATCH_SIZE = 64
+
+# Embedding functions built in this worker process, by model key
+_worker_functions: Dict[str, Any] = {}
+
+
+def _worker_function(ef_config: Dict[str, Any]):
+    model_key = embedding_model_key(ef_config)
+    embedding_function = _worker_functions.get(model_key)
+    if embedding_function is None:
+        embedding_function = _worker_functions[model_key] = build_embedding_function(ef_config)
+    return embedding_function
+
+
+def _worker_init(preload: Optional[Dict[str, Any]]):
+    """Load the server's default model when the worker starts rather than on its first batch."""
+    if preload is not None:
+        _worker_function(preload)
+
+
+def _ready() -> int:
+    return os.getpid()
+
+
+def _embed_in_worker(ef_config: Dict[str, Any], texts: List[str]) -> List[Any]:
+    return list(_worker_function(ef_config)(texts))
+
+
+class _Request:
+    __slots__ = ("model_key", "ef_config", "texts", "future")
+
+    def __init__(self, model_key: str, ef_config: Dict[str, Any], texts: List[str]):
+        self.model_key = model_key
+        self.ef_config = ef_config
+        self.texts = texts
+        self.future = concurrent.futures.Future()
+
+
+class EmbeddingWorkerPool:
+    """Embeds texts in worker processes, batching requests that arrive while workers are busy."""
+
+    def __init__(self, workers: int, max_batch: int = DEFAULT_EMBEDDING_BATCH_SIZE,
+                 preload: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            workers: Number of worker processes
+            max_batch: Most texts sent to a worker at once (a larger single request
+                is still sent whole)
+            preload: Embedding function configuration each worker loads at startup
+        """
+        if workers < 1:
+            raise ValueError("Embedding worker count must be at least 1")
+        if max_batch < 1:
+            raise ValueError("Embedding batch size must be at least 1")
+        self.workers = workers
+        self.max_batch = max_batch
+        self.batches = 0
+        self.requests = 0
+        self.texts = 0
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_worker_init,
+            initargs=(preload,),
+        )
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self._idle_workers = threading.Semaphore(workers)
+        self._stats_lock = threading.Lock()
+        self._dispatcher = threading.Thread(
+            target=self._dispatch, name="parabeagle-embedding-dispatch", daemon=True
+        )
+        self._dispatcher.start()
+
+    def embed(self, ef_config: Dict[str, Any], texts: Sequence[str]) -> List[Any]:
+        """Embed texts with the model described by ef_config, blocking until done."""
+        if not texts:
+            return []
+        request = _Request(embedding_model_key(ef_config), ef_config, list(texts))
+        self._queue.put(request)
+        return request.future.result()
+
+    def warm_up(self) -> None:
+        """Start every worker process (each loads the preloaded model) and wait until they're up."""
+        # Workers are spawned on demand, one per task submitted while none is idle
+        futures = [self._executor.submit(_ready) for _ in range(self.workers)]
+        concurrent.futures.wait(futures)
+        for future in futures:
+            future.result()
+
+    def embedding_function(self, ef_config: Dict[str, Any]):
+        """A callable that embeds texts through the pool, for QueryEmbeddingCache.embed."""
+        return functools.partial(self.embed, ef_config)
+
+    def _dispatch(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            # Requests arriving while every worker is busy wait here and join this batch
+            self._idle_workers.acquire()
+            batch = [first]
+            size = len(first.texts)
+            deferred = []
+            while size < self.max_batch:
+                try:
+                    request = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    deferred.append(None)
+                    break
+                too_big = size + len(request.texts) > self.max_batch
+                if request.model_key != first.model_key or too_big:
+                    deferred.append(request)
+                    continue
+                batch.append(request)
+                size += len(request.texts)
+            for request in deferred:
+                self._queue.put(request)
+
+            texts = [text for request in batch for text in request.texts]
+            try:
+                future = self._executor.submit(_embed_in_worker, first.ef_config, texts)
+            except Exception as e:
+                self._idle_workers.release()
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            with self._stats_lock:
+                self.batches += 1
+                self.requests += len(batch)
+                self.texts += len(texts)
+            future.add_done_callback(functools.partial(self._finish, batch))
+
+    def _finish(self, batch: List[_Request], future: concurrent.futures.Future):
+        self._idle_workers.release()
+        try:
+            embeddings = future.result()
+        except BaseException as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+        offset = 0
+        for request in batch:
+            request.future.set_result(embeddings[offset:offset + len(request.texts)])
+            offset += len(request.texts)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get worker count and batching counters."""
+        with self._stats_lock:
+            return {
+                "workers": self.workers,
+                "max_batch": self.max_batch,
+                "batches": self.batches,
+                "requests": self.requests,
+                "texts": self.texts,
+                "mean_batch_texts": round(self.texts / self.batches, 2) if self.batches else None,
+            }
+
+    def shutdown(self):
+        """Stop the dispatcher and the worker processes; queued requests fail."""
+        self._queue.put(None)
+        self._dispatcher.join(timeout=5)
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is not None:
+                request.future.set_exception(RuntimeError("Embedding worker pool is shut down"))
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,302 @@
+"""
+Embedding function selection shared by the MCP server and the CLI tools.
+
+Parabeagle normally embeds with mpnet-768 (sentence-transformers/all-mpnet-base-v2).
+For tests and benchmarks a deterministic hash-based function with the same
+dimensionality can be selected instead, so nothing has to be downloaded or loaded.
+
+Selection order:
+1. An explicit name passed to get_embedding_function()
+2. The name set with select_embedding_function() (--embedding-function flags)
+3. The PARABEAGLE_EMBEDDING_FUNCTION environment variable
+4. mpnet-768
+
+chromadb, numpy and sentence-transformers are imported on first use only, so that
+importing this module (and the server or CLI tools that use it) stays cheap.
+"""
+
+import json
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+MPNET_768 = "mpnet-768"
+HASH_768 = "hash-768"
+EMBEDDING_FUNCTION_CHOICES = [MPNET_768, HASH_768]
+EMBEDDING_FUNCTION_ENV = "PARABEAGLE_EMBEDDING_FUNCTION"
+
+MPNET_MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"
+# Name under which HashEmbeddingFunction is registered with chromadb
+HASH_EMBEDDING_NAME = "parabeagle_hash"
+
+DEFAULT_QUERY_CACHE_SIZE = 1024
+
+# Name chosen via select_embedding_function(), overrides the environment variable
+_selected_name = None
+
+# One embedding function instance per model key for the whole process, so each
+# model is loaded once however many collections use it
+_shared_functions: Dict[str, Any] = {}
+_shared_lock = threading.Lock()
+_load_seconds: Dict[str, float] = {}
+_model_locks: Dict[str, threading.Lock] = {}
+
+
+def __getattr__(name: str):
+    # HashEmbeddingFunction lives in hash_embedding.py; import it only when asked for
+    if name == "HashEmbeddingFunction":
+        from .hash_embedding import HashEmbeddingFunction
+
+        return HashEmbeddingFunction
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def register_embedding_functions() -> None:
+    """Register Parabeagle's embedding functions with chromadb.
+
+    Must run before opening collections that were created with hash-768, since
+    chromadb rebuilds a collection's embedding function from its registered name.
+    """
+    from . import hash_embedding  # noqa: F401 - registers on import
+
+
+def select_embedding_function(name: Optional[str]) -> None:
+    """Set the embedding function used for new collections in this process.
+
+    Args:
+        name: One of EMBEDDING_FUNCTION_CHOICES, or None to fall back to the environment
+    """
+    global _selected_name
+
+    if name is not None and name not in EMBEDDING_FUNCTION_CHOICES:
+        raise ValueError(
+            f"Unknown embedding function '{name}'. "
+            f"Choose one of: {', '.join(EMBEDDING_FUNCTION_CHOICES)}"
+        )
+    _selected_name = name
+
+
+def get_embedding_function_name() -> str:
+    """Get the name of the currently selected embedding function."""
+    if _selected_name:
+        return _selected_name
+    name = os.getenv(EMBEDDING_FUNCTION_ENV) or MPNET_768
+    if name not in EMBEDDING_FUNCTION_CHOICES:
+        raise ValueError(
+            f"Unknown embedding function '{name}' in {EMBEDDING_FUNCTION_ENV}. "
+            f"Choose one of: {', '.join(EMBEDDING_FUNCTION_CHOICES)}"
+        )
+    return name
+
+
+def get_embedding_function(name: Optional[str] = None):
+    """Get an embedding function instance (768 dimensions).
+
+    Args:
+        name: Embedding function name, defaults to the current selection
+
+    Returns:
+        HashEmbeddingFunction for hash-768, SentenceTransformerEmbeddingFunction for mpnet-768
+    """
+    name = name or get_embedding_function_name()
+    ef_config = embedding_function_config(name)
+    if name == HASH_768:
+        return get_shared_embedding_function(ef_config)
+
+    from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+
+    return get_shared_embedding_function(
+        ef_config, lambda: SentenceTransformerEmbeddingFunction(model_name=MPNET_MODEL_NAME)
+    )
+
+
+def embedding_function_config(name: Optional[str] = None) -> Dict[str, Any]:
+    """Get the configuration Chroma stores for an embedding function, without loading it.
+
+    Args:
+        name: Embedding function name, defaults to the current selection
+    """
+    name = name or get_embedding_function_name()
+    if name == HASH_768:
+        return {"type": "known", "name": HASH_EMBEDDING_NAME, "config": {"dimensions": 768}}
+    return {
+        "type": "known",
+        # SentenceTransformerEmbeddingFunction.name(), spelled out to avoid importing chromadb
+        "name": "sentence_transformer",
+        # Same config SentenceTransformerEmbeddingFunction reports for these arguments
+        "config": {
+            "model_name": MPNET_MODEL_NAME,
+            "device": "cpu",
+            "normalize_embeddings": False,
+            "kwargs": {},
+        },
+    }
+
+
+def embedding_model_key(ef_config: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Build a cache key identifying the model behind a collection's embedding function.
+
+    Args:
+        ef_config: The "embedding_function" entry of collection.configuration_json
+
+    Returns:
+        "name:config-json" for registered embedding functions, or None for legacy and
+        custom ones whose model cannot be identified (callers let Chroma embed those)
+    """
+    if not ef_config or ef_config.get("type") != "known" or not ef_config.get("name"):
+        return None
+    config = json.dumps(ef_config.get("config") or {}, sort_keys=True)
+    return f"{ef_config['name']}:{config}"
+
+
+def build_embedding_function(ef_config: Dict[str, Any]):
+    """Construct the embedding function described by a collection's configuration."""
+    from chromadb.utils.embedding_functions import config_to_embedding_function
+
+    register_embedding_functions()
+    return config_to_embedding_function(ef_config)
+
+
+def get_shared_embedding_function(
+    ef_config: Optional[Dict[str, Any]], factory: Optional[Callable[[], Any]] = None
+):
+    """Get the process-wide embedding function instance for a collection's configuration.
+
+    Each model is constructed once; concurrent first requests for the same model wait
+    for a single load instead of loading it twice.
+
+    Args:
+        ef_config: The "embedding_function" entry of collection.configuration_json
+        factory: Builds the function on first use (defaults to build_embedding_function)
+
+    Returns:
+        The shared embedding function, or None if the configuration doesn't name a
+        registered embedding function
+    """
+    model_key = embedding_model_key(ef_config)
+    if model_key is None:
+        return None
+
+    with _shared_lock:
+        embedding_function = _shared_functions.get(model_key)
+        if embedding_function is not None:
+            return embedding_function
+        model_lock = _model_locks.setdefault(model_key, threading.Lock())
+
+    with model_lock:
+        with _shared_lock:
+            embedding_function = _shared_functions.get(model_key)
+        if embedding_function is None:
+            started = time.perf_counter()
+            embedding_function = factory() if factory else build_embedding_function(ef_config)
+            with _shared_lock:
+                _shared_functions[model_key] = embedding_function
+                _load_seconds[model_key] = round(time.perf_counter() - started, 3)
+    return embedding_function
+
+
+def shared_embedding_functions() -> List[str]:
+    """List the model keys of the embedding functions loaded in this process."""
+    with _shared_lock:
+        return sorted(_shared_functions)
+
+
+def embedding_load_seconds() -> Dict[str, float]:
+    """Seconds each loaded embedding function took to build, by model key."""
+    with _shared_lock:
+        return dict(sorted(_load_seconds.items()))
+
+
+def normalize_query_text(text: str) -> str:
+    """Normalize a query for caching: Unicode NFC and collapsed whitespace."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class QueryEmbeddingCache:
+    """Bounded LRU cache of query embeddings keyed by (model key, normalized text).
+
+    The key names the model rather than the collection, so collections that share a
+    model share cache entries. Safe to use from several worker threads.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_QUERY_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def embed(
+        self, model_key: str, embedding_function_factory: Callable[[], Any], texts: List[str]
+    ) -> List[Any]:
+        """Embed texts, computing only the ones not already cached.
+
+        Args:
+            model_key: Key from embedding_model_key()
+            embedding_function_factory: Returns the embedding function; only called on a miss
+            texts: Query texts, embedded in normalized form
+
+        Returns:
+            One embedding per text, in order
+        """
+        normalized = [normalize_query_text(text) for text in texts]
+        results = [None] * len(texts)
+        missing = {}
+
+        with self._lock:
+            for index, text in enumerate(normalized):
+                entry = self._entries.get((model_key, text))
+                if entry is not None:
+                    self._entries.move_to_end((model_key, text))
+                    results[index] = entry
+                    self.hits += 1
+                else:
+                    missing.setdefault(text, []).append(index)
+                    self.misses += 1
+
+        if missing:
+            # Embed outside the lock; one batched call for all misses
+            missing_texts = list(missing)
+            embeddings = embedding_function_factory()(missing_texts)
+            with self._lock:
+                for text, embedding in zip(missing_texts, embeddings, strict=True):
+                    for index in missing[text]:
+                        results[index] = embedding
+                    if self.max_entries > 0:
+                        self._entries[(model_key, text)] = embedding
+                        self._entries.move_to_end((model_key, text))
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+        return results
+
+    def resize(self, max_entries: int) -> None:
+        """Change the capacity, evicting the least recently used entries if needed."""
+        if max_entries < 0:
+            raise ValueError("Query cache size cannot be negative")
+        with self._lock:
+            self.max_entries = max_entries
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and occupancy."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
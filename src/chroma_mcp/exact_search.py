@@ -0,0 +1,196 @@
+"""
+Exact (brute-force) vector search over an in-memory embedding matrix.
+
+HNSW pays for its speed on large collections with approximation and per-query
+overhead that buy nothing on a collection of a few thousand chunks, where
+scanning every embedding is as fast and never misses a neighbor. For such
+collections the server keeps the embeddings as one contiguous float32 matrix,
+read on the first exact query and reused until the collection's write
+generation changes, and answers top-k with a single matrix product.
+
+Distances follow Chroma's conventions for each space, so exact and HNSW results
+can be compared and merged:
+- cosine: 1 - cosine similarity (rows are normalized once, when loaded)
+- l2: squared Euclidean distance
+- ip: 1 - inner product
+
+NumPy is imported on first use; only the standard library is imported here.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Collections up to this many chunks are searched exactly unless the query says otherwise
+DEFAULT_EXACT_SEARCH_MAX_ROWS = 10000
+# Collections whose matrices are kept in memory at once
+DEFAULT_EXACT_CACHE_SIZE = 4
+
+
+class EmbeddingMatrix:
+    """One collection's embeddings as a contiguous float32 matrix, ready for its distance space."""
+
+    def __init__(self, ids: Sequence[str], embeddings, space: str):
+        import numpy as np
+
+        if space not in ("cosine", "l2", "ip"):
+            raise ValueError(f"Unknown distance space '{space}'")
+        self.ids = list(ids)
+        self.space = space
+        if self.ids:
+            matrix = np.asarray(embeddings, dtype=np.float32).reshape(len(self.ids), -1)
+        else:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+        if space == "cosine":
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            matrix = matrix / norms
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        # Squared row norms turn the l2 distance into the same matrix product
+        self.square_norms = (
+            np.einsum("ij,ij->i", self.matrix, self.matrix) if space == "l2" else None
+        )
+        self.rows = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes
+
+    def search(
+        self, query_embeddings, n_results: int, allowed_ids: Optional[Sequence[str]] = None
+    ) -> Tuple[List[List[str]], List[List[float]]]:
+        """Find the n_results nearest rows to each query embedding.
+
+        Args:
+            query_embeddings: One embedding per query
+            n_results: Hits per query (fewer if fewer rows are searched)
+            allowed_ids: Restrict the search to these ids, e.g. the chunks that pass
+                a query's filters; ids not in the matrix are ignored
+
+        Returns:
+            (ids, distances), each with one list per query, nearest first
+        """
+        import numpy as np
+
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1)
+        rows = None
+        matrix = self.matrix
+        square_norms = self.square_norms
+        if allowed_ids is not None:
+            rows = np.fromiter(
+                (self.rows[chunk_id] for chunk_id in allowed_ids if chunk_id in self.rows),
+                dtype=np.intp,
+            )
+            matrix = matrix[rows]
+            if square_norms is not None:
+                square_norms = square_norms[rows]
+
+        if len(matrix) == 0 or n_results < 1:
+            return [[] for _ in queries], [[] for _ in queries]
+
+        if self.space == "cosine":
+            norms = np.linalg.norm(queries, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            queries = queries / norms
+        # One product scores every row against every query
+        products = matrix @ queries.T
+        if self.space == "l2":
+            query_norms = np.einsum("ij,ij->i", queries, queries)
+            distances = square_norms[:, None] + query_norms[None, :] - 2 * products
+            np.maximum(distances, 0, out=distances)
+        else:
+            distances = 1.0 - products
+
+        count = min(n_results, len(matrix))
+        all_ids, all_distances = [], []
+        for column in range(len(queries)):
+            scores = distances[:, column]
+            if count < len(scores):
+                top = np.argpartition(scores, count - 1)[:count]
+            else:
+                top = np.arange(len(scores))
+            top = top[np.argsort(scores[top], kind="stable")]
+            matrix_rows = rows[top] if rows is not None else top
+            all_ids.append([self.ids[row] for row in matrix_rows])
+            all_distances.append([float(scores[row]) for row in top])
+        return all_ids, all_distances
+
+
+class ExactSearchCache:
+    """Embedding matrices by (data directory, collection id), least recently used first out.
+
+    Each matrix is valid for the write generation it was loaded at; asking for it at a
+    newer generation loads it again.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_EXACT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple, Tuple[int, EmbeddingMatrix]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple, generation: int, load) -> EmbeddingMatrix:
+        """Get the matrix for key at generation, calling load() to build it if needed."""
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached[0] == generation:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+        # Loaded outside the lock so other collections aren't held up; a concurrent
+        # load of the same collection only costs the duplicate read
+        matrix = load()
+        with self._lock:
+            self.misses += 1
+            if self.max_entries > 0:
+                self._entries[key] = (generation, matrix)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return matrix
+
+    def size(self, key: Tuple, generation: int) -> Optional[int]:
+        """Rows of the cached matrix for key at generation, or None if it isn't cached."""
+        with self._lock:
+            cached = self._entries.get(key)
+            return len(cached[1]) if cached is not None and cached[0] == generation else None
+
+    def discard_collection(self, collection_id: str) -> None:
+        """Drop a collection's matrix from every directory."""
+        with self._lock:
+            for key in [key for key in self._entries if key[1] == collection_id]:
+                del self._entries[key]
+
+    def resize(self, max_entries: int) -> None:
+        """Change how many matrices are kept, evicting the least recently used if needed."""
+        if max_entries < 0:
+            raise ValueError("Exact search cache size cannot be negative")
+        with self._lock:
+            self.max_entries = max_entries
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all matrices and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict:
+        """Get hit/miss (load) counters, occupancy and the memory held by cached matrices."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "rows": sum(len(matrix) for _, matrix in self._entries.values()),
+                "bytes": sum(matrix.nbytes for _, matrix in self._entries.values()),
+            }
@@ -0,0 +1,81 @@
+"""
+Deterministic hash embedding function (hash-768).
+
+Kept apart from embeddings.py because defining and registering it needs chromadb
+and numpy, which the CLI tools and server should only import when they touch Chroma.
+"""
+
+import hashlib
+import re
+from typing import Any, Dict, List
+
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings, Space
+from chromadb.utils.embedding_functions import register_embedding_function
+
+from .embeddings import HASH_EMBEDDING_NAME
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+@register_embedding_function
+class HashEmbeddingFunction(EmbeddingFunction[Documents]):
+    """Deterministic feature-hashing embeddings for tests and benchmarks.
+
+    Words and adjacent word pairs are hashed into signed buckets and the result is
+    L2-normalized, so texts that share vocabulary end up close in cosine space.
+    Output is identical across processes and machines, with no model to load.
+    """
+
+    def __init__(self, dimensions: int = 768):
+        self.dimensions = dimensions
+
+    def __call__(self, input: Documents) -> Embeddings:
+        return [self._embed_one(text) for text in input]
+
+    def _embed_one(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        tokens = _TOKEN_RE.findall(text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:], strict=False)]
+
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            sign = 1.0 if value & 1 else -1.0
+            vector[(value >> 1) % self.dimensions] += sign
+
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            # Empty or punctuation-only text still needs a valid unit vector
+            vector[0] = 1.0
+            return vector
+        return vector / norm
+
+    @staticmethod
+    def name() -> str:
+        return HASH_EMBEDDING_NAME
+
+    def default_space(self) -> Space:
+        return "cosine"
+
+    def supported_spaces(self) -> List[Space]:
+        return ["cosine", "l2", "ip"]
+
+    @staticmethod
+    def build_from_config(config: Dict[str, Any]) -> "HashEmbeddingFunction":
+        return HashEmbeddingFunction(dimensions=config.get("dimensions", 768))
+
+    def get_config(self) -> Dict[str, Any]:
+        return {"dimensions": self.dimensions}
+
+    def validate_config_update(
+        self, old_config: Dict[str, Any], new_config: Dict[str, Any]
+    ) -> None:
+        if old_config.get("dimensions") != new_config.get("dimensions"):
+            raise ValueError("The dimensions of a hash embedding function cannot be changed")
+
+    @staticmethod
+    def validate_config(config: Dict[str, Any]) -> None:
+        dimensions = config.get("dimensions", 768)
+        if not isinstance(dimensions, int) or dimensions <= 0:
+            raise ValueError(f"Invalid hash embedding dimensions: {dimensions}")
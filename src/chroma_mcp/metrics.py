@@ -0,0 +1,163 @@
+"""
+In-process latency metrics for the MCP server.
+
+Every tool call run on the worker pool records its latency, and the query path
+records how long each stage took (query embedding, search, reranking, result
+formatting). Each series keeps a count and a window of recent samples from
+which chroma_server_stats reports p50/p95/p99; recording is a lock and an
+append, and nothing runs while the server is idle.
+
+The server can also write the same snapshot to a local JSON file
+(--metrics-file), rewritten at most once per interval and only after new calls.
+
+Only the standard library is imported here.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+# Recent samples per series that percentiles are computed over
+DEFAULT_METRICS_WINDOW = 1024
+# Seconds between metrics file writes
+DEFAULT_METRICS_INTERVAL = 60.0
+
+PERCENTILES = (50, 95, 99)
+
+
+class LatencySeries:
+    """Call count, error count and a window of recent latencies for one series."""
+
+    def __init__(self, window: int = DEFAULT_METRICS_WINDOW):
+        self.count = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds: float, error: bool = False) -> None:
+        self.count += 1
+        self.errors += error
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.samples.append(seconds)
+
+    def summary(self) -> Dict[str, Any]:
+        """Count, errors and latency percentiles in milliseconds."""
+        ordered = sorted(self.samples)
+        summary = {
+            "count": self.count,
+            "errors": self.errors,
+            "mean_ms": round(1000 * self.total_seconds / self.count, 3) if self.count else None,
+            "max_ms": round(1000 * self.max_seconds, 3) if self.count else None,
+        }
+        for percentile in PERCENTILES:
+            summary[f"p{percentile}_ms"] = (
+                round(1000 * _nearest_rank(ordered, percentile), 3) if ordered else None
+            )
+        return summary
+
+
+def _nearest_rank(ordered, percentile: int) -> float:
+    rank = max(1, -(-percentile * len(ordered) // 100))
+    return ordered[rank - 1]
+
+
+class ServerMetrics:
+    """Per-tool and per-stage latency series. Safe to use from several worker threads."""
+
+    def __init__(self, window: int = DEFAULT_METRICS_WINDOW):
+        self.window = window
+        self.started = time.time()
+        self.version = 0
+        self._tools: Dict[str, LatencySeries] = {}
+        self._stages: Dict[str, LatencySeries] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def begin_call(self, tool_name: str) -> None:
+        """Count a tool call as in flight until record_call."""
+        with self._lock:
+            self._in_flight[tool_name] = self._in_flight.get(tool_name, 0) + 1
+
+    def record_call(self, tool_name: str, seconds: float, error: bool = False) -> None:
+        """Record a finished tool call started with begin_call."""
+        with self._lock:
+            self._in_flight[tool_name] -= 1
+            series = self._tools.get(tool_name)
+            if series is None:
+                series = self._tools[tool_name] = LatencySeries(self.window)
+            series.record(seconds, error)
+            self.version += 1
+
+    def record_stage(self, stage: str, seconds: float) -> None:
+        """Record time spent in one stage of a query."""
+        with self._lock:
+            series = self._stages.get(stage)
+            if series is None:
+                series = self._stages[stage] = LatencySeries(self.window)
+            series.record(seconds)
+            self.version += 1
+
+    @contextmanager
+    def stage(self, stage: str):
+        """Time the enclosed block as a stage."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(stage, time.perf_counter() - started)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Summaries of every tool and stage, plus calls in flight."""
+        with self._lock:
+            return {
+                "uptime_seconds": round(time.time() - self.started, 3),
+                "tools": {name: series.summary() for name, series in sorted(self._tools.items())},
+                "stages": {name: series.summary() for name, series in sorted(self._stages.items())},
+                "in_flight": {
+                    name: count for name, count in sorted(self._in_flight.items()) if count
+                },
+            }
+
+    def reset(self) -> None:
+        """Drop all recorded series (calls in flight are still counted)."""
+        with self._lock:
+            self._tools.clear()
+            self._stages.clear()
+            self.started = time.time()
+            self.version += 1
+
+
+def write_metrics_file(path: str, snapshot: Dict[str, Any]) -> None:
+    """Write a snapshot as JSON, replacing the file atomically so readers never see half of it."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump({**snapshot, "written_at": time.time()}, f, indent=2, default=str)
+    os.replace(temp_path, path)
+
+
+class MetricsFileWriter:
+    """Writes snapshots to a file when the metrics have changed since the last write."""
+
+    def __init__(self, path: str, interval: float = DEFAULT_METRICS_INTERVAL):
+        if interval <= 0:
+            raise ValueError("Metrics interval must be positive")
+        self.path = path
+        self.interval = interval
+        self._written_version: Optional[int] = None
+
+    def maybe_write(self, metrics: ServerMetrics, snapshot_func) -> bool:
+        """Write snapshot_func() if anything was recorded since the last write."""
+        if metrics.version == self._written_version:
+            return False
+        version = metrics.version
+        write_metrics_file(self.path, snapshot_func())
+        self._written_version = version
+        return True
@@ -0,0 +1,110 @@
+"""
+Bounded pages for tools that read many documents.
+
+A read returns at most one page of rows, cut short if its JSON would exceed the
+response budget, plus an opaque cursor for the next page. The cursor records the
+offset, the collection's write generation and a fingerprint of the request, so a
+cursor can't be replayed against a different query or a collection that has been
+written to since; the caller restarts from the first page instead.
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# Serialized size a single response may reach (at least one row is always returned)
+DEFAULT_RESPONSE_BUDGET = 1_000_000
+
+# Per-row fields of a collection.get result
+GET_RESULT_FIELDS = ["ids", "embeddings", "documents", "uris", "data", "metadatas"]
+
+
+class CursorError(ValueError):
+    """A cursor is malformed or no longer valid for the request."""
+
+
+def request_fingerprint(*parts: Any) -> str:
+    """Hash the parameters that define a paged request."""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def encode_cursor(collection_id: str, generation: int, offset: int, fingerprint: str) -> str:
+    """Build an opaque cursor for the page starting at offset."""
+    payload = json.dumps(
+        {"c": collection_id, "g": generation, "o": offset, "f": fingerprint}, separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, collection_id: str, generation: int, fingerprint: str) -> int:
+    """Check a cursor against the current request and return its offset.
+
+    Raises:
+        CursorError: If the cursor is malformed, belongs to another request, or the
+            collection was written to after it was issued
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        offset = int(state["o"])
+        issued_for = (state["c"], state["f"])
+        issued_at = int(state["g"])
+    except (ValueError, KeyError, TypeError, binascii.Error, UnicodeError):
+        raise CursorError("Invalid cursor") from None
+    if issued_for != (collection_id, fingerprint):
+        raise CursorError("Cursor was issued for a different collection or request")
+    if issued_at != generation:
+        raise CursorError(
+            "Collection changed since this cursor was issued; restart from the first page"
+        )
+    return offset
+
+
+def page_size(limit: Optional[int]) -> int:
+    """Clamp a requested limit to a page size."""
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def jsonable_rows(result: Dict, fields: List[str] = GET_RESULT_FIELDS) -> Dict:
+    """Convert NumPy embeddings in a get-style result to plain lists."""
+    embeddings = result.get("embeddings")
+    if embeddings is not None and "embeddings" in fields:
+        result = dict(result)
+        result["embeddings"] = [
+            embedding.tolist() if hasattr(embedding, "tolist") else list(embedding)
+            for embedding in embeddings
+        ]
+    return result
+
+
+def trim_to_budget(result: Dict, budget: int, fields: List[str] = GET_RESULT_FIELDS) -> int:
+    """Count how many leading rows of a get-style result fit within budget bytes.
+
+    Always at least one row, so a single oversized row can still be read.
+    """
+    rows = len(result["ids"])
+    used = 0
+    for index in range(rows):
+        row = {field: result[field][index] for field in fields if result.get(field) is not None}
+        used += len(json.dumps(row, default=str))
+        if used > budget and index > 0:
+            return index
+    return rows
+
+
+def slice_rows(result: Dict, count: int, fields: List[str] = GET_RESULT_FIELDS) -> Dict:
+    """Keep the first count rows of a get-style result."""
+    sliced = dict(result)
+    for field in fields:
+        if sliced.get(field) is not None:
+            sliced[field] = sliced[field][:count]
+    return sliced
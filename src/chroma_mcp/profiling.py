@@ -0,0 +1,100 @@
+"""
+Opt-in cProfile profiling for server tool calls and CLI runs.
+
+Set PARABEAGLE_PROFILE to a directory (or pass --profile DIR) and every tool
+call, or every CLI invocation, writes two files there:
+
+- <time>-<label>-<pid>-<n>.prof: raw cProfile stats, for snakeviz, pstats or
+  gprof2dot
+- <time>-<label>-<pid>-<n>.txt: the top functions by cumulative time
+
+Each call gets its own profiler, so profiled calls still run concurrently. Python
+3.12 and later allow only one active profiler per process; there a call that starts
+while another is being profiled runs unprofiled and says so on stderr. Only the
+standard library is imported here.
+"""
+
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import sys
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+PROFILE_ENV = "PARABEAGLE_PROFILE"
+# Functions listed in each summary
+DEFAULT_PROFILE_TOP = 30
+
+_sequence = itertools.count(1)
+
+
+def profile_directory(value: Optional[str] = None) -> Optional[str]:
+    """Resolve the profile output directory from a --profile value or PARABEAGLE_PROFILE.
+
+    Returns:
+        Absolute path of the directory, or None when profiling is off
+    """
+    value = value or os.getenv(PROFILE_ENV)
+    return os.path.abspath(os.path.expanduser(value)) if value else None
+
+
+def write_profile(profile: cProfile.Profile, label: str, directory: str, wall_seconds: float,
+                  top: int = DEFAULT_PROFILE_TOP) -> str:
+    """Write a profile's raw stats and top-functions summary.
+
+    Returns:
+        Path of the summary file
+    """
+    os.makedirs(directory, exist_ok=True)
+    safe_label = "".join(char if char.isalnum() or char in "-_" else "_" for char in label)
+    stem = os.path.join(
+        directory,
+        f"{time.strftime('%Y%m%d-%H%M%S')}-{safe_label}-{os.getpid()}-{next(_sequence)}",
+    )
+    profile.dump_stats(f"{stem}.prof")
+
+    summary = io.StringIO()
+    summary.write(f"{label}: {wall_seconds:.3f}s wall time\n")
+    summary.write(f"Raw stats: {stem}.prof\n\n")
+    pstats.Stats(profile, stream=summary).sort_stats("cumulative").print_stats(top)
+    with open(f"{stem}.txt", "w", encoding="utf-8") as f:
+        f.write(summary.getvalue())
+    return f"{stem}.txt"
+
+
+@contextmanager
+def profiled(label: str, directory: Optional[str], top: int = DEFAULT_PROFILE_TOP):
+    """Profile the enclosed block if directory is set, otherwise do nothing.
+
+    Args:
+        label: Tool or CLI name used in the file names
+        directory: Output directory from profile_directory(), or None
+        top: Functions to list in the summary
+    """
+    if directory is None:
+        yield
+        return
+
+    profile = cProfile.Profile()
+    started = time.perf_counter()
+    try:
+        profile.enable()
+    except ValueError as e:
+        # Another call holds the process's only profiler slot (Python 3.12+)
+        print(f"[parabeagle] Not profiling {label}: {e}", file=sys.stderr, flush=True)
+        yield
+        return
+    try:
+        yield
+    finally:
+        profile.disable()
+        wall_seconds = time.perf_counter() - started
+        try:
+            path = write_profile(profile, label, directory, wall_seconds, top)
+            print(f"[parabeagle] {label} profile: {path}", file=sys.stderr, flush=True)
+        except OSError as e:
+            print(f"[parabeagle] Could not write {label} profile: {e}",
+                  file=sys.stderr, flush=True)
@@ -0,0 +1,112 @@
+"""
+Ranking helpers used by the query tools.
+
+Pure functions over ids, scores and vectors, so they can be tested without Chroma.
+NumPy is imported only when vectors are involved.
+"""
+
+from typing import Dict, Hashable, List, Optional, Sequence
+
+# Constant from the original reciprocal rank fusion paper (Cormack et al., 2009);
+# it damps the influence of the very top ranks of any single list
+RRF_K = 60
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = RRF_K) -> List[str]:
+    """Fuse several rankings of ids into one with reciprocal rank fusion.
+
+    Each id scores sum(1 / (k + rank)) over the rankings it appears in (rank from 1).
+    Ties keep the order in which ids were first seen, so the first ranking wins.
+
+    Args:
+        rankings: Lists of ids, best first
+        k: Damping constant
+
+    Returns:
+        All ids from all rankings, best fused score first
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    # sorted() is stable and dicts keep insertion order, so ties resolve by first sighting
+    return sorted(scores, key=lambda item: -scores[item])
+
+
+def diversify(
+    relevance: Sequence[float],
+    k: int,
+    embeddings: Optional[Sequence[Sequence[float]]] = None,
+    mmr_lambda: float = 0.5,
+    groups: Optional[Sequence[Hashable]] = None,
+    max_per_group: Optional[int] = None,
+) -> List[int]:
+    """Pick k candidates balancing relevance against redundancy.
+
+    With embeddings, candidates are chosen greedily by maximal marginal relevance
+    (Carbonell & Goldstein, 1998): mmr_lambda * relevance minus (1 - mmr_lambda)
+    times the highest cosine similarity to anything already chosen. Without them,
+    candidates are taken in relevance order. Either way, no more than max_per_group
+    candidates are taken from any one group.
+
+    Args:
+        relevance: Score per candidate, higher is better
+        k: Number of candidates to pick
+        embeddings: Vector per candidate, for the redundancy term
+        mmr_lambda: 1.0 ranks by relevance alone, 0.0 by novelty alone
+        groups: Group key per candidate (e.g. source file); None keys are uncapped
+        max_per_group: Most candidates to take from one group
+
+    Returns:
+        Indexes of the chosen candidates, in the order chosen
+    """
+    count = len(relevance)
+    if embeddings is None:
+        order = sorted(range(count), key=lambda i: -relevance[i])
+        return _take_capped(order, k, groups, max_per_group)
+
+    import numpy as np
+
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms == 0, 1, norms)
+    scores = np.asarray(relevance, dtype=np.float32)
+
+    chosen: List[int] = []
+    per_group: Dict[Hashable, int] = {}
+    available = np.ones(count, dtype=bool)
+    # Highest similarity of each candidate to the chosen set, updated one row at a time
+    redundancy = np.zeros(count, dtype=np.float32)
+    while len(chosen) < k and available.any():
+        marginal = mmr_lambda * scores - (1 - mmr_lambda) * redundancy if chosen else scores.copy()
+        marginal[~available] = -np.inf
+        best = int(np.argmax(marginal))
+        available[best] = False
+        group = groups[best] if groups is not None else None
+        if max_per_group is not None and group is not None:
+            if per_group.get(group, 0) >= max_per_group:
+                continue
+            per_group[group] = per_group.get(group, 0) + 1
+        chosen.append(best)
+        redundancy = np.maximum(redundancy, vectors @ vectors[best])
+    return chosen
+
+
+def _take_capped(
+    order: Sequence[int],
+    k: int,
+    groups: Optional[Sequence[Hashable]],
+    max_per_group: Optional[int],
+) -> List[int]:
+    chosen: List[int] = []
+    per_group: Dict[Hashable, int] = {}
+    for index in order:
+        if len(chosen) == k:
+            break
+        group = groups[index] if groups is not None else None
+        if max_per_group is not None and group is not None:
+            if per_group.get(group, 0) >= max_per_group:
+                continue
+            per_group[group] = per_group.get(group, 0) + 1
+        chosen.append(index)
+    return chosen
@@ -0,0 +1,117 @@
+"""
+Optional second-stage reranking of query hits.
+
+Vector search orders chunks by embedding distance, which often misjudges which
+chunk actually answers a question. A reranker scores each (query, chunk) pair
+directly and the query tools reorder their over-fetched candidates by that score.
+
+Rerankers:
+- cross-encoder: a small sentence-transformers CrossEncoder run on CPU in batches
+  (cross-encoder/ms-marco-MiniLM-L-6-v2 unless --reranker-model says otherwise)
+- lexical: a deterministic query-term overlap score, for tests and benchmarks on
+  machines without the model
+
+The model is loaded on first use; only the standard library is imported here.
+"""
+
+import hashlib
+import re
+import threading
+import time
+from typing import List, Optional, Sequence
+
+from .embeddings import normalize_query_text
+
+RERANKER_ENV = "PARABEAGLE_RERANKER"
+RERANKER_MODEL_ENV = "PARABEAGLE_RERANKER_MODEL"
+RERANKER_NONE = "none"
+RERANKER_CROSS_ENCODER = "cross-encoder"
+RERANKER_LEXICAL = "lexical"
+RERANKER_CHOICES = [RERANKER_NONE, RERANKER_CROSS_ENCODER, RERANKER_LEXICAL]
+
+DEFAULT_CROSS_ENCODER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+DEFAULT_RERANK_BATCH_SIZE = 32
+DEFAULT_RERANK_CACHE_SIZE = 4096
+
+_TERM_RE = re.compile(r"\w+")
+
+
+def query_hash(query_text: str) -> str:
+    """Hash a query for score cache keys, ignoring whitespace and Unicode form differences."""
+    return hashlib.sha1(normalize_query_text(query_text).encode("utf-8")).hexdigest()
+
+
+class CrossEncoderReranker:
+    """Scores (query, chunk) pairs with a sentence-transformers CrossEncoder on CPU."""
+
+    def __init__(self, model_name: str = DEFAULT_CROSS_ENCODER_MODEL,
+                 batch_size: int = DEFAULT_RERANK_BATCH_SIZE):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._model = None
+        self._lock = threading.Lock()
+        self.load_seconds = None
+
+    @property
+    def key(self) -> str:
+        return f"{RERANKER_CROSS_ENCODER}:{self.model_name}"
+
+    def load(self) -> None:
+        """Load the model if it isn't loaded yet."""
+        with self._lock:
+            if self._model is None:
+                started = time.perf_counter()
+                from sentence_transformers import CrossEncoder
+
+                self._model = CrossEncoder(self.model_name, device="cpu")
+                self.load_seconds = round(time.perf_counter() - started, 3)
+
+    def score(self, query_text: str, documents: Sequence[str]) -> List[float]:
+        """Score each document against the query, higher is more relevant."""
+        if not documents:
+            return []
+        self.load()
+        scores = self._model.predict(
+            [(query_text, document) for document in documents],
+            batch_size=self.batch_size,
+            show_progress_bar=False,
+        )
+        return [float(score) for score in scores]
+
+
+class LexicalReranker:
+    """Deterministic stand-in for a cross-encoder: the share of query terms in a chunk.
+
+    Ties are broken by how many of the query's adjacent term pairs appear in order.
+    """
+
+    key = RERANKER_LEXICAL
+    load_seconds = 0.0
+
+    def load(self) -> None:
+        pass
+
+    def score(self, query_text: str, documents: Sequence[str]) -> List[float]:
+        terms = _TERM_RE.findall(query_text.lower())
+        if not terms:
+            return [0.0] * len(documents)
+        unique = set(terms)
+        pairs = set(zip(terms, terms[1:], strict=False))
+        scores = []
+        for document in documents:
+            words = _TERM_RE.findall((document or "").lower())
+            present = unique.intersection(words)
+            in_order = pairs.intersection(zip(words, words[1:], strict=False))
+            scores.append(len(present) / len(unique) + 0.01 * len(in_order))
+        return scores
+
+
+def create_reranker(name: str, model_name: Optional[str] = None):
+    """Create the reranker selected by --reranker, or None for "none"."""
+    if name == RERANKER_NONE:
+        return None
+    if name == RERANKER_CROSS_ENCODER:
+        return CrossEncoderReranker(model_name or DEFAULT_CROSS_ENCODER_MODEL)
+    if name == RERANKER_LEXICAL:
+        return LexicalReranker()
+    raise ValueError(f"Unknown reranker '{name}'. Choose from: {', '.join(RERANKER_CHOICES)}")
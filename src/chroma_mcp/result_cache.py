@@ -0,0 +1,110 @@
+"""
+Versioned cache of Chroma query results.
+
+Keys combine the query parameters with the collection id and its write generation
+(see sidecar.py). A write bumps the generation, so entries made before it can
+never match again and simply age out of the LRU.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+from .embeddings import normalize_query_text
+
+DEFAULT_RESULT_CACHE_SIZE = 256
+
+_MISSING = object()
+
+
+def make_query_key(
+    collection_id: str,
+    generation: int,
+    query_texts: List[str],
+    n_results: int,
+    where: Optional[Dict],
+    where_document: Optional[Dict],
+    include: List[str],
+    mode: str = "vector",
+) -> Hashable:
+    """Build the cache key for a query ("vector" or "hybrid" mode)."""
+    return (
+        collection_id,
+        generation,
+        mode,
+        tuple(normalize_query_text(text) for text in query_texts),
+        n_results,
+        json.dumps(where, sort_keys=True, default=str),
+        json.dumps(where_document, sort_keys=True, default=str),
+        tuple(include),
+    )
+
+
+class QueryResultCache:
+    """Bounded LRU cache of query results. Safe to use from several worker threads.
+
+    Cached results are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_RESULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Look up a result, counting the hit or miss."""
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store a result, evicting the least recently used entries if full."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard_collection(self, collection_id: str) -> None:
+        """Drop every entry for a collection, e.g. after it is deleted."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == collection_id]:
+                del self._entries[key]
+
+    def resize(self, max_entries: int) -> None:
+        """Change the capacity, evicting the least recently used entries if needed."""
+        if max_entries < 0:
+            raise ValueError("Result cache size cannot be negative")
+        with self._lock:
+            self.max_entries = max_entries
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and occupancy."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
@@ -1,11 +1,9 @@
 from typing import Dict, List, TypedDict, Union
 from enum import Enum
-import chromadb
 from mcp.server.fastmcp import FastMCP
 import os
 from dotenv import load_dotenv
 import argparse
-from chromadb.config import Settings
 import ssl
 import uuid
 import time
@@ -13,22 +11,288 @@ import json
 import sqlite3
 import re
 import shutil
+import heapq
+import asyncio
+import contextvars
+import functools
+import threading
+import weakref
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
 from typing_extensions import TypedDict
 
+# chromadb (and through it numpy, onnxruntime and possibly torch) is imported on first
+# use rather than here, so the MCP handshake is not held up by seconds of imports.
+from .embeddings import (
+    DEFAULT_QUERY_CACHE_SIZE,
+    EMBEDDING_FUNCTION_CHOICES,
+    EMBEDDING_FUNCTION_ENV,
+    MPNET_768,
+    QueryEmbeddingCache,
+    embedding_function_config,
+    embedding_load_seconds,
+    embedding_model_key,
+    get_shared_embedding_function,
+    register_embedding_functions,
+    select_embedding_function,
+    shared_embedding_functions,
+)
+from .embeddings import get_embedding_function as _get_embedding_function
+from .result_cache import DEFAULT_RESULT_CACHE_SIZE, QueryResultCache, make_query_key
+from . import sidecar
+from .client_pool import DEFAULT_IDLE_SECONDS, DEFAULT_MAX_CLIENTS, ClientPool
+from .ranking import diversify, reciprocal_rank_fusion
+from .document_filters import resolve_candidates
+from .embedding_pool import DEFAULT_EMBEDDING_BATCH_SIZE, EmbeddingWorkerPool
+from .exact_search import (
+    DEFAULT_EXACT_CACHE_SIZE,
+    DEFAULT_EXACT_SEARCH_MAX_ROWS,
+    EmbeddingMatrix,
+    ExactSearchCache,
+)
+from .metrics import DEFAULT_METRICS_INTERVAL, MetricsFileWriter, ServerMetrics
+from .profiling import PROFILE_ENV, profile_directory, profiled
+from .call_control import CallControl, checkpoint, controlled, report_progress
+from .rerank import (
+    DEFAULT_RERANK_CACHE_SIZE,
+    RERANKER_CHOICES,
+    RERANKER_ENV,
+    RERANKER_MODEL_ENV,
+    RERANKER_NONE,
+    create_reranker,
+    query_hash,
+)
+from .pagination import (
+    DEFAULT_RESPONSE_BUDGET,
+    GET_RESULT_FIELDS,
+    MAX_PAGE_SIZE,
+    decode_cursor,
+    encode_cursor,
+    jsonable_rows,
+    page_size,
+    request_fingerprint,
+    slice_rows,
+    trim_to_budget,
+)
+
+# Reference point for the startup timings written to stderr
+_process_start = time.perf_counter()
+
+
+@asynccontextmanager
+async def background_tasks():
+    """Open the Chroma client and start the warm-up and metrics writer; cancel them on shutdown."""
+    tasks = []
+    if _client_args is not None:
+        loop = asyncio.get_running_loop()
+        tasks.append(loop.run_in_executor(_get_executor(), _open_client))
+    if _warmup_mode != "none":
+        tasks.append(asyncio.create_task(_run_blocking("chroma_warmup", _warm_up, _warmup_mode)))
+    if _metrics_writer is not None:
+        tasks.append(asyncio.create_task(_write_metrics_periodically(_metrics_writer)))
+    try:
+        yield {}
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        if _metrics_writer is not None:
+            _write_metrics_file(_metrics_writer)
+
+
+@asynccontextmanager
+async def server_lifespan(server: FastMCP):
+    """Run the background tasks for the life of a stdio session.
+
+    Over SSE every client connection is its own session, so the SSE app runs the
+    background tasks from its own lifespan instead, once for the whole process.
+    """
+    if _transport == "stdio":
+        async with background_tasks():
+            yield {}
+    else:
+        yield {}
+
+
+async def _write_metrics_periodically(writer: MetricsFileWriter):
+    """Rewrite the metrics file every interval, skipping intervals with no new calls."""
+    while True:
+        await asyncio.sleep(writer.interval)
+        _write_metrics_file(writer)
+
+
+def _write_metrics_file(writer: MetricsFileWriter):
+    try:
+        writer.maybe_write(_metrics, get_server_stats)
+    except OSError as e:
+        log_startup(f"Could not write metrics file {writer.path}: {str(e)}")
 
-from chromadb.api.collection_configuration import CreateCollectionConfiguration
-from chromadb.api import EmbeddingFunction
-from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
 
 # Initialize FastMCP server
-mcp = FastMCP("chroma")
+mcp = FastMCP("chroma", lifespan=server_lifespan)
+
+# "stdio" serves the one client that started the process; "sse" serves any number
+# of local clients over HTTP from one process, sharing its model, caches and workers
+TRANSPORT_CHOICES = ["stdio", "sse"]
+DEFAULT_SSE_PORT = 8765
+# The SSE endpoint has no authentication, so it only listens on loopback addresses
+LOOPBACK_HOSTS = ["127.0.0.1", "::1", "localhost"]
+# Seconds a shutting-down SSE server waits for tool calls in progress
+SSE_SHUTDOWN_SECONDS = 5
+
+_transport = "stdio"
 
 # Global variables
 _chroma_client = None
+# Stands in for _chroma_client with a persistent client, which is only kept in the pool
+_POOLED = object()
+# Why the background open at startup failed, raised to the first caller that needs the client
+_client_open_error = None
 _active_directory = None
 _directory_db_path = None
 _main_data_dir = None
 _client_args = None
+_client_lock = threading.RLock()
+
+# Blocking Chroma, SQLite and embedding work runs on a bounded thread pool so the
+# stdio event loop stays free to answer cheap calls while heavy ones are running.
+DEFAULT_WORKER_THREADS = 8
+# Threads kept out of reach of heavy tools so metadata tools never queue behind them
+RESERVED_LIGHT_THREADS = 2
+DEFAULT_TOOL_CONCURRENCY = 4
+TOOL_CONCURRENCY = {
+    "chroma_query_documents": 4,
+    "chroma_query_with_sources": 4,
+    "chroma_federated_query": 4,
+    "chroma_get_documents": 2,
+    "chroma_get_context": 2,
+    "chroma_peek_collection": 2,
+    "chroma_get_collection_info": 2,
+    "chroma_update_documents": 1,
+    "chroma_delete_documents": 1,
+    "chroma_fork_collection": 1,
+    "chroma_delete_collection": 1,
+}
+HEAVY_TOOLS = set(TOOL_CONCURRENCY)
+_HEAVY_LIMITER = "__heavy__"
+
+_worker_threads = DEFAULT_WORKER_THREADS
+_tool_concurrency = dict(TOOL_CONCURRENCY)
+_executor = None
+_executor_lock = threading.Lock()
+# asyncio semaphores are bound to the loop they first block on, so keep one set per loop
+_tool_limiters = weakref.WeakKeyDictionary()
+
+# Deadlines in seconds: --tool-timeout for every tool, --tool-timeouts per tool (0 for none).
+# There are none by default; a call past its deadline fails at once and its worker stops
+# at the next safe point, keeping any writes made before it
+_default_tool_timeout = None
+_tool_timeouts: Dict[str, float] = {}
+# Background work run on the worker pool that isn't a tool call: it never times out and
+# isn't profiled
+BACKGROUND_TASKS = {"chroma_warmup"}
+# Control of the tool call running in the current task, shared by every blocking step of
+# a call that makes several (chroma_federated_query)
+_call_control = contextvars.ContextVar("parabeagle_call_control", default=None)
+# Rows read per collection.get and documents written per collection.update between
+# cancellation checks and progress reports
+GET_BATCH_SIZE = 250
+UPDATE_BATCH_SIZE = 100
+
+# Read-only tools whose concurrent identical calls share one computation: a call made
+# while an identical one (same arguments, directory and collection write generation)
+# is still running waits for that call's result instead of running again
+COALESCED_TOOLS = {
+    "chroma_query_documents",
+    "chroma_query_with_sources",
+    "chroma_get_documents",
+    "chroma_get_context",
+    "chroma_peek_collection",
+    "chroma_get_collection_info",
+    "chroma_get_collection_count",
+}
+# Pending calls by coalescing key, one map per loop like the limiters
+_in_flight_calls = weakref.WeakKeyDictionary()
+# Calls answered by joining an identical call already in flight, by tool
+_coalesced_calls: Dict[str, int] = {}
+
+# Query texts are embedded by the server through this cache rather than by Chroma,
+# so repeated queries skip the model entirely
+_query_embedding_cache = QueryEmbeddingCache()
+# Query results keyed on the query parameters and the collection's write generation
+_query_result_cache = QueryResultCache()
+# Worker processes that embed query texts (--embedding-workers), or None to embed in-process
+_embedding_pool = None
+# Vector queries on collections up to this many chunks are answered by exact search over
+# an in-memory embedding matrix (--exact-search-max-rows, 0 to only use it when asked)
+_exact_search_max_rows = DEFAULT_EXACT_SEARCH_MAX_ROWS
+_exact_matrices = ExactSearchCache()
+# Chunk counts by (data directory, collection id), with the write generation they were read at
+_collection_counts = {}
+
+# Hybrid queries fuse this many candidates per ranking (per requested result, with a floor)
+HYBRID_CANDIDATE_FACTOR = 4
+HYBRID_MIN_CANDIDATES = 20
+# where_document filters narrowed by the trigram index to more candidates than this
+# are left to Chroma alone, since a long id list costs more than it saves
+DOCUMENT_FILTER_MAX_CANDIDATES = 1000
+
+# Diversified and reranked queries choose from this many candidates (per requested
+# result, with a floor)
+OVERFETCH_FACTOR = 4
+OVERFETCH_MIN_CANDIDATES = 20
+# Most chunks on either side of a hit that chroma_get_context returns
+MAX_CONTEXT_WINDOW = 10
+
+# Second-stage reranker selected by --reranker (None when disabled) and its scores,
+# keyed on the collection's write generation, the reranker, the query and the chunk
+_reranker = None
+_rerank_score_cache = QueryResultCache(DEFAULT_RERANK_CACHE_SIZE)
+
+# Per-tool and per-stage latencies for chroma_server_stats, and the optional file
+# they are also written to (--metrics-file)
+_metrics = ServerMetrics()
+_metrics_writer = None
+
+# Plan of the explain=True query running on each worker thread
+_explain_local = threading.local()
+
+# Directory each tool call's cProfile output is written to (--profile), or None
+_profile_dir = None
+
+# Largest serialized size of a page returned by the document-reading tools
+_response_budget = DEFAULT_RESPONSE_BUDGET
+# Per-query fields of a collection.query result besides ids
+QUERY_RESULT_FIELDS = ["embeddings", "documents", "uris", "data", "metadatas", "distances"]
+
+# Collection handles by (data directory, name), each with the write generation it was
+# fetched at; dropped on modify and delete, and when the directory's client is released
+_collection_handles = {}
+_collection_handles_lock = threading.Lock()
+
+# Open PersistentClients by directory; releasing one also drops its collection handles
+_client_pool = ClientPool(on_release=lambda path: forget_directory(path))
+
+# Warm-up loads the embedding model (and optionally opens every collection in the
+# active directory) in the background so the first real query doesn't pay for it.
+WARMUP_CHOICES = ["none", "model", "collections"]
+WARMUP_QUERY = "parabeagle warm-up"
+
+_warmup_mode = "none"
+_warmup_lock = threading.Lock()
+_warmup_status = {
+    "state": "disabled",
+    "mode": "none",
+    "error": None,
+    "model_seconds": None,
+    "reranker_seconds": None,
+    "embedding_workers_seconds": None,
+    "collections_total": 0,
+    "collections_warmed": 0,
+    "collections_seconds": None,
+    "total_seconds": None,
+}
 
 
 def create_parser():
@@ -82,7 +346,1353 @@ def create_parser():
         help="Path to .env file",
         default=os.getenv("CHROMA_DOTENV_PATH", ".chroma_env"),
     )
-    return parser
+    parser.add_argument(
+        "--embedding-function",
+        choices=EMBEDDING_FUNCTION_CHOICES,
+        default=os.getenv(EMBEDDING_FUNCTION_ENV, MPNET_768),
+        help="Embedding function for new collections "
+        "(hash-768 is a deterministic stub for tests and benchmarks)",
+    )
+    parser.add_argument(
+        "--worker-threads",
+        type=int,
+        default=int(os.getenv("PARABEAGLE_WORKER_THREADS", str(DEFAULT_WORKER_THREADS))),
+        help="Size of the thread pool that runs blocking Chroma calls",
+    )
+    parser.add_argument(
+        "--tool-concurrency",
+        default=os.getenv("PARABEAGLE_TOOL_CONCURRENCY", ""),
+        help="Per-tool concurrency limits as tool=N pairs, "
+        "e.g. chroma_query_documents=2,chroma_get_documents=1",
+    )
+    parser.add_argument(
+        "--tool-timeout",
+        type=float,
+        default=float(os.getenv("PARABEAGLE_TOOL_TIMEOUT", "0")),
+        help="Seconds a tool call may run before it fails and its work stops (0 for no limit)",
+    )
+    parser.add_argument(
+        "--tool-timeouts",
+        default=os.getenv("PARABEAGLE_TOOL_TIMEOUTS", ""),
+        help="Per-tool deadlines as tool=SECONDS pairs, overriding --tool-timeout, "
+        "e.g. chroma_delete_collection=600,chroma_get_documents=30",
+    )
+    parser.add_argument(
+        "--warmup",
+        choices=WARMUP_CHOICES,
+        default=os.getenv("PARABEAGLE_WARMUP", "model"),
+        help="What to preload in the background after startup: nothing, the embedding model, "
+        "or the model plus every collection in the active directory",
+    )
+    parser.add_argument(
+        "--query-cache-size",
+        type=int,
+        default=int(os.getenv("PARABEAGLE_QUERY_CACHE_SIZE", str(DEFAULT_QUERY_CACHE_SIZE))),
+        help="Number of query embeddings kept in the LRU cache (0 disables caching)",
+    )
+    parser.add_argument(
+        "--embedding-workers",
+        type=int,
+        default=int(os.getenv("PARABEAGLE_EMBEDDING_WORKERS", "0")),
+        help="Embed query texts in this many worker processes, each with its own copy of "
+        "the model, batching concurrent queries together (0 embeds in the server process)",
+    )
+    parser.add_argument(
+        "--embedding-batch-size",
+        type=int,
+        default=int(
+            os.getenv("PARABEAGLE_EMBEDDING_BATCH_SIZE", str(DEFAULT_EMBEDDING_BATCH_SIZE))
+        ),
+        help="Most query texts an embedding worker takes in one batch",
+    )
+    parser.add_argument(
+        "--result-cache-size",
+        type=int,
+        default=int(os.getenv("PARABEAGLE_RESULT_CACHE_SIZE", str(DEFAULT_RESULT_CACHE_SIZE))),
+        help="Number of query results kept in the LRU cache (0 disables caching)",
+    )
+    parser.add_argument(
+        "--client-pool-size",
+        type=int,
+        default=int(os.getenv("PARABEAGLE_CLIENT_POOL_SIZE", str(DEFAULT_MAX_CLIENTS))),
+        help="Number of directories whose Chroma clients are kept open for fast switching",
+    )
+    parser.add_argument(
+        "--client-idle-seconds",
+        type=float,
+        default=float(os.getenv("PARABEAGLE_CLIENT_IDLE_SECONDS", str(DEFAULT_IDLE_SECONDS))),
+        help="Close pooled clients unused for this many seconds (0 keeps them until evicted)",
+    )
+    parser.add_argument(
+        "--max-response-bytes",
+        type=int,
+        default=int(os.getenv("PARABEAGLE_MAX_RESPONSE_BYTES", str(DEFAULT_RESPONSE_BUDGET))),
+        help="Approximate size limit for one page of chroma_get_documents or "
+        "chroma_peek_collection; larger reads continue with next_cursor",
+    )
+    parser.add_argument(
+        "--transport",
+        choices=TRANSPORT_CHOICES,
+        default=os.getenv("PARABEAGLE_TRANSPORT", "stdio"),
+        help="stdio for a server per MCP client, or sse to share one server between "
+        "local clients over HTTP",
+    )
+    parser.add_argument(
+        "--sse-host",
+        default=os.getenv("PARABEAGLE_SSE_HOST", "127.0.0.1"),
+        help=f"Loopback address the SSE transport listens on ({', '.join(LOOPBACK_HOSTS)})",
+    )
+    parser.add_argument(
+        "--sse-port",
+        type=int,
+        default=int(os.getenv("PARABEAGLE_SSE_PORT", str(DEFAULT_SSE_PORT))),
+        help="Port the SSE transport listens on",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        default=os.getenv("PARABEAGLE_METRICS_FILE"),
+        help="Also write the chroma_server_stats snapshot to this JSON file",
+    )
+    parser.add_argument(
+        "--metrics-interval",
+        type=float,
+        default=float(os.getenv("PARABEAGLE_METRICS_INTERVAL", str(DEFAULT_METRICS_INTERVAL))),
+        help="Seconds between metrics file writes (skipped when no tool was called)",
+    )
+    parser.add_argument(
+        "--profile",
+        default=os.getenv(PROFILE_ENV),
+        metavar="DIR",
+        help="Profile every tool call with cProfile, writing .prof files and top-function "
+        "summaries to DIR",
+    )
+    parser.add_argument(
+        "--reranker",
+        choices=RERANKER_CHOICES,
+        default=os.getenv(RERANKER_ENV, RERANKER_NONE),
+        help="Second-stage reranker for query tools called with rerank=True "
+        "(lexical is a deterministic stand-in for tests and benchmarks)",
+    )
+    parser.add_argument(
+        "--reranker-model",
+        default=os.getenv(RERANKER_MODEL_ENV),
+        help="sentence-transformers cross-encoder model for --reranker cross-encoder",
+    )
+    parser.add_argument(
+        "--exact-search-max-rows",
+        type=int,
+        default=int(
+            os.getenv("PARABEAGLE_EXACT_SEARCH_MAX_ROWS", str(DEFAULT_EXACT_SEARCH_MAX_ROWS))
+        ),
+        help="Search collections of up to this many chunks exactly, by brute force over their "
+        "embeddings held in memory, instead of through HNSW (0 only when a query asks)",
+    )
+    parser.add_argument(
+        "--exact-cache-size",
+        type=int,
+        default=int(os.getenv("PARABEAGLE_EXACT_CACHE_SIZE", str(DEFAULT_EXACT_CACHE_SIZE))),
+        help="Number of collections whose embedding matrices are kept in memory for exact search",
+    )
+    parser.add_argument(
+        "--rerank-cache-size",
+        type=int,
+        default=int(os.getenv("PARABEAGLE_RERANK_CACHE_SIZE", str(DEFAULT_RERANK_CACHE_SIZE))),
+        help="Number of (query, chunk) rerank scores kept in the LRU cache (0 disables caching)",
+    )
+    return parser
+
+
+def parse_tool_limits(spec: str) -> Dict[str, int]:
+    """Parse a comma-separated list of tool=N pairs."""
+    limits = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        tool_name, sep, value = item.partition("=")
+        if not sep or not tool_name.strip():
+            raise ValueError(f"Invalid tool limit '{item}', expected tool=N")
+        try:
+            limits[tool_name.strip()] = int(value)
+        except ValueError:
+            raise ValueError(f"Invalid tool limit '{item}', N must be an integer") from None
+        if limits[tool_name.strip()] < 1:
+            raise ValueError(f"Invalid tool limit '{item}', N must be at least 1")
+    return limits
+
+
+def parse_tool_timeouts(spec: str) -> Dict[str, float]:
+    """Parse a comma-separated list of tool=SECONDS pairs."""
+    timeouts = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        tool_name, sep, value = item.partition("=")
+        if not sep or not tool_name.strip():
+            raise ValueError(f"Invalid tool timeout '{item}', expected tool=SECONDS")
+        try:
+            timeouts[tool_name.strip()] = float(value)
+        except ValueError:
+            raise ValueError(f"Invalid tool timeout '{item}', SECONDS must be a number") from None
+        if timeouts[tool_name.strip()] < 0:
+            raise ValueError(f"Invalid tool timeout '{item}', SECONDS can't be negative")
+    return timeouts
+
+
+def configure_tool_timeouts(default: float | None, per_tool: Dict[str, float] | None = None):
+    """Set the deadline for every tool call and per-tool overrides (0 or None for no deadline)."""
+    global _default_tool_timeout, _tool_timeouts
+
+    if default is not None and default < 0:
+        raise ValueError("Tool timeout can't be negative")
+    _default_tool_timeout = default or None
+    _tool_timeouts = dict(per_tool or {})
+
+
+def _tool_timeout(tool_name: str) -> float | None:
+    if tool_name in BACKGROUND_TASKS:
+        return None
+    return _tool_timeouts.get(tool_name, _default_tool_timeout) or None
+
+
+def configure_tool_execution(worker_threads: int, tool_concurrency: Dict[str, int] | None = None):
+    """Set the worker pool size and per-tool concurrency limits.
+
+    Must be called before the first tool call; later calls only affect new limiters.
+    """
+    global _worker_threads, _tool_concurrency, _executor
+
+    if worker_threads < 1:
+        raise ValueError("Worker thread count must be at least 1")
+
+    with _executor_lock:
+        _worker_threads = worker_threads
+        _tool_concurrency = dict(TOOL_CONCURRENCY)
+        _tool_concurrency.update(tool_concurrency or {})
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+    _tool_limiters.clear()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Get or create the worker thread pool."""
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=_worker_threads, thread_name_prefix="parabeagle-worker"
+            )
+        return _executor
+
+
+def _get_limiter(name: str) -> asyncio.Semaphore:
+    """Get the concurrency limiter for a tool (or the shared heavy-tool limiter)."""
+    loop = asyncio.get_running_loop()
+    limiters = _tool_limiters.setdefault(loop, {})
+    if name not in limiters:
+        if name == _HEAVY_LIMITER:
+            size = max(1, _worker_threads - RESERVED_LIGHT_THREADS)
+        else:
+            size = _tool_concurrency.get(name, DEFAULT_TOOL_CONCURRENCY)
+        limiters[name] = asyncio.Semaphore(size)
+    return limiters[name]
+
+
+def configure_response_budget(max_bytes: int):
+    """Set the serialized size limit for one page of documents."""
+    global _response_budget
+    if max_bytes < 1:
+        raise ValueError("Response budget must be at least 1 byte")
+    _response_budget = max_bytes
+
+
+def configure_exact_search(max_rows: int):
+    """Set the largest collection vector queries search exactly without being asked (0 for none)."""
+    global _exact_search_max_rows
+
+    if max_rows < 0:
+        raise ValueError("Exact search row limit can't be negative")
+    _exact_search_max_rows = max_rows
+
+
+def configure_reranker(name: str, model_name: str | None = None):
+    """Select the reranker used by rerank=True queries (one of RERANKER_CHOICES)."""
+    global _reranker
+    _reranker = create_reranker(name, model_name)
+    _rerank_score_cache.clear()
+
+
+def configure_embedding_workers(workers: int, batch_size: int = DEFAULT_EMBEDDING_BATCH_SIZE):
+    """Embed query texts in worker processes (0 workers embeds in the server process).
+
+    Workers preload the embedding function selected for new collections and load
+    any other model a collection uses on first need.
+    """
+    global _embedding_pool
+
+    if workers < 0:
+        raise ValueError("Embedding worker count cannot be negative")
+    previous, _embedding_pool = _embedding_pool, None
+    if previous is not None:
+        previous.shutdown()
+    if workers:
+        _embedding_pool = EmbeddingWorkerPool(
+            workers, batch_size, preload=embedding_function_config()
+        )
+
+
+def configure_transport(transport: str, host: str = "127.0.0.1", port: int = DEFAULT_SSE_PORT):
+    """Choose the MCP transport, and for SSE the loopback address and port to listen on."""
+    global _transport
+
+    if transport not in TRANSPORT_CHOICES:
+        raise ValueError(
+            f"Unknown transport '{transport}'. Choose one of: {', '.join(TRANSPORT_CHOICES)}"
+        )
+    if transport == "sse":
+        if host not in LOOPBACK_HOSTS:
+            raise ValueError(
+                "The SSE transport only listens on loopback addresses "
+                f"({', '.join(LOOPBACK_HOSTS)}), not '{host}'"
+            )
+        if not 0 < port < 65536:
+            raise ValueError(f"Invalid SSE port {port}")
+        mcp.settings.host = host
+        mcp.settings.port = port
+    _transport = transport
+
+
+def create_sse_app():
+    """Build the Starlette app serving MCP over SSE, with the background tasks in its lifespan."""
+    from starlette.applications import Starlette
+
+    sse_app = mcp.sse_app()
+    return Starlette(
+        debug=mcp.settings.debug,
+        routes=sse_app.routes,
+        lifespan=lambda app: background_tasks(),
+    )
+
+
+async def run_sse_server():
+    """Serve MCP over SSE on the configured loopback address until interrupted."""
+    import uvicorn
+
+    config = uvicorn.Config(
+        create_sse_app(),
+        host=mcp.settings.host,
+        port=mcp.settings.port,
+        log_level=mcp.settings.log_level.lower(),
+        # Open SSE streams never finish on their own, so don't wait on them forever
+        timeout_graceful_shutdown=SSE_SHUTDOWN_SECONDS,
+    )
+    await uvicorn.Server(config).serve()
+
+
+def configure_metrics_file(path: str | None, interval: float = DEFAULT_METRICS_INTERVAL):
+    """Write server stats to path every interval seconds (None to stop writing them)."""
+    global _metrics_writer
+    _metrics_writer = MetricsFileWriter(path, interval) if path else None
+
+
+def configure_profiling(directory: str | None):
+    """Profile each tool call into directory (None turns profiling off)."""
+    global _profile_dir
+    _profile_dir = profile_directory(directory) if directory else None
+
+
+def log_startup(message: str):
+    """Write a startup progress line with the time since process start to stderr."""
+    elapsed = time.perf_counter() - _process_start
+    print(f"[parabeagle +{elapsed:.2f}s] {message}", file=sys.stderr, flush=True)
+
+
+def configure_warmup(mode: str):
+    """Choose what the background warm-up preloads (one of WARMUP_CHOICES)."""
+    global _warmup_mode
+
+    if mode not in WARMUP_CHOICES:
+        raise ValueError(
+            f"Unknown warm-up mode '{mode}'. Choose one of: {', '.join(WARMUP_CHOICES)}"
+        )
+    _warmup_mode = mode
+    _set_warmup_status(
+        state="disabled" if mode == "none" else "pending",
+        mode=mode,
+        error=None,
+        model_seconds=None,
+        reranker_seconds=None,
+        embedding_workers_seconds=None,
+        collections_total=0,
+        collections_warmed=0,
+        collections_seconds=None,
+        total_seconds=None,
+    )
+
+
+def _set_warmup_status(**fields):
+    with _warmup_lock:
+        _warmup_status.update(fields)
+
+
+def get_warmup_status() -> Dict:
+    """Get a snapshot of the warm-up progress."""
+    with _warmup_lock:
+        return dict(_warmup_status)
+
+
+def _open_client():
+    """Open the Chroma client configured by main() on a worker thread.
+
+    Runs in the background so the MCP handshake doesn't wait for chromadb to import
+    and the database to open. A failure is logged and kept for the first tool call
+    that needs the client, which reports it; calls after that try to open it again.
+    """
+    global _client_open_error
+
+    started = time.perf_counter()
+    try:
+        get_chroma_client(_client_args)
+    except Exception as e:
+        log_startup(f"Failed to initialize Chroma client: {str(e)}")
+        with _client_lock:
+            _client_open_error = e
+        return
+    log_startup(
+        f"Chroma {_client_args.client_type} client ready in {time.perf_counter() - started:.2f}s"
+    )
+
+
+def configure_client(args):
+    """Keep the parsed arguments for the Chroma client, which opens in the background.
+
+    Missing required settings are reported now rather than when the client opens.
+    """
+    global _client_args
+
+    check_client_args(args)
+    with _client_lock:
+        _client_args = args
+
+
+def _warm_up(mode: str):
+    """Preload the embedding model and optionally the active directory's collections.
+
+    Runs on a worker thread. Failures are recorded in the status rather than raised,
+    since tools still work without warm-up; they just pay the load cost themselves.
+    """
+    started = time.perf_counter()
+    _set_warmup_status(state="running", mode=mode, error=None)
+
+    try:
+        step = time.perf_counter()
+        embedding_function = get_embedding_function()
+        embedding_function([WARMUP_QUERY])
+        _set_warmup_status(model_seconds=round(time.perf_counter() - step, 3))
+        log_startup(f"Embedding model ready in {time.perf_counter() - step:.2f}s")
+
+        if _embedding_pool is not None:
+            step = time.perf_counter()
+            _embedding_pool.warm_up()
+            _set_warmup_status(embedding_workers_seconds=round(time.perf_counter() - step, 3))
+            log_startup(
+                f"{_embedding_pool.workers} embedding workers ready "
+                f"in {time.perf_counter() - step:.2f}s"
+            )
+
+        if _reranker is not None:
+            step = time.perf_counter()
+            _reranker.load()
+            _set_warmup_status(reranker_seconds=round(time.perf_counter() - step, 3))
+            log_startup(f"Reranker ready in {time.perf_counter() - step:.2f}s")
+
+        if mode == "collections":
+            step = time.perf_counter()
+            collections = get_chroma_client().list_collections()
+            _set_warmup_status(collections_total=len(collections))
+            for index, collection in enumerate(collections, start=1):
+                # A one-result query loads the collection's embedding function and
+                # its HNSW segment from disk
+                if collection.count() > 0:
+                    collection.query(query_texts=[WARMUP_QUERY], n_results=1, include=[])
+                _set_warmup_status(collections_warmed=index)
+            _set_warmup_status(collections_seconds=round(time.perf_counter() - step, 3))
+            log_startup(
+                f"Warmed {len(collections)} collections in {time.perf_counter() - step:.2f}s"
+            )
+
+        _set_warmup_status(state="ready", total_seconds=round(time.perf_counter() - started, 3))
+    except Exception as e:
+        _set_warmup_status(
+            state="failed", error=str(e), total_seconds=round(time.perf_counter() - started, 3)
+        )
+        log_startup(f"Warm-up failed: {str(e)}")
+
+
+@contextmanager
+def explaining():
+    """Collect an explain plan for the query run inside the block on this thread.
+
+    While it is active, run_query bypasses the result cache and runs the filter
+    evaluation, the search and the document/metadata fetch as separate timed steps.
+    """
+    plan = {"stages_ms": {}, "candidates": {}, "result_cache": "bypassed"}
+    _explain_local.plan = plan
+    started = time.perf_counter()
+    try:
+        yield plan
+    finally:
+        _explain_local.plan = None
+        plan["stages_ms"] = {
+            stage: round(1000 * seconds, 3) for stage, seconds in plan["stages_ms"].items()
+        }
+        plan["total_ms"] = round(1000 * (time.perf_counter() - started), 3)
+
+
+def _explain_plan() -> Dict | None:
+    return getattr(_explain_local, "plan", None)
+
+
+def _record_stage(stage: str, seconds: float):
+    """Record a query stage in the server metrics and any explain plan on this thread."""
+    _metrics.record_stage(stage, seconds)
+    plan = _explain_plan()
+    if plan is not None:
+        plan["stages_ms"][stage] = plan["stages_ms"].get(stage, 0.0) + seconds
+
+
+@contextmanager
+def _stage(stage: str):
+    # Every stage of a query is a safe point to stop a cancelled call
+    checkpoint()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record_stage(stage, time.perf_counter() - started)
+
+
+def embed_queries(collection, query_texts: List[str]) -> List | None:
+    """Embed query texts for a collection through the shared query-embedding cache.
+
+    Returns:
+        One embedding per query text, or None when the collection's embedding function
+        can't be identified, in which case the caller passes query_texts to Chroma
+    """
+    ef_config = collection.configuration_json.get("embedding_function")
+    model_key = embedding_model_key(ef_config)
+    if model_key is None:
+        return None
+    pool = _embedding_pool
+
+    def embedding_function():
+        if pool is not None:
+            return pool.embedding_function(ef_config)
+        return get_shared_embedding_function(ef_config)
+
+    with _stage("embedding"):
+        return _query_embedding_cache.embed(model_key, embedding_function, query_texts)
+
+
+def get_collection(collection_name: str, data_dir: str | None = None):
+    """Get a collection handle, reusing the cached one while it is still current.
+
+    Handles are bound to the process-wide embedding function for their model, so
+    Chroma doesn't rebuild one from the stored configuration on every add or update.
+    A handle is refetched once its collection's write generation moves, which also
+    catches deletions and re-creations made by the CLI tools.
+
+    Args:
+        collection_name: Name of the collection
+        data_dir: Directory to open it from (through the client pool); defaults to
+            the active directory
+    """
+    if data_dir is None:
+        client = get_chroma_client()
+        data_dir = get_client_data_dir()
+    else:
+        data_dir = os.path.abspath(data_dir)
+        client = _client_pool.get(data_dir)
+
+    with _collection_handles_lock:
+        cached = _collection_handles.get((data_dir, collection_name))
+    if cached is not None:
+        collection, generation = cached
+        if sidecar.get_generation(data_dir, str(collection.id)) == generation:
+            return collection
+
+    collection = client.get_collection(collection_name)
+    embedding_function = get_shared_embedding_function(
+        collection.configuration_json.get("embedding_function")
+    )
+    if embedding_function is not None:
+        collection = client.get_collection(collection_name, embedding_function=embedding_function)
+
+    generation = sidecar.get_generation(data_dir, str(collection.id))
+    with _collection_handles_lock:
+        _collection_handles[(data_dir, collection_name)] = (collection, generation)
+    return collection
+
+
+def forget_collection(collection_name: str):
+    """Drop the cached handle for a collection in the current directory."""
+    with _collection_handles_lock:
+        _collection_handles.pop((get_client_data_dir(), collection_name), None)
+
+
+def forget_directory(data_dir: str | None):
+    """Drop every cached collection handle for a data directory."""
+    with _collection_handles_lock:
+        for key in [key for key in _collection_handles if key[0] == data_dir]:
+            del _collection_handles[key]
+
+
+def run_query(
+    collection,
+    query_texts: List[str],
+    n_results: int,
+    where: Dict | None,
+    where_document: Dict | None,
+    include: List[str],
+    data_dir: str | None = None,
+    query_embeddings: List | None = None,
+    hybrid: bool = False,
+    exact: bool | None = None,
+) -> Dict:
+    """Run collection.query through the result cache and the query-embedding cache.
+
+    The returned result may be shared with other callers and must not be modified.
+
+    Args:
+        data_dir: Directory the collection was opened from; defaults to the active one
+        query_embeddings: Embeddings of query_texts when the caller already has them
+        hybrid: Fuse the vector ranking with a BM25 ranking from the lexical index
+        exact: Search by brute force over the collection's embeddings (True) or
+            through HNSW (False); None picks exact search for small collections
+    """
+    collection_id = str(collection.id)
+    if data_dir is None:
+        data_dir = get_client_data_dir()
+    # Read the generation before querying: a write that lands mid-query bumps it,
+    # so the result stored below can never be served after that write
+    generation = sidecar.get_generation(data_dir, collection_id)
+    exact_search = use_exact_search(collection, data_dir, generation, exact, hybrid)
+    key = make_query_key(
+        collection_id,
+        generation,
+        query_texts,
+        n_results,
+        where,
+        where_document,
+        include,
+        mode="hybrid" if hybrid else "exact" if exact_search else "vector",
+    )
+    plan = _explain_plan()
+    if plan is not None:
+        return _explain_query(
+            plan, collection, query_texts, n_results, where, where_document, include, data_dir,
+            query_embeddings, hybrid, exact_search, generation,
+        )
+    results = _query_result_cache.get(key)
+    if results is not None:
+        return results
+
+    if query_embeddings is None:
+        query_embeddings = embed_queries(collection, query_texts)
+    if exact_search:
+        matrix = exact_matrix(collection, data_dir, generation)
+    # Collections whose model can't be identified are embedded by Chroma inside the search
+    with _stage("search"):
+        if hybrid:
+            results = _hybrid_query(
+                collection, query_texts, query_embeddings, n_results, where, where_document,
+                include, data_dir,
+            )
+        elif exact_search:
+            allowed_ids = filter_matches(collection, where, where_document, data_dir)
+            results = fetch_query_fields(
+                collection, _exact_search(matrix, query_embeddings, n_results, allowed_ids), include
+            )
+        else:
+            results = collection.query(
+                query_texts=None if query_embeddings is not None else query_texts,
+                query_embeddings=query_embeddings,
+                n_results=n_results,
+                where=where,
+                where_document=where_document,
+                ids=document_filter_candidates(collection, where_document, data_dir),
+                include=include,
+            )
+    _query_result_cache.put(key, results)
+    return results
+
+
+def _explain_query(
+    plan: Dict,
+    collection,
+    query_texts: List[str],
+    n_results: int,
+    where: Dict | None,
+    where_document: Dict | None,
+    include: List[str],
+    data_dir: str | None,
+    query_embeddings: List | None,
+    hybrid: bool,
+    exact_search: bool,
+    generation: int,
+) -> Dict:
+    """Run a query as separately timed steps, recording what each one examined.
+
+    Returns the same result as run_query. The filters are evaluated on their own
+    to count the chunks they examine and pass, and a vector search asks Chroma for
+    ids and distances only, fetching documents and metadata for the hits afterwards.
+    """
+    candidates = plan["candidates"]
+    candidates["collection_count"] = collection.count()
+    candidates["requested"] = n_results
+    plan["mode"] = "hybrid" if hybrid else "exact" if exact_search else "vector"
+
+    if query_embeddings is None:
+        query_embeddings = embed_queries(collection, query_texts)
+
+    document_ids = None
+    matches = None
+    if where or where_document:
+        with _stage("filter"):
+            document_ids = document_filter_candidates(collection, where_document, data_dir)
+            if document_ids == []:
+                matches = []
+            else:
+                matches = collection.get(
+                    ids=document_ids, where=where, where_document=where_document, include=[]
+                )["ids"]
+        if document_ids is not None:
+            candidates["document_filter"] = "trigram index"
+        elif where_document:
+            candidates["document_filter"] = "scan"
+        # Chunks Chroma checked against the filters, and the chunks that passed
+        candidates["filter_examined"] = (
+            len(document_ids) if document_ids is not None else candidates["collection_count"]
+        )
+        candidates["filter_matches"] = len(matches)
+
+    if hybrid:
+        with _stage("search"):
+            results = _hybrid_query(
+                collection, query_texts, query_embeddings, n_results, where, where_document,
+                include, data_dir,
+            )
+    else:
+        if exact_search:
+            matrix = exact_matrix(collection, data_dir, generation)
+            candidates["exact_rows"] = len(matrix)
+        with _stage("search"):
+            if exact_search:
+                results = _exact_search(matrix, query_embeddings, n_results, matches)
+            else:
+                results = dict(collection.query(
+                    query_texts=None if query_embeddings is not None else query_texts,
+                    query_embeddings=query_embeddings,
+                    n_results=n_results,
+                    where=where,
+                    where_document=where_document,
+                    ids=document_ids,
+                    include=["distances"],
+                ))
+        with _stage("fetch"):
+            results = fetch_query_fields(collection, results, include)
+
+    candidates["returned"] = [len(ids) for ids in results["ids"]]
+    return results
+
+
+def use_exact_search(
+    collection, data_dir: str | None, generation: int, exact: bool | None, hybrid: bool
+) -> bool:
+    """Decide whether a query is answered by exact search over the embedding matrix.
+
+    Exact search needs the server to embed the query itself, so collections whose
+    embedding function it can't load always go through HNSW.
+    """
+    if hybrid or exact is False:
+        return False
+    if embedding_model_key(collection.configuration_json.get("embedding_function")) is None:
+        if exact:
+            raise ValueError(
+                "exact=True needs a collection whose embedding function the server can load"
+            )
+        return False
+    if exact:
+        return True
+    if not _exact_search_max_rows:
+        return False
+
+    key = (data_dir, str(collection.id))
+    rows = _exact_matrices.size(key, generation)
+    if rows is None:
+        counted = _collection_counts.get(key)
+        if counted is not None and counted[0] == generation:
+            rows = counted[1]
+        else:
+            rows = collection.count()
+            _collection_counts[key] = (generation, rows)
+    return rows <= _exact_search_max_rows
+
+
+def exact_matrix(collection, data_dir: str | None, generation: int) -> EmbeddingMatrix:
+    """Get a collection's embedding matrix, read from Chroma unless it's cached at generation."""
+
+    def load():
+        with _stage("exact_load"):
+            stored = collection.get(include=["embeddings"])
+            return EmbeddingMatrix(
+                stored["ids"], stored["embeddings"], _collection_space(collection)
+            )
+
+    return _exact_matrices.get((data_dir, str(collection.id)), generation, load)
+
+
+def _exact_search(
+    matrix: EmbeddingMatrix, query_embeddings: List, n_results: int, allowed_ids: List[str] | None
+) -> Dict:
+    """Brute-force the nearest chunks into a collection.query-shaped result (ids and distances)."""
+    ids, distances = matrix.search(query_embeddings, n_results, allowed_ids)
+    results = {field: None for field in QUERY_RESULT_FIELDS}
+    results.update(ids=ids, distances=distances)
+    return results
+
+
+def fetch_query_fields(collection, results: Dict, include: List[str]) -> Dict:
+    """Fill in the included fields of a query result that so far has ids and distances."""
+    results = dict(results)
+    fetch_fields = [field for field in include if field != "distances"]
+    hit_ids = sorted({chunk_id for ids in results["ids"] for chunk_id in ids})
+    for field in fetch_fields:
+        results[field] = [[] for _ in results["ids"]]
+    if fetch_fields and hit_ids:
+        fetched = collection.get(ids=hit_ids, include=fetch_fields)
+        rows = {chunk_id: index for index, chunk_id in enumerate(fetched["ids"])}
+        for field in fetch_fields:
+            results[field] = [
+                [fetched[field][rows[chunk_id]] for chunk_id in ids] for ids in results["ids"]
+            ]
+    if "distances" not in include:
+        results["distances"] = None
+    results["included"] = list(include)
+    return results
+
+
+def filter_matches(
+    collection, where: Dict | None, where_document: Dict | None, data_dir: str | None
+) -> List[str] | None:
+    """Get the ids of every chunk passing a query's filters, or None when it has none."""
+    if not where and not where_document:
+        return None
+    document_ids = document_filter_candidates(collection, where_document, data_dir)
+    if document_ids == []:
+        return []
+    return collection.get(
+        ids=document_ids, where=where, where_document=where_document, include=[]
+    )["ids"]
+
+
+def ensure_lexical_index(collection, data_dir: str | None) -> int | None:
+    """Rebuild a collection's text indexes (BM25 and trigram) unless they're current.
+
+    Ingest and the server's own writes keep the index at the collection's write
+    generation; this catches collections created before it existed or written
+    without indexing. Concurrent callers wait for one rebuild instead of each
+    running their own.
+
+    Returns:
+        The write generation the indexes are current at, or None if a write
+        landed during the rebuild
+    """
+    collection_id = str(collection.id)
+    with sidecar.rebuild_lock(data_dir, collection_id):
+        generation = sidecar.text_index_generation(data_dir, collection_id)
+        if generation is None:
+            sidecar.rebuild_collection(data_dir, collection, manifest=False)
+            generation = sidecar.text_index_generation(data_dir, collection_id)
+    return generation
+
+
+def document_filter_candidates(
+    collection, where_document: Dict | None, data_dir: str | None
+) -> List[str] | None:
+    """Pre-resolve a where_document filter to candidate ids with the trigram index.
+
+    The candidates include every chunk the filter matches; Chroma still applies
+    the filter to them, so passing them as ids= never changes a result. That only
+    holds while the index is current, so the candidates are only used when it is
+    confirmed current at the collection's write generation.
+
+    Returns:
+        Candidate ids, or None when the filter can't be narrowed usefully or the
+        index is behind the collection
+    """
+    if not where_document:
+        return None
+    collection_id = str(collection.id)
+    index_checked = False
+    index_generation = None
+    stale = False
+
+    def lookup(substrings: List[str]):
+        nonlocal index_checked, index_generation, stale
+        if not index_checked:
+            index_generation = ensure_lexical_index(collection, data_dir)
+            index_checked = True
+        found = None
+        if index_generation is not None:
+            found = sidecar.substring_candidates(
+                data_dir, collection_id, substrings, generation=index_generation
+            )
+        if found is None:
+            stale = True
+            return set()
+        return found
+
+    candidates = resolve_candidates(where_document, lookup)
+    # Chroma scans the documents itself when the index may be missing chunks
+    if stale or candidates is None or len(candidates) > DOCUMENT_FILTER_MAX_CANDIDATES:
+        return None
+    return sorted(candidates)
+
+
+def _hybrid_query(
+    collection,
+    query_texts: List[str],
+    query_embeddings: List | None,
+    n_results: int,
+    where: Dict | None,
+    where_document: Dict | None,
+    include: List[str],
+    data_dir: str | None,
+) -> Dict:
+    """Rank by reciprocal rank fusion of vector and BM25 rankings, shaped like collection.query."""
+    ensure_lexical_index(collection, data_dir)
+    candidates = max(n_results * HYBRID_CANDIDATE_FACTOR, HYBRID_MIN_CANDIDATES)
+    collection_id = str(collection.id)
+    document_ids = document_filter_candidates(collection, where_document, data_dir)
+
+    fields = ["ids"] + [field for field in QUERY_RESULT_FIELDS if field in include]
+    merged = {
+        field: (None if field not in fields else []) for field in ["ids"] + QUERY_RESULT_FIELDS
+    }
+    merged["included"] = list(include)
+    for index, query_text in enumerate(query_texts):
+        query_args = (
+            {"query_embeddings": [query_embeddings[index]]}
+            if query_embeddings is not None
+            else {"query_texts": [query_text]}
+        )
+        vector_ids = collection.query(
+            n_results=candidates,
+            where=where,
+            where_document=where_document,
+            ids=document_ids,
+            include=[],
+            **query_args,
+        )["ids"][0]
+
+        lexical_ids = [
+            chunk_id
+            for chunk_id, _ in sidecar.lexical_search(
+                data_dir, collection_id, query_text, candidates
+            )
+        ]
+        if lexical_ids and (where or where_document):
+            # Lexical hits must pass the same filters as the vector search
+            allowed = set(
+                collection.get(
+                    ids=lexical_ids, where=where, where_document=where_document, include=[]
+                )["ids"]
+            )
+            lexical_ids = [chunk_id for chunk_id in lexical_ids if chunk_id in allowed]
+
+        fused = reciprocal_rank_fusion([vector_ids, lexical_ids])[:n_results]
+        if not fused:
+            for field in fields:
+                merged[field].append([])
+            continue
+
+        # Restricting the search to the fused ids fetches everything requested,
+        # including distances for hits that only the lexical ranking found
+        result = collection.query(ids=fused, n_results=len(fused), include=include, **query_args)
+        order = {chunk_id: rank for rank, chunk_id in enumerate(fused)}
+        positions = sorted(range(len(result["ids"][0])), key=lambda i: order[result["ids"][0][i]])
+        for field in fields:
+            merged[field].append([result[field][0][i] for i in positions])
+    return merged
+
+
+def _per_query_fields(results: Dict) -> List[str]:
+    """Fields of a query result that hold one list per query."""
+    fields = QUERY_RESULT_FIELDS + ["rerank_scores"]
+    return ["ids"] + [field for field in fields if results.get(field) is not None]
+
+
+def rerank_results(
+    collection, results: Dict, query_texts: List[str], data_dir: str | None = None,
+    top_k: int | None = None,
+) -> Dict:
+    """Reorder each query's hits by the configured reranker's score.
+
+    Scores are cached per collection generation, reranker, query and chunk, so
+    paging through or repeating a query only scores chunks it hasn't seen.
+
+    Args:
+        results: collection.query result with documents
+        data_dir: Directory the collection was opened from; defaults to the active one
+        top_k: Keep this many hits per query (all of them if None)
+
+    Returns:
+        A new result with "rerank_scores" added (results itself may be cached and is
+        not modified)
+    """
+    if _reranker is None:
+        raise ValueError("No reranker is configured; start the server with --reranker")
+    if data_dir is None:
+        data_dir = get_client_data_dir()
+    collection_id = str(collection.id)
+    generation = sidecar.get_generation(data_dir, collection_id)
+
+    fields = _per_query_fields(results)
+    reranked = {field: [] for field in fields}
+    reranked["rerank_scores"] = []
+    for query_idx, query_text in enumerate(query_texts):
+        ids = results["ids"][query_idx]
+        documents = results["documents"][query_idx]
+        prefix = (collection_id, generation, _reranker.key, query_hash(query_text))
+        scores = [_rerank_score_cache.get(prefix + (chunk_id,)) for chunk_id in ids]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if missing:
+            with _stage("rerank"):
+                fresh = _reranker.score(query_text, [documents[i] or "" for i in missing])
+            for i, score in zip(missing, fresh, strict=True):
+                scores[i] = score
+                _rerank_score_cache.put(prefix + (ids[i],), score)
+
+        # Stable, so equal scores keep their vector (or fused) order
+        order = sorted(range(len(ids)), key=lambda i: -scores[i])[:top_k]
+        for field in fields:
+            if field != "rerank_scores":
+                reranked[field].append([results[field][query_idx][i] for i in order])
+        reranked["rerank_scores"].append([scores[i] for i in order])
+    return {**results, **reranked}
+
+
+def diversify_results(
+    results: Dict, n_results: int, mmr_lambda: float | None, max_per_source: int | None
+) -> Dict:
+    """Pick n_results of the over-fetched hits of each query for variety.
+
+    Args:
+        results: collection.query result with distances, metadatas and, for MMR, embeddings
+        mmr_lambda: Relevance/variety balance for maximal marginal relevance, or None
+            to keep distance order
+        max_per_source: Most hits to keep from one "source" file
+
+    Returns:
+        A new result of the same shape (results itself may be cached and is not modified).
+        Reranked results are diversified by rerank score instead of distance.
+    """
+    fields = _per_query_fields(results)
+    picked = {field: [] for field in fields}
+    for query_idx, distances in enumerate(results["distances"]):
+        metadatas = results["metadatas"][query_idx]
+        if results.get("rerank_scores") is not None:
+            # Cross-encoder logits are unbounded; rescale to [0, 1] so they stay on
+            # the same footing as MMR's cosine redundancy term
+            scores = results["rerank_scores"][query_idx]
+            low, high = (min(scores), max(scores)) if scores else (0.0, 0.0)
+            relevance = [(score - low) / (high - low) if high > low else 1.0 for score in scores]
+        else:
+            relevance = [-distance for distance in distances]
+        chosen = diversify(
+            relevance,
+            n_results,
+            embeddings=results["embeddings"][query_idx] if mmr_lambda is not None else None,
+            mmr_lambda=mmr_lambda if mmr_lambda is not None else 1.0,
+            groups=[meta.get("source") if meta else None for meta in metadatas],
+            max_per_group=max_per_source,
+        )
+        for field in fields:
+            picked[field].append([results[field][query_idx][i] for i in chosen])
+    return {**results, **picked}
+
+
+def get_context_windows(collection, ids: List[str], window: int, data_dir: str | None) -> Dict:
+    """Fetch the chunks within window positions of each chunk in its source document.
+
+    Returns:
+        Map of chunk id to {"source", "chunks"}, where chunks are dicts with id,
+        chunk_index, document and metadata in document order; ids the manifest
+        can't place in a document are left out
+    """
+    sidecar.ensure_manifest(data_dir, collection)
+    windows = sidecar.chunk_windows(data_dir, str(collection.id), ids, window, window)
+    needed = list(
+        dict.fromkeys(chunk_id for _, chunks in windows.values() for chunk_id, _ in chunks)
+    )
+    if not needed:
+        return {}
+    stored = collection.get(ids=needed, include=["documents", "metadatas"])
+    rows = {
+        chunk_id: (document, metadata)
+        for chunk_id, document, metadata in zip(
+            stored["ids"], stored["documents"], stored["metadatas"], strict=True
+        )
+    }
+    return {
+        hit_id: {
+            "source": source,
+            "chunks": [
+                {
+                    "id": chunk_id,
+                    "chunk_index": chunk_index,
+                    "document": rows[chunk_id][0],
+                    "metadata": rows[chunk_id][1],
+                }
+                for chunk_id, chunk_index in chunks
+                if chunk_id in rows
+            ],
+        }
+        for hit_id, (source, chunks) in windows.items()
+    }
+
+
+def record_collection_write(collection_id: str, deleted: bool = False, indexed: bool = False):
+    """Bump a collection's write generation so cached results for it are never reused.
+
+    indexed says the write was applied to the text index too, so it stays current.
+    """
+    sidecar.bump_generation(get_client_data_dir(), collection_id, indexed=indexed)
+    if deleted:
+        _query_result_cache.discard_collection(collection_id)
+        _exact_matrices.discard_collection(collection_id)
+
+
+async def _run_blocking(tool_name: str, func, *args, control: CallControl | None = None):
+    """Run blocking work for a tool on the worker pool, honoring its concurrency limits.
+
+    control is the call's control when it was made in advance, as for a coalesced call.
+    """
+    limiters = [_get_limiter(tool_name)]
+    if tool_name in HEAVY_TOOLS:
+        limiters.append(_get_limiter(_HEAVY_LIMITER))
+
+    call = functools.partial(func, *args)
+    if _profile_dir is not None and tool_name not in BACKGROUND_TASKS:
+        call = functools.partial(_run_profiled, tool_name, _profile_dir, call)
+
+    async def run_limited(control: CallControl):
+        acquired = []
+        try:
+            for limiter in limiters:
+                await limiter.acquire()
+                acquired.append(limiter)
+            loop = asyncio.get_running_loop()
+            work = loop.run_in_executor(
+                _get_executor(), functools.partial(_run_controlled, control, call)
+            )
+        except BaseException:
+            for limiter in acquired:
+                limiter.release()
+            raise
+        # A call that times out or is cancelled stops waiting at once, but its worker runs
+        # on to its next checkpoint; the slots are held until the worker is done
+        work.add_done_callback(functools.partial(_release_limiters, acquired))
+        return await asyncio.shield(work)
+
+    async with _tool_call(tool_name, control) as control:
+        # The deadline covers the wait for a slot; the worker itself stops at its next
+        # checkpoint, as threads can't be interrupted
+        try:
+            return await asyncio.wait_for(run_limited(control), control.remaining())
+        except asyncio.TimeoutError:
+            if not control.expired:
+                raise
+            control.check()
+
+
+@asynccontextmanager
+async def _tool_call(tool_name: str, control: CallControl | None = None):
+    """Give a tool call its deadline, cancellation flag and progress notifications.
+
+    The call's latency and outcome are recorded in the server metrics once, here;
+    blocking steps run inside a call that already has a control share it and are
+    not counted as calls of their own. A control made in advance is used as given.
+    """
+    current = _call_control.get()
+    if current is not None:
+        yield current
+        return
+
+    if control is None:
+        control = CallControl(tool_name, _tool_timeout(tool_name), _progress_sender())
+    token = _call_control.set(control)
+    # Latency includes time spent waiting for a concurrency slot
+    started = time.perf_counter()
+    failed = True
+    _metrics.begin_call(tool_name)
+    try:
+        yield control
+        failed = False
+    except asyncio.CancelledError:
+        # The client cancelled the request (or the server is shutting down)
+        control.cancel("was cancelled")
+        raise
+    finally:
+        _call_control.reset(token)
+        _metrics.record_call(tool_name, time.perf_counter() - started, error=failed)
+
+
+def _progress_sender():
+    """Get a thread-safe callback sending progress notifications for the current request.
+
+    Returns None outside an MCP request or when the client sent no progress token.
+    """
+    try:
+        request_context = mcp.get_context().request_context
+    except ValueError:
+        return None
+    meta = request_context.meta
+    progress_token = meta.progressToken if meta is not None else None
+    if progress_token is None:
+        return None
+    session = request_context.session
+    loop = asyncio.get_running_loop()
+
+    def send(done, total):
+        asyncio.run_coroutine_threadsafe(
+            session.send_progress_notification(progress_token, done, total), loop
+        )
+
+    return send
+
+
+def _release_limiters(limiters: List[asyncio.Semaphore], work: asyncio.Future):
+    for limiter in limiters:
+        limiter.release()
+    # The caller may have stopped waiting; fetch the outcome so it isn't reported as lost
+    if not work.cancelled():
+        work.exception()
+
+
+def _run_controlled(control: CallControl, call):
+    # Work that waited in the queue past its deadline or a cancellation never starts
+    control.check()
+    # Clients the pool releases while this runs are closed only after it returns
+    with controlled(control), _client_pool.lease():
+        return call()
+
+
+async def _run_coalesced(tool_name: str, collection_name: str, func, *args, coalesce: bool = True):
+    """Run a read-only tool call, sharing the result of an identical call already in flight.
+
+    Calls are only coalesced once the collection's handle is cached, since its write
+    generation is part of the key; a write that lands while a call is running gives
+    later calls a new key, so they never receive a result from before the write.
+    coalesce=False runs the call on its own.
+    """
+    key = _coalescing_key(tool_name, collection_name, args) if coalesce else None
+    if key is None:
+        return await _run_blocking(tool_name, func, *args)
+
+    loop = asyncio.get_running_loop()
+    pending = _in_flight_calls.get(loop)
+    if pending is None:
+        pending = _in_flight_calls[loop] = {}
+    shared = pending.get(key)
+    if shared is None:
+        shared = pending[key] = _SharedCall(tool_name)
+        shared.task = loop.create_task(
+            _run_blocking(tool_name, func, *args, control=shared.control)
+        )
+
+        def finished(_):
+            if pending.get(key) is shared:
+                del pending[key]
+
+        shared.task.add_done_callback(finished)
+    else:
+        _coalesced_calls[tool_name] = _coalesced_calls.get(tool_name, 0) + 1
+
+    sender = _progress_sender()
+    shared.join(sender)
+    try:
+        # A caller that is cancelled stops waiting without cancelling the others' call
+        return await asyncio.shield(shared.task)
+    finally:
+        if shared.leave(sender) and not shared.task.done():
+            # Nobody is waiting for the result any more; later calls start afresh
+            if pending.get(key) is shared:
+                del pending[key]
+            shared.task.cancel()
+
+
+class _SharedCall:
+    """A coalesced call's task and control, and the callers waiting on its result."""
+
+    def __init__(self, tool_name: str):
+        self.task = None
+        self.waiters = 0
+        self.senders = []
+        self.control = CallControl(tool_name, _tool_timeout(tool_name), self.send)
+
+    def join(self, sender) -> None:
+        self.waiters += 1
+        if sender is not None:
+            self.senders.append(sender)
+
+    def leave(self, sender) -> bool:
+        """Stop waiting; returns True if this was the last waiter."""
+        self.waiters -= 1
+        if sender is not None:
+            self.senders.remove(sender)
+        return self.waiters == 0
+
+    def send(self, done, total):
+        # Called from the worker thread; every caller still waiting gets the report
+        for sender in list(self.senders):
+            sender(done, total)
+
+
+def _coalescing_key(tool_name: str, collection_name: str, args) -> tuple | None:
+    data_dir = get_client_data_dir()
+    with _collection_handles_lock:
+        cached = _collection_handles.get((data_dir, collection_name))
+    if cached is None:
+        return None
+    collection_id = str(cached[0].id)
+    generation = sidecar.get_generation(data_dir, collection_id)
+    return (
+        tool_name,
+        data_dir,
+        collection_id,
+        generation,
+        json.dumps(args, sort_keys=True, default=str),
+    )
+
+
+def get_coalescing_stats() -> Dict:
+    """Get how many calls joined an identical call in flight, and how many are pending."""
+    pending = sum(len(calls) for calls in list(_in_flight_calls.values()))
+    return {
+        "joined": dict(sorted(_coalesced_calls.items())),
+        "pending": pending,
+    }
+
+
+def _run_profiled(tool_name: str, directory: str, call):
+    # cProfile only sees the thread it is enabled on, so profile inside the worker
+    with profiled(tool_name, directory):
+        return call()
 
 
 def init_directory_db(db_path: str):
@@ -155,7 +1765,7 @@ def add_directory(name: str) -> bool:
         try:
             os.makedirs(full_path, exist_ok=True)
         except OSError as e:
-            raise ValueError(f"Could not create directory {full_path}: {e}")
+            raise ValueError(f"Could not create directory {full_path}: {e}") from e
 
     if not os.path.isdir(full_path):
         raise ValueError(f"Path is not a directory: {full_path}")
@@ -173,8 +1783,8 @@ def add_directory(name: str) -> bool:
         )
         conn.commit()
         return True
-    except sqlite3.IntegrityError:
-        raise ValueError(f"Directory name '{name}' already exists")
+    except sqlite3.IntegrityError as e:
+        raise ValueError(f"Directory name '{name}' already exists") from e
     finally:
         conn.close()
 
@@ -244,8 +1854,9 @@ def set_active_directory(name: str) -> str:
     conn.close()
 
     # Reset the chroma client to use new directory
-    _chroma_client = None
-    _active_directory = directory_path
+    with _client_lock:
+        _chroma_client = None
+        _active_directory = directory_path
 
     return directory_path
 
@@ -274,19 +1885,38 @@ def get_active_directory() -> str:
     return None
 
 
+def get_client_data_dir() -> str | None:
+    """Get the data directory of the persistent client, or None for other client types."""
+    if not _client_args or _client_args.client_type != "persistent":
+        return None
+    data_dir = get_active_directory() or _client_args.data_dir
+    return os.path.abspath(data_dir) if data_dir else None
+
+
 def get_chroma_client(args=None):
-    """Get or create the global Chroma client instance."""
+    """Get or create the global Chroma client instance (safe to call from worker threads)."""
+    global _client_open_error
+
+    with _client_lock:
+        if _client_open_error is not None:
+            error, _client_open_error = _client_open_error, None
+            raise error
+        return _get_chroma_client_locked(args)
+
+
+def _get_chroma_client_locked(args=None):
+    """Get or create the global Chroma client; the caller holds _client_lock."""
     global _chroma_client, _active_directory, _client_args
-    
-    # For persistent clients, always check if active directory has changed
-    if _chroma_client is not None and _client_args and _client_args.client_type == "persistent":
-        current_active = get_active_directory()
-        if current_active != _active_directory:
-            # Active directory changed, reset client
-            _chroma_client = None
-            _active_directory = current_active
-    
+
+    # Persistent clients live only in the pool and are looked up on every call
+    if _chroma_client is _POOLED:
+        return _active_persistent_client()
+
     if _chroma_client is None:
+        import chromadb
+
+        register_embedding_functions()
+
         if args is None:
             # Create parser and parse args if not provided
             parser = create_parser()
@@ -294,14 +1924,13 @@ def get_chroma_client(args=None):
 
         # Store args for future reference
         _client_args = args
+        select_embedding_function(getattr(args, "embedding_function", None))
         
         # Load environment variables from .env file if it exists
         load_dotenv(dotenv_path=args.dotenv_path)
+        check_client_args(args)
         if args.client_type == "http":
-            if not args.host:
-                raise ValueError(
-                    "Host must be provided via --host flag or CHROMA_HOST environment variable when using HTTP client"
-                )
+            from chromadb.config import Settings
 
             settings = Settings()
             if args.custom_auth_credentials:
@@ -330,19 +1959,6 @@ def get_chroma_client(args=None):
                 raise
 
         elif args.client_type == "cloud":
-            if not args.tenant:
-                raise ValueError(
-                    "Tenant must be provided via --tenant flag or CHROMA_TENANT environment variable when using cloud client"
-                )
-            if not args.database:
-                raise ValueError(
-                    "Database must be provided via --database flag or CHROMA_DATABASE environment variable when using cloud client"
-                )
-            if not args.api_key:
-                raise ValueError(
-                    "API key must be provided via --api-key flag or CHROMA_API_KEY environment variable when using cloud client"
-                )
-
             try:
                 _chroma_client = chromadb.HttpClient(
                     host="api.trychroma.com",
@@ -363,21 +1979,54 @@ def get_chroma_client(args=None):
                 raise
 
         elif args.client_type == "persistent":
-            # Use active directory if available, otherwise fall back to args.data_dir
-            active_dir = get_active_directory()
-            data_dir = active_dir if active_dir else args.data_dir
-
-            if not data_dir:
-                raise ValueError(
-                    "Data directory must be provided via --data-dir flag when using persistent client"
-                )
-            _chroma_client = chromadb.PersistentClient(path=data_dir)
+            client = _active_persistent_client()
+            _chroma_client = _POOLED
+            return client
         else:  # ephemeral
             _chroma_client = chromadb.EphemeralClient()
 
     return _chroma_client
 
 
+def check_client_args(args):
+    """Raise ValueError if args lack a setting their client type can't be opened without."""
+    if args.client_type == "http":
+        if not args.host:
+            raise ValueError(
+                "Host must be provided via --host flag or CHROMA_HOST environment variable "
+                "when using HTTP client"
+            )
+    elif args.client_type == "cloud":
+        if not args.tenant:
+            raise ValueError(
+                "Tenant must be provided via --tenant flag or CHROMA_TENANT environment variable "
+                "when using cloud client"
+            )
+        if not args.database:
+            raise ValueError(
+                "Database must be provided via --database flag or CHROMA_DATABASE environment "
+                "variable when using cloud client"
+            )
+        if not args.api_key:
+            raise ValueError(
+                "API key must be provided via --api-key flag or CHROMA_API_KEY environment "
+                "variable when using cloud client"
+            )
+
+
+def _active_persistent_client():
+    """Get the pooled client for the active directory, pinned so the pool never releases it."""
+    # Use active directory if available, otherwise fall back to --data-dir
+    data_dir = get_active_directory() or _client_args.data_dir
+    if not data_dir:
+        raise ValueError(
+            "Data directory must be provided via --data-dir flag when using persistent client"
+        )
+    # Directories stay open in the pool, so switching back is instant
+    _client_pool.pin(data_dir)
+    return _client_pool.get(data_dir)
+
+
 ##### Collection Tools #####
 
 
@@ -392,6 +2041,10 @@ async def chroma_list_collections(limit: int | None = None, offset: int | None =
     Returns:
         Directory path followed by newline-separated list of collection names, or "No collections found" if database is empty
     """
+    return await _run_blocking("chroma_list_collections", _list_collections, limit, offset)
+
+
+def _list_collections(limit: int | None, offset: int | None) -> str:
     client = get_chroma_client()
     try:
         colls = client.list_collections(limit=limit, offset=offset)
@@ -414,10 +2067,8 @@ async def chroma_list_collections(limit: int | None = None, offset: int | None =
 
 
 def get_embedding_function():
-    """Get the mpnet-768 embedding function (768 dimensions, best quality)."""
-    return SentenceTransformerEmbeddingFunction(
-        model_name="sentence-transformers/all-mpnet-base-v2"
-    )
+    """Get the selected embedding function (mpnet-768 unless --embedding-function overrides it)."""
+    return _get_embedding_function()
 
 
 @mcp.tool()
@@ -426,7 +2077,7 @@ async def chroma_create_collection(
     metadata: Dict | None = None,
     space: str = "cosine",
 ) -> str:
-    """Create a new Chroma collection with mpnet-768 embeddings and configurable distance metric.
+    """Create a new Chroma collection with 768-dimension embeddings and a chosen distance metric.
 
     Args:
         collection_name: Name of the collection to create
@@ -434,11 +2085,19 @@ async def chroma_create_collection(
         space: Distance function for vector similarity (default: cosine).
                Options: 'cosine' (cosine similarity), 'l2' (Euclidean distance), 'ip' (inner product)
     """
+    return await _run_blocking(
+        "chroma_create_collection", _create_collection, collection_name, metadata, space
+    )
+
+
+def _create_collection(collection_name: str, metadata: Dict | None, space: str) -> str:
     client = get_chroma_client()
 
     embedding_function = get_embedding_function()
 
-    # Create configuration with mpnet-768 embedding function
+    # Create configuration with the selected 768-dimension embedding function
+    from chromadb.api.collection_configuration import CreateCollectionConfiguration
+
     configuration = CreateCollectionConfiguration(embedding_function=embedding_function)
 
     # Prepare metadata with HNSW space configuration
@@ -451,6 +2110,8 @@ async def chroma_create_collection(
             configuration=configuration,
             metadata=collection_metadata
         )
+        # A handle cached under this name belonged to an earlier, deleted collection
+        forget_collection(collection_name)
         config_msg = f" with configuration: {configuration}"
         return f"Successfully created collection {collection_name}{config_msg}"
     except Exception as e:
@@ -458,18 +2119,28 @@ async def chroma_create_collection(
 
 
 @mcp.tool()
-async def chroma_peek_collection(collection_name: str, limit: int = 5) -> Dict:
+async def chroma_peek_collection(
+    collection_name: str, limit: int = 5, include_embeddings: bool = False
+) -> Dict:
     """Peek at documents in a Chroma collection.
 
     Args:
         collection_name: Name of the collection to peek into
-        limit: Number of documents to peek at
+        limit: Number of documents to peek at (fewer if the response would be too large)
+        include_embeddings: Also return each document's embedding (large)
     """
-    client = get_chroma_client()
+    return await _run_coalesced(
+        "chroma_peek_collection", collection_name, _peek_collection,
+        collection_name, limit, include_embeddings,
+    )
+
+
+def _peek_collection(collection_name: str, limit: int, include_embeddings: bool) -> Dict:
     try:
-        collection = client.get_collection(collection_name)
-        results = collection.peek(limit=limit)
-        return results
+        collection = get_collection(collection_name)
+        include = ["documents", "metadatas"] + (["embeddings"] if include_embeddings else [])
+        results = jsonable_rows(collection.get(limit=min(limit, MAX_PAGE_SIZE), include=include))
+        return slice_rows(results, trim_to_budget(results, _response_budget))
     except Exception as e:
         raise Exception(f"Failed to peek collection '{collection_name}': {str(e)}") from e
 
@@ -481,15 +2152,20 @@ async def chroma_get_collection_info(collection_name: str) -> Dict:
     Args:
         collection_name: Name of the collection to get info about
     """
-    client = get_chroma_client()
+    return await _run_coalesced(
+        "chroma_get_collection_info", collection_name, _get_collection_info, collection_name
+    )
+
+
+def _get_collection_info(collection_name: str) -> Dict:
     try:
-        collection = client.get_collection(collection_name)
+        collection = get_collection(collection_name)
 
         # Get collection count
         count = collection.count()
 
-        # Peek at a few documents
-        peek_results = collection.peek(limit=3)
+        # Peek at a few documents, leaving out their embeddings
+        peek_results = collection.get(limit=3, include=["documents", "metadatas"])
 
         return {"name": collection_name, "count": count, "sample_documents": peek_results}
     except Exception as e:
@@ -503,9 +2179,14 @@ async def chroma_get_collection_count(collection_name: str) -> int:
     Args:
         collection_name: Name of the collection to count
     """
-    client = get_chroma_client()
+    return await _run_coalesced(
+        "chroma_get_collection_count", collection_name, _get_collection_count, collection_name
+    )
+
+
+def _get_collection_count(collection_name: str) -> int:
     try:
-        collection = client.get_collection(collection_name)
+        collection = get_collection(collection_name)
         return collection.count()
     except Exception as e:
         raise Exception(f"Failed to get collection count for '{collection_name}': {str(e)}") from e
@@ -524,10 +2205,20 @@ async def chroma_modify_collection(
         new_name: Optional new name for the collection
         new_metadata: Optional new metadata for the collection
     """
-    client = get_chroma_client()
+    return await _run_blocking(
+        "chroma_modify_collection", _modify_collection, collection_name, new_name, new_metadata
+    )
+
+
+def _modify_collection(
+    collection_name: str, new_name: str | None, new_metadata: Dict | None
+) -> str:
     try:
-        collection = client.get_collection(collection_name)
+        collection = get_collection(collection_name)
         collection.modify(name=new_name, metadata=new_metadata)
+        forget_collection(collection_name)
+        # Renames and metadata changes leave the chunk text as it was
+        record_collection_write(str(collection.id), indexed=True)
 
         modified_aspects = []
         if new_name:
@@ -552,10 +2243,16 @@ async def chroma_fork_collection(
         new_collection_name: Name of the new collection to create
         metadata: Optional metadata dict to add to the new collection
     """
-    client = get_chroma_client()
+    return await _run_blocking(
+        "chroma_fork_collection", _fork_collection, collection_name, new_collection_name
+    )
+
+
+def _fork_collection(collection_name: str, new_collection_name: str) -> str:
     try:
-        collection = client.get_collection(collection_name)
-        collection.fork(new_collection_name)
+        collection = get_collection(collection_name)
+        forked = collection.fork(new_collection_name)
+        sidecar.copy_collection(get_client_data_dir(), str(collection.id), str(forked.id))
         return f"Successfully forked collection {collection_name} to {new_collection_name}"
     except Exception as e:
         raise Exception(f"Failed to fork collection '{collection_name}': {str(e)}") from e
@@ -568,10 +2265,14 @@ async def chroma_delete_collection(collection_name: str) -> str:
     Args:
         collection_name: Name of the collection to delete
     """
+    return await _run_blocking("chroma_delete_collection", _delete_collection, collection_name)
+
+
+def _delete_collection(collection_name: str) -> str:
     client = get_chroma_client()
     try:
         # Get the collection first to retrieve its UUID and segment IDs before deletion
-        collection = client.get_collection(collection_name)
+        collection = get_collection(collection_name)
         collection_id = str(collection.id)
 
         # Get segment IDs from the ChromaDB database before deleting the collection
@@ -595,8 +2296,12 @@ async def chroma_delete_collection(collection_name: str) -> str:
                         # Log but don't fail if we can't read segments
                         pass
 
-        # Delete the collection from ChromaDB
+        # Past this point the delete is carried through, so cleanup is never left half done
+        checkpoint()
         client.delete_collection(collection_name)
+        forget_collection(collection_name)
+        record_collection_write(collection_id, deleted=True)
+        sidecar.drop_collection(get_client_data_dir(), collection_id)
 
         # Clean up persistent files if using persistent client
         if _client_args and _client_args.client_type == "persistent" and segment_ids:
@@ -607,7 +2312,7 @@ async def chroma_delete_collection(collection_name: str) -> str:
                 cleaned_dirs = []
                 failed_dirs = []
 
-                for segment_id in segment_ids:
+                for index, segment_id in enumerate(segment_ids, 1):
                     segment_dir = os.path.join(data_dir, segment_id)
                     if os.path.exists(segment_dir):
                         try:
@@ -615,6 +2320,7 @@ async def chroma_delete_collection(collection_name: str) -> str:
                             cleaned_dirs.append(segment_id)
                         except Exception as cleanup_error:
                             failed_dirs.append((segment_id, str(cleanup_error)))
+                    report_progress(index, len(segment_ids))
 
                 if cleaned_dirs and not failed_dirs:
                     return f"Successfully deleted collection {collection_name} and cleaned up {len(cleaned_dirs)} segment directories"
@@ -639,7 +2345,7 @@ async def chroma_list_directories() -> str:
         Formatted string showing directory name, path, and active status
     """
     try:
-        directories = list_directories()
+        directories = await _run_blocking("chroma_list_directories", list_directories)
 
         if not directories:
             return "No directories configured"
@@ -666,7 +2372,7 @@ async def chroma_add_directory(name: str) -> str:
         Success message
     """
     try:
-        add_directory(name)
+        await _run_blocking("chroma_add_directory", add_directory, name)
         full_path = os.path.join(_main_data_dir, name) if _main_data_dir else name
         return f"Successfully added directory '{name}' -> {full_path}"
 
@@ -685,7 +2391,7 @@ async def chroma_remove_directory(name: str) -> str:
         Success message
     """
     try:
-        if remove_directory(name):
+        if await _run_blocking("chroma_remove_directory", remove_directory, name):
             return f"Successfully removed directory '{name}'"
         else:
             return f"Directory '{name}' not found"
@@ -705,7 +2411,9 @@ async def chroma_set_active_directory(name: str) -> str:
         Success message with new active directory path
     """
     try:
-        directory_path = set_active_directory(name)
+        directory_path = await _run_blocking(
+            "chroma_set_active_directory", set_active_directory, name
+        )
         return f"Successfully set active directory to '{name}' -> {directory_path}"
 
     except Exception as e:
@@ -720,7 +2428,7 @@ async def chroma_get_active_directory() -> str:
         Current active directory information
     """
     try:
-        directories = list_directories()
+        directories = await _run_blocking("chroma_get_active_directory", list_directories)
         active_dirs = [d for d in directories if d["is_active"]]
 
         if not active_dirs:
@@ -733,6 +2441,92 @@ async def chroma_get_active_directory() -> str:
         raise Exception(f"Failed to get active directory: {str(e)}") from e
 
 
+##### Server Status Tools #####
+
+
+@mcp.tool()
+async def chroma_get_warmup_status() -> Dict:
+    """Report the progress of the background warm-up started at server boot.
+
+    Returns:
+        Dictionary with the warm-up state (disabled, pending, running, ready or failed),
+        the mode, how many collections have been opened so far, timings in seconds and
+        any error message
+    """
+    return get_warmup_status()
+
+
+@mcp.tool()
+async def chroma_get_cache_stats() -> Dict:
+    """Report hit/miss counters and occupancy of the server's caches.
+
+    Returns:
+        Dictionary keyed by cache name. "query_embeddings", "query_results" and
+        "rerank_scores" have hits, misses, hit_rate, entries and max_entries;
+        "exact_search" also has the rows and bytes of the embedding matrices held
+        for exact search (a miss is a matrix load); "collection_handles" has the
+        number of cached handles; "client_pool" lists the open directories;
+        "embedding_functions" lists the loaded models
+    """
+    return get_cache_stats()
+
+
+def get_cache_stats() -> Dict:
+    """Get a snapshot of every cache's counters and occupancy."""
+    with _collection_handles_lock:
+        handles = len(_collection_handles)
+    return {
+        "query_embeddings": _query_embedding_cache.stats(),
+        "query_results": _query_result_cache.stats(),
+        "rerank_scores": _rerank_score_cache.stats(),
+        "exact_search": _exact_matrices.stats(),
+        "collection_handles": {"entries": handles},
+        "client_pool": _client_pool.stats(),
+        "embedding_functions": {"models": shared_embedding_functions()},
+    }
+
+
+@mcp.tool()
+async def chroma_server_stats() -> Dict:
+    """Report where the server's time goes: per-tool latency, query stages and caches.
+
+    Returns:
+        Dictionary with:
+        - tools: per tool, call count, errors and mean/max/p50/p95/p99 latency in ms
+          (including time queued for a worker), over the most recent calls
+        - stages: the same for the parts of a query: "embedding" (query embedding),
+          "search" (vector or hybrid search), "rerank", "context" (neighboring chunks)
+          and "formatting", "exact_load" (reading a collection's embeddings for exact
+          search), plus "filter" and "fetch" from explain=True queries
+        - in_flight: tools currently running or queued
+        - caches: hit rates and occupancy, as from chroma_get_cache_stats
+        - workers: worker thread count
+        - embedding_pool: embedding worker processes and how many queries each batch held
+          (None unless --embedding-workers is set)
+        - coalescing: per tool, calls that shared the result of an identical call
+          already in flight, and how many calls are pending
+        - model_load_seconds: load time of each embedding model and the reranker
+        - uptime_seconds and warmup status
+    """
+    return get_server_stats()
+
+
+def get_server_stats() -> Dict:
+    """Get the snapshot reported by chroma_server_stats and written to --metrics-file."""
+    load_seconds = dict(embedding_load_seconds())
+    if _reranker is not None and _reranker.load_seconds is not None:
+        load_seconds[f"reranker:{_reranker.key}"] = _reranker.load_seconds
+    return {
+        **_metrics.snapshot(),
+        "caches": get_cache_stats(),
+        "workers": {"threads": _worker_threads},
+        "embedding_pool": _embedding_pool.stats() if _embedding_pool is not None else None,
+        "coalescing": get_coalescing_stats(),
+        "model_load_seconds": load_seconds,
+        "warmup": get_warmup_status(),
+    }
+
+
 ##### Document Tools #####
 # NOTE: There is no chroma_add_documents tool. Use CLI addpdf.py for document loading.
 
@@ -744,6 +2538,10 @@ async def chroma_query_documents(
     where: Dict | None = None,
     where_document: Dict | None = None,
     include: List[str] = ["documents", "metadatas", "distances"],
+    hybrid: bool = False,
+    rerank: bool = False,
+    explain: bool = False,
+    exact: bool | None = None,
 ) -> Dict:
     """Query documents from a Chroma collection with advanced filtering.
 
@@ -766,20 +2564,84 @@ async def chroma_query_documents(
                - Logical AND: {"$and": [{"$contains": "value1"}, {"$not_regex": "[a-z]+"}]}
                - Logical OR: {"$or": [{"$regex": "[a-z]+"}, {"$not_contains": "value2"}]}
         include: List of what to include in response. By default, this will include documents, metadatas, and distances.
+        hybrid: Also rank by exact words (BM25 full-text search) and fuse both rankings.
+                Use for names, docket numbers and citations that semantic search misses.
+        rerank: Score a wider set of candidates against the query with the server's
+                reranker (a cross-encoder) and return the best n_results, with their
+                scores in "rerank_scores". Needs the server started with --reranker.
+        explain: Add an "explain" entry with the milliseconds spent in each stage
+                 (embedding, filter, search, fetch, rerank) and how many chunks the
+                 where/where_document filters examined and let through. Bypasses the
+                 result cache.
+        exact: True compares the query with every chunk (exact nearest neighbors),
+               False uses the approximate HNSW index. By default small collections
+               are searched exactly. Not combined with hybrid.
     """
     if not query_texts:
         raise ValueError("The 'query_texts' list cannot be empty.")
+    if rerank and _reranker is None:
+        raise ValueError("rerank=True needs the server started with --reranker.")
+    if exact and hybrid:
+        raise ValueError("exact=True can't be combined with hybrid=True.")
+
+    # Explained queries are timed on their own rather than sharing another call's run
+    return await _run_coalesced(
+        "chroma_query_documents",
+        collection_name,
+        _query_documents,
+        collection_name,
+        query_texts,
+        n_results,
+        where,
+        where_document,
+        include,
+        hybrid,
+        rerank,
+        explain,
+        exact,
+        coalesce=not explain,
+    )
+
+
+def _query_documents(
+    collection_name: str,
+    query_texts: List[str],
+    n_results: int,
+    where: Dict | None,
+    where_document: Dict | None,
+    include: List[str],
+    hybrid: bool = False,
+    rerank: bool = False,
+    explain: bool = False,
+    exact: bool | None = None,
+) -> Dict:
+    if explain:
+        with explaining() as plan:
+            results = _query_documents(
+                collection_name, query_texts, n_results, where, where_document, include,
+                hybrid, rerank, exact=exact,
+            )
+        return {**results, "explain": plan}
 
-    client = get_chroma_client()
     try:
-        collection = client.get_collection(collection_name)
-        return collection.query(
-            query_texts=query_texts,
-            n_results=n_results,
-            where=where,
-            where_document=where_document,
-            include=include,
+        collection = get_collection(collection_name)
+        if not rerank:
+            return run_query(
+                collection, query_texts, n_results, where, where_document, include, hybrid=hybrid,
+                exact=exact,
+            )
+
+        # The reranker reads the documents even when the caller didn't ask for them
+        candidates = max(n_results * OVERFETCH_FACTOR, OVERFETCH_MIN_CANDIDATES)
+        fetch = include if "documents" in include else include + ["documents"]
+        results = run_query(
+            collection, query_texts, candidates, where, where_document, fetch, hybrid=hybrid,
+            exact=exact,
         )
+        results = rerank_results(collection, results, query_texts, top_k=n_results)
+        if "documents" not in include:
+            results["documents"] = None
+        return results
     except Exception as e:
         raise Exception(
             f"Failed to query documents from collection '{collection_name}': {str(e)}"
@@ -793,6 +2655,14 @@ async def chroma_query_with_sources(
     n_results: int = 5,
     where: Dict | None = None,
     where_document: Dict | None = None,
+    hybrid: bool = False,
+    context_window: int = 0,
+    mmr: bool = False,
+    mmr_lambda: float = 0.5,
+    max_per_source: int | None = None,
+    rerank: bool = False,
+    explain: bool = False,
+    exact: bool | None = None,
 ) -> str:
     """Query documents and return results formatted with source citations and bibliography.
 
@@ -802,27 +2672,122 @@ async def chroma_query_with_sources(
         n_results: Number of results to return per query
         where: Optional metadata filters
         where_document: Optional document content filters
+        hybrid: Also rank by exact words (BM25 full-text search) and fuse both rankings.
+                Use for names, docket numbers and citations that semantic search misses.
+        context_window: Also show this many neighboring chunks before and after each
+                result from the same file (0 for none), saving chroma_get_context calls
+        mmr: Diversify results with maximal marginal relevance, so near-duplicate
+             chunks don't crowd out other evidence
+        mmr_lambda: Balance for mmr between relevance (1.0) and variety (0.0)
+        max_per_source: Return at most this many results from any one source file
+        rerank: Reorder a wider set of candidates with the server's reranker (a
+                cross-encoder) before picking results. Needs --reranker.
+        explain: Append a JSON breakdown of the milliseconds spent in each stage
+                 (embedding, filter, search, fetch, rerank, context, formatting) and how many
+                 chunks the filters examined and let through. Bypasses the result cache.
+        exact: True compares the query with every chunk (exact nearest neighbors),
+               False uses the approximate HNSW index. By default small collections
+               are searched exactly. Not combined with hybrid.
 
     Returns:
         Formatted string with results and bibliography of source files
     """
     if not query_texts:
         raise ValueError("The 'query_texts' list cannot be empty.")
+    if not 0 <= context_window <= MAX_CONTEXT_WINDOW:
+        raise ValueError(f"context_window must be between 0 and {MAX_CONTEXT_WINDOW}.")
+    if not 0.0 <= mmr_lambda <= 1.0:
+        raise ValueError("mmr_lambda must be between 0 and 1.")
+    if max_per_source is not None and max_per_source < 1:
+        raise ValueError("max_per_source must be at least 1.")
+    if rerank and _reranker is None:
+        raise ValueError("rerank=True needs the server started with --reranker.")
+    if exact and hybrid:
+        raise ValueError("exact=True can't be combined with hybrid=True.")
+
+    # Explained queries are timed on their own rather than sharing another call's run
+    return await _run_coalesced(
+        "chroma_query_with_sources",
+        collection_name,
+        _query_with_sources,
+        collection_name,
+        query_texts,
+        n_results,
+        where,
+        where_document,
+        hybrid,
+        context_window,
+        mmr,
+        mmr_lambda,
+        max_per_source,
+        rerank,
+        explain,
+        exact,
+        coalesce=not explain,
+    )
+
+
+def _query_with_sources(
+    collection_name: str,
+    query_texts: List[str],
+    n_results: int,
+    where: Dict | None,
+    where_document: Dict | None,
+    hybrid: bool = False,
+    context_window: int = 0,
+    mmr: bool = False,
+    mmr_lambda: float = 0.5,
+    max_per_source: int | None = None,
+    rerank: bool = False,
+    explain: bool = False,
+    exact: bool | None = None,
+) -> str:
+    if explain:
+        with explaining() as plan:
+            text = _query_with_sources(
+                collection_name, query_texts, n_results, where, where_document, hybrid,
+                context_window, mmr, mmr_lambda, max_per_source, rerank, exact=exact,
+            )
+        return f"{text}\n\nExplain:\n{json.dumps(plan, indent=2)}"
 
-    client = get_chroma_client()
     try:
-        collection = client.get_collection(collection_name)
-        results = collection.query(
-            query_texts=query_texts,
-            n_results=n_results,
-            where=where,
-            where_document=where_document,
-            include=["documents", "metadatas", "distances"],
-        )
+        collection = get_collection(collection_name)
+        include = ["documents", "metadatas", "distances"]
+        if mmr or max_per_source or rerank:
+            candidates = max(n_results * OVERFETCH_FACTOR, OVERFETCH_MIN_CANDIDATES)
+            results = run_query(
+                collection,
+                query_texts,
+                candidates,
+                where,
+                where_document,
+                include + (["embeddings"] if mmr else []),
+                hybrid=hybrid,
+                exact=exact,
+            )
+            if rerank:
+                results = rerank_results(collection, results, query_texts)
+            results = diversify_results(
+                results, n_results, mmr_lambda if mmr else None, max_per_source
+            )
+        else:
+            results = run_query(
+                collection, query_texts, n_results, where, where_document, include, hybrid=hybrid,
+                exact=exact,
+            )
 
         if not results or not results.get("documents"):
             return "No results found."
 
+        contexts = {}
+        if context_window:
+            hit_ids = [chunk_id for ids in results["ids"] for chunk_id in ids]
+            with _stage("context"):
+                contexts = get_context_windows(
+                    collection, hit_ids, context_window, get_client_data_dir()
+                )
+
+        formatting_started = time.perf_counter()
         output_lines = []
         sources_used = set()
 
@@ -834,6 +2799,7 @@ async def chroma_query_with_sources(
             docs = results["documents"][query_idx]
             metas = results["metadatas"][query_idx]
             dists = results["distances"][query_idx]
+            ids = results["ids"][query_idx]
 
             for i, (doc, meta, dist) in enumerate(zip(docs, metas, dists)):
                 similarity = 1 - dist
@@ -844,9 +2810,18 @@ async def chroma_query_with_sources(
                 source_path = meta.get("source", "") if meta else ""
 
                 # Just show the document content without source info in each result
-                doc_text = doc if len(doc) <= 400 else doc[:400] + "..."
-                output_lines.append(doc_text)
-                output_lines.append("")
+                context = contexts.get(ids[i])
+                if context:
+                    # The hit in place among its neighbors, which are marked as context
+                    for chunk in context["chunks"]:
+                        text = chunk["document"] or ""
+                        text = text if len(text) <= 400 else text[:400] + "..."
+                        output_lines.append(text if chunk["id"] == ids[i] else f"[context] {text}")
+                        output_lines.append("")
+                else:
+                    doc_text = doc if len(doc) <= 400 else doc[:400] + "..."
+                    output_lines.append(doc_text)
+                    output_lines.append("")
 
                 # Collect sources
                 if source_file != "Unknown":
@@ -858,7 +2833,9 @@ async def chroma_query_with_sources(
             for filename in sorted(sources_used):
                 output_lines.append(filename)
 
-        return "\n".join(output_lines)
+        text = "\n".join(output_lines)
+        _record_stage("formatting", time.perf_counter() - formatting_started)
+        return text
 
     except Exception as e:
         raise Exception(
@@ -866,6 +2843,235 @@ async def chroma_query_with_sources(
         ) from e
 
 
+@mcp.tool()
+async def chroma_get_context(collection_name: str, ids: List[str], window: int = 1) -> Dict:
+    """Get the chunks before and after search hits, in their original file order.
+
+    Use this after a query to read the paragraphs around a hit instead of guessing
+    IDs or filtering on chunk_index.
+
+    Args:
+        collection_name: Name of the collection the hits came from
+        ids: IDs of the hit chunks
+        window: Number of chunks to return on each side of each hit (at most 10)
+
+    Returns:
+        Dictionary with "contexts": one entry per hit with its id, source file and
+        the chunks around it (id, chunk_index, document, metadata), and "missing":
+        IDs that have no source file and chunk position
+    """
+    if not ids:
+        raise ValueError("The 'ids' list cannot be empty.")
+    if not 0 <= window <= MAX_CONTEXT_WINDOW:
+        raise ValueError(f"window must be between 0 and {MAX_CONTEXT_WINDOW}.")
+
+    return await _run_coalesced(
+        "chroma_get_context", collection_name, _get_context, collection_name, ids, window
+    )
+
+
+def _get_context(collection_name: str, ids: List[str], window: int) -> Dict:
+    try:
+        collection = get_collection(collection_name)
+        windows = get_context_windows(collection, ids, window, get_client_data_dir())
+        return {
+            "contexts": [
+                {
+                    "id": chunk_id,
+                    "source": windows[chunk_id]["source"],
+                    "chunks": windows[chunk_id]["chunks"],
+                }
+                for chunk_id in ids
+                if chunk_id in windows
+            ],
+            "missing": [chunk_id for chunk_id in ids if chunk_id not in windows],
+        }
+    except Exception as e:
+        raise Exception(
+            f"Failed to get context from collection '{collection_name}': {str(e)}"
+        ) from e
+
+
+@mcp.tool()
+async def chroma_federated_query(
+    query_text: str,
+    directories: List[str] | None = None,
+    collections: List[str] | None = None,
+    n_results: int = 10,
+    where: Dict | None = None,
+    where_document: Dict | None = None,
+) -> Dict:
+    """Search many collections across directories at once and merge the best hits.
+
+    The query is embedded once per embedding model and the collections are searched
+    in parallel. Hits are merged by cosine distance into one global top-k list.
+
+    Args:
+        query_text: Text to search for
+        directories: Names of configured directories to search (default: all of them)
+        collections: Collection names to search in each directory (default: all)
+        n_results: Number of hits to return overall
+        where: Optional metadata filters, applied in every collection
+        where_document: Optional document content filters, applied in every collection
+
+    Returns:
+        Dictionary with "results" (each hit with directory, collection, id, distance,
+        document and metadata, best first), "searched" (number of collections queried),
+        "skipped" (collections not using cosine distance) and "errors" (per-collection
+        failures, which don't fail the whole search)
+    """
+    if not query_text.strip():
+        raise ValueError("The 'query_text' cannot be empty.")
+    if n_results < 1:
+        raise ValueError("n_results must be at least 1")
+
+    # Every step shares one deadline, and progress counts the collections searched
+    async with _tool_call("chroma_federated_query") as control:
+        return await _federated_query(
+            control, query_text, directories, collections, n_results, where, where_document
+        )
+
+
+async def _federated_query(
+    control: CallControl,
+    query_text: str,
+    directories: List[str] | None,
+    collections: List[str] | None,
+    n_results: int,
+    where: Dict | None,
+    where_document: Dict | None,
+) -> Dict:
+    targets, skipped = await _run_blocking(
+        "chroma_federated_query", _federated_targets, directories, collections
+    )
+    query_embeddings = await _run_blocking(
+        "chroma_federated_query", _federated_embeddings, targets, query_text
+    )
+
+    searched = 0
+
+    async def search(target):
+        nonlocal searched
+        try:
+            return await _run_blocking(
+                "chroma_federated_query",
+                run_query,
+                target["collection"],
+                [query_text],
+                n_results,
+                where,
+                where_document,
+                ["documents", "metadatas", "distances"],
+                target["data_dir"],
+                query_embeddings.get(target["model_key"]),
+            )
+        finally:
+            searched += 1
+            control.progress(searched, len(targets))
+
+    outcomes = await asyncio.gather(*[search(target) for target in targets], return_exceptions=True)
+    # A deadline passed during the search fails the whole query, not each collection
+    control.check()
+
+    hits = []
+    errors = []
+    for target, outcome in zip(targets, outcomes, strict=True):
+        if isinstance(outcome, Exception):
+            errors.append(
+                {
+                    "directory": target["directory"],
+                    "collection": target["collection"].name,
+                    "error": str(outcome),
+                }
+            )
+            continue
+        for doc_id, doc, meta, dist in zip(
+            outcome["ids"][0],
+            outcome["documents"][0],
+            outcome["metadatas"][0],
+            outcome["distances"][0],
+            strict=True,
+        ):
+            hits.append(
+                {
+                    "directory": target["directory"],
+                    "collection": target["collection"].name,
+                    "id": doc_id,
+                    "distance": float(dist),
+                    "document": doc,
+                    "metadata": meta,
+                }
+            )
+
+    return {
+        "results": heapq.nsmallest(n_results, hits, key=lambda hit: hit["distance"]),
+        "searched": len(targets),
+        "skipped": skipped,
+        "errors": errors,
+    }
+
+
+def _collection_space(collection) -> str:
+    """Get a collection's distance function (cosine, l2 or ip)."""
+    hnsw = collection.configuration_json.get("hnsw") or {}
+    return hnsw.get("space") or (collection.metadata or {}).get("hnsw:space", "l2")
+
+
+def _federated_targets(directories: List[str] | None, collections: List[str] | None):
+    """Resolve the directories and collections a federated query should search.
+
+    Returns:
+        (targets, skipped): targets are dicts with directory, data_dir, collection and
+        model_key; skipped lists collections whose distances can't be merged
+    """
+    if _directory_db_path:
+        configured = {d["name"]: d["path"] for d in list_directories()}
+        names = directories if directories else sorted(configured)
+        unknown = [name for name in names if name not in configured]
+        if unknown:
+            raise ValueError(f"Unknown directories: {', '.join(unknown)}")
+        sources = [(name, configured[name]) for name in names]
+    else:
+        # Without the directory registry there is only the current client to search
+        if directories:
+            raise ValueError("Directories can only be selected with a persistent client")
+        label = get_active_directory() or (_client_args.client_type if _client_args else "default")
+        sources = [(label, None)]
+
+    targets = []
+    skipped = []
+    for directory, data_dir in sources:
+        client = _client_pool.get(data_dir) if data_dir else get_chroma_client()
+        available = [c.name for c in client.list_collections()]
+        wanted = [name for name in available if not collections or name in collections]
+        for collection_name in wanted:
+            collection = get_collection(collection_name, data_dir)
+            if _collection_space(collection) != "cosine":
+                skipped.append({"directory": directory, "collection": collection_name})
+                continue
+            targets.append(
+                {
+                    "directory": directory,
+                    "data_dir": data_dir,
+                    "collection": collection,
+                    "model_key": embedding_model_key(
+                        collection.configuration_json.get("embedding_function")
+                    ),
+                }
+            )
+    return targets, skipped
+
+
+def _federated_embeddings(targets: List[Dict], query_text: str) -> Dict:
+    """Embed the query once for each embedding model used by the targets."""
+    embeddings = {}
+    for target in targets:
+        model_key = target["model_key"]
+        if model_key is not None and model_key not in embeddings:
+            embeddings[model_key] = embed_queries(target["collection"], [query_text])
+    return embeddings
+
+
 @mcp.tool()
 async def chroma_get_documents(
     collection_name: str,
@@ -875,8 +3081,9 @@ async def chroma_get_documents(
     include: List[str] = ["documents", "metadatas"],
     limit: int | None = None,
     offset: int | None = None,
+    cursor: str | None = None,
 ) -> Dict:
-    """Get documents from a Chroma collection with optional filtering.
+    """Get documents from a Chroma collection with optional filtering, one page at a time.
 
     Args:
         collection_name: Name of the collection to get documents from
@@ -896,29 +3103,114 @@ async def chroma_get_documents(
                - Logical AND: {"$and": [{"$contains": "value1"}, {"$not_regex": "[a-z]+"}]}
                - Logical OR: {"$or": [{"$regex": "[a-z]+"}, {"$not_contains": "value2"}]}
         include: List of what to include in response. By default, this will include documents, and metadatas.
-        limit: Optional maximum number of documents to return
-        offset: Optional number of documents to skip before returning results
+                 Add "embeddings" only if you need the vectors; they are large.
+        limit: Optional maximum number of documents in this page (default 100, at most 1000)
+        offset: Optional number of documents to skip before the first page
+        cursor: The next_cursor from a previous response, to fetch the following page
+                with the same filters; takes the place of offset
 
     Returns:
-        Dictionary containing the matching documents, their IDs, and requested includes
+        Dictionary containing the matching documents, their IDs, and requested includes,
+        plus next_cursor: pass it back as cursor to get the next page, or null when
+        there are no more documents. Pages also stop early to keep responses small.
     """
-    client = get_chroma_client()
+    return await _run_coalesced(
+        "chroma_get_documents",
+        collection_name,
+        _get_documents,
+        collection_name,
+        ids,
+        where,
+        where_document,
+        include,
+        limit,
+        offset,
+        cursor,
+    )
+
+
+def _get_documents(
+    collection_name: str,
+    ids: List[str] | None,
+    where: Dict | None,
+    where_document: Dict | None,
+    include: List[str],
+    limit: int | None,
+    offset: int | None,
+    cursor: str | None,
+) -> Dict:
     try:
-        collection = client.get_collection(collection_name)
-        return collection.get(
+        collection = get_collection(collection_name)
+        collection_id = str(collection.id)
+        data_dir = get_client_data_dir()
+        # Read the generation first: a write during this read invalidates the cursor
+        generation = sidecar.get_generation(data_dir, collection_id)
+        fingerprint = request_fingerprint(ids, where, where_document, include)
+        if cursor:
+            start = decode_cursor(cursor, collection_id, generation, fingerprint)
+        else:
+            start = offset or 0
+        size = page_size(limit)
+
+        # One row past the page tells whether another page follows
+        fetch = size + 1
+        if ids is None:
+            ids = document_filter_candidates(collection, where_document, data_dir)
+            if ids == []:
+                # Nothing can match, but Chroma still validates the filters;
+                # get() rejects an empty id list, so ask for no rows instead
+                ids, fetch = None, 0
+        results = get_in_batches(
+            collection,
+            fetch,
+            start,
             ids=ids,
             where=where,
             where_document=where_document,
             include=include,
-            limit=limit,
-            offset=offset,
         )
+
+        more = len(results["ids"]) > size
+        results = jsonable_rows(slice_rows(results, size))
+        returned = trim_to_budget(results, _response_budget)
+        if returned < len(results["ids"]):
+            results = slice_rows(results, returned)
+            more = True
+        results["next_cursor"] = (
+            encode_cursor(collection_id, generation, start + returned, fingerprint)
+            if more
+            else None
+        )
+        return results
     except Exception as e:
         raise Exception(
             f"Failed to get documents from collection '{collection_name}': {str(e)}"
         ) from e
 
 
+def get_in_batches(collection, limit: int, offset: int, **kwargs) -> Dict:
+    """Read up to limit rows with collection.get, GET_BATCH_SIZE rows at a time.
+
+    Between batches the call can be cancelled and reports the rows read so far.
+    """
+    results = None
+    fetched = 0
+    while True:
+        checkpoint()
+        size = min(GET_BATCH_SIZE, limit - fetched)
+        batch = collection.get(limit=size, offset=offset + fetched, **kwargs)
+        if results is None:
+            results = batch
+        else:
+            for field in GET_RESULT_FIELDS:
+                if results.get(field) is not None:
+                    results[field] = list(results[field]) + list(batch[field])
+        fetched += len(batch["ids"])
+        report_progress(fetched, limit)
+        if len(batch["ids"]) < size or fetched >= limit:
+            return results
+
+
 @mcp.tool()
 async def chroma_update_documents(
     collection_name: str,
@@ -964,9 +3256,26 @@ async def chroma_update_documents(
     if documents is not None and len(documents) != len(ids):
         raise ValueError("Length of 'documents' list must match length of 'ids' list.")
 
-    client = get_chroma_client()
+    return await _run_blocking(
+        "chroma_update_documents",
+        _update_documents,
+        collection_name,
+        ids,
+        embeddings,
+        metadatas,
+        documents,
+    )
+
+
+def _update_documents(
+    collection_name: str,
+    ids: List[str],
+    embeddings: List[List[float]] | None,
+    metadatas: List[Dict] | None,
+    documents: List[str] | None,
+) -> str:
     try:
-        collection = client.get_collection(collection_name)
+        collection = get_collection(collection_name)
     except Exception as e:
         raise Exception(f"Failed to get collection '{collection_name}': {str(e)}") from e
 
@@ -979,8 +3288,29 @@ async def chroma_update_documents(
     }
     kwargs = {k: v for k, v in update_args.items() if v is not None}
 
+    indexed = False
     try:
-        collection.update(**kwargs)
+        data_dir = get_client_data_dir()
+        # Batches keep the sidecar in step with Chroma, so a call cancelled between
+        # them leaves every batch before it fully applied
+        for start in range(0, len(ids), UPDATE_BATCH_SIZE):
+            checkpoint()
+            batch = {k: v[start:start + UPDATE_BATCH_SIZE] for k, v in kwargs.items()}
+            collection.update(**batch)
+            if documents is not None or metadatas is not None:
+                # Read back what Chroma stored: unknown ids were skipped and
+                # metadata updates merge into the existing keys
+                stored = collection.get(ids=batch["ids"], include=["documents", "metadatas"])
+                if documents is not None:
+                    sidecar.index_chunks(
+                        data_dir, str(collection.id), stored["ids"], stored["documents"]
+                    )
+                if metadatas is not None:
+                    sidecar.record_chunks(
+                        data_dir, str(collection.id), stored["ids"], stored["metadatas"]
+                    )
+            report_progress(min(start + UPDATE_BATCH_SIZE, len(ids)), len(ids))
+        indexed = True
         return (
             f"Successfully processed update request for {len(ids)} documents in "
             f"collection '{collection_name}'. Note: Non-existent IDs are ignored by ChromaDB."
@@ -989,6 +3319,9 @@ async def chroma_update_documents(
         raise Exception(
             f"Failed to update documents in collection '{collection_name}': {str(e)}"
         ) from e
+    finally:
+        # Bump even on failure, since a failed batch may have been partly applied
+        record_collection_write(str(collection.id), indexed=indexed)
 
 
 @mcp.tool()
@@ -1009,14 +3342,20 @@ async def chroma_delete_documents(collection_name: str, ids: List[str]) -> str:
     if not ids:
         raise ValueError("The 'ids' list cannot be empty.")
 
-    client = get_chroma_client()
+    return await _run_blocking("chroma_delete_documents", _delete_documents, collection_name, ids)
+
+
+def _delete_documents(collection_name: str, ids: List[str]) -> str:
     try:
-        collection = client.get_collection(collection_name)
+        collection = get_collection(collection_name)
     except Exception as e:
         raise Exception(f"Failed to get collection '{collection_name}': {str(e)}") from e
 
+    indexed = False
     try:
         collection.delete(ids=ids)
+        sidecar.remove_chunks(get_client_data_dir(), str(collection.id), ids)
+        indexed = True
         return (
             f"Successfully deleted {len(ids)} documents from "
             f"collection '{collection_name}'. Note: Non-existent IDs are ignored by ChromaDB."
@@ -1025,6 +3364,9 @@ async def chroma_delete_documents(collection_name: str, ids: List[str]) -> str:
         raise Exception(
             f"Failed to delete documents from collection '{collection_name}': {str(e)}"
         ) from e
+    finally:
+        # Bump even on failure, since a failed batch may have been partly applied
+        record_collection_write(str(collection.id), indexed=indexed)
 
 
 def validate_thought_data(input_data: Dict) -> Dict:
@@ -1117,19 +3459,38 @@ def main():
                 "API key must be provided via --api-key flag or CHROMA_API_KEY environment variable when using cloud client"
             )
 
-    # Initialize client with parsed args
     try:
-        get_chroma_client(args)
-        pass  # Successfully initialized Chroma client
-    except Exception as e:
-        import sys
-
-        print(f"Failed to initialize Chroma client: {str(e)}", file=sys.stderr)
-        raise
+        configure_tool_execution(args.worker_threads, parse_tool_limits(args.tool_concurrency))
+        configure_tool_timeouts(args.tool_timeout, parse_tool_timeouts(args.tool_timeouts))
+        configure_warmup(args.warmup)
+        _query_embedding_cache.resize(args.query_cache_size)
+        _query_result_cache.resize(args.result_cache_size)
+        _client_pool.configure(args.client_pool_size, args.client_idle_seconds)
+        configure_response_budget(args.max_response_bytes)
+        configure_reranker(args.reranker, args.reranker_model)
+        _rerank_score_cache.resize(args.rerank_cache_size)
+        configure_exact_search(args.exact_search_max_rows)
+        _exact_matrices.resize(args.exact_cache_size)
+        configure_metrics_file(args.metrics_file, args.metrics_interval)
+        configure_profiling(args.profile)
+        configure_transport(args.transport, args.sse_host, args.sse_port)
+        configure_embedding_workers(args.embedding_workers, args.embedding_batch_size)
+    except ValueError as e:
+        parser.error(str(e))
+
+    # The client opens in the background from the lifespan, along with the warm-up
+    configure_client(args)
 
     # Initialize and run the server
-    # Starting MCP server
-    mcp.run(transport="stdio")
+    if _transport == "sse":
+        log_startup(
+            f"Starting MCP server on http://{mcp.settings.host}:{mcp.settings.port}"
+            f"{mcp.settings.sse_path} (warm-up: {args.warmup})"
+        )
+        asyncio.run(run_sse_server())
+    else:
+        log_startup(f"Starting MCP server (warm-up: {args.warmup})")
+        mcp.run(transport="stdio")
 
 
 if __name__ == "__main__":
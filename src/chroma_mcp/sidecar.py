@@ -0,0 +1,790 @@
+"""
+Parabeagle's sidecar database, stored next to chroma.sqlite3 in each data directory.
+
+Chroma's own database is left untouched; anything Parabeagle needs to track about a
+collection lives in parabeagle_index.sqlite3 instead, keyed by collection id. The
+MCP server and the CLI tools open it independently, so every write goes through a
+short transaction and the database runs in WAL mode. Clients without a data
+directory (ephemeral, http, cloud) get a process-wide in-memory database instead.
+
+Tables:
+- collection_generations: a counter bumped by every write to a collection. Caches
+  in the server include it in their keys, so a CLI ingest invalidates them too.
+- text_index_generations: the write generation each collection's text indexes
+  are current at, so readers can tell an index that fell behind its collection.
+- chunks / chunks_fts: the text of every chunk and an FTS5 (BM25) index over it,
+  used for lexical ranking in hybrid queries.
+- chunks_trigram: a case-sensitive FTS5 trigram index over the same text, used to
+  narrow where_document $contains/$regex filters to candidate ids.
+- documents / document_chunks: a manifest of the source files in each collection
+  (filename, sha256, chunk and character counts, page count) and the chunk ids
+  belonging to each, so file-level tools don't have to scan chunk metadata.
+
+Only the standard library is imported here, keeping it cheap for the CLI tools.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+SIDECAR_FILENAME = "parabeagle_index.sqlite3"
+
+# Page size used when copying a collection's documents into the index
+REBUILD_BATCH_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS collection_generations (
+    collection_id TEXT PRIMARY KEY,
+    generation INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS text_index_generations (
+    collection_id TEXT PRIMARY KEY,
+    generation INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS chunks (
+    rowid INTEGER PRIMARY KEY,
+    collection_id TEXT NOT NULL,
+    chunk_id TEXT NOT NULL,
+    document TEXT NOT NULL,
+    UNIQUE (collection_id, chunk_id)
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+    document, content='chunks', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TABLE IF NOT EXISTS document_chunks (
+    collection_id TEXT NOT NULL,
+    chunk_id TEXT NOT NULL,
+    source TEXT,
+    chunk_index INTEGER,
+    char_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (collection_id, chunk_id)
+);
+
+CREATE INDEX IF NOT EXISTS document_chunks_by_source
+    ON document_chunks (collection_id, source, chunk_index);
+
+CREATE TABLE IF NOT EXISTS documents (
+    collection_id TEXT NOT NULL,
+    source TEXT NOT NULL,
+    filename TEXT,
+    sha256 TEXT,
+    chunk_count INTEGER NOT NULL DEFAULT 0,
+    total_chars INTEGER NOT NULL DEFAULT 0,
+    page_count INTEGER,
+    ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (collection_id, source)
+);
+
+CREATE INDEX IF NOT EXISTS documents_by_sha256 ON documents (collection_id, sha256);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks_trigram USING fts5(
+    document, content='chunks', content_rowid='rowid', tokenize='trigram case_sensitive 1'
+);
+
+CREATE TRIGGER IF NOT EXISTS chunks_after_insert AFTER INSERT ON chunks BEGIN
+    INSERT INTO chunks_fts (rowid, document) VALUES (new.rowid, new.document);
+    INSERT INTO chunks_trigram (rowid, document) VALUES (new.rowid, new.document);
+END;
+
+CREATE TRIGGER IF NOT EXISTS chunks_after_delete AFTER DELETE ON chunks BEGIN
+    INSERT INTO chunks_fts (chunks_fts, rowid, document) VALUES ('delete', old.rowid, old.document);
+    INSERT INTO chunks_trigram (chunks_trigram, rowid, document)
+        VALUES ('delete', old.rowid, old.document);
+END;
+
+CREATE TRIGGER IF NOT EXISTS chunks_after_update AFTER UPDATE OF document ON chunks BEGIN
+    INSERT INTO chunks_fts (chunks_fts, rowid, document) VALUES ('delete', old.rowid, old.document);
+    INSERT INTO chunks_fts (rowid, document) VALUES (new.rowid, new.document);
+    INSERT INTO chunks_trigram (chunks_trigram, rowid, document)
+        VALUES ('delete', old.rowid, old.document);
+    INSERT INTO chunks_trigram (rowid, document) VALUES (new.rowid, new.document);
+END;
+"""
+
+# Rebuilds read Chroma into this per-connection table first, then swap it in with
+# one transaction, so readers and writers never see a half-rebuilt collection
+_STAGING_SCHEMA = """
+CREATE TEMP TABLE IF NOT EXISTS staged_chunks (
+    collection_id TEXT NOT NULL,
+    chunk_id TEXT NOT NULL,
+    document TEXT,
+    metadata TEXT
+);
+"""
+
+_TERM_RE = re.compile(r"\w+")
+
+# The trigram tokenizer can only match substrings of at least this many characters
+TRIGRAM_LENGTH = 3
+
+# Connections are reused: each thread keeps one per data directory, and the
+# in-memory database is shared by all threads behind a lock
+_local = threading.local()
+_memory_conn = None
+_memory_lock = threading.RLock()
+
+# Rebuilds of the same collection in this process run one at a time
+_rebuild_locks: Dict[Tuple[Optional[str], str], threading.RLock] = {}
+_rebuild_locks_guard = threading.Lock()
+
+
+def get_sidecar_path(data_dir: str) -> str:
+    """Get the path to the sidecar database for a Chroma data directory."""
+    return os.path.join(data_dir, SIDECAR_FILENAME)
+
+
+def connect(data_dir: str) -> sqlite3.Connection:
+    """Open the sidecar database, creating its schema if needed."""
+    conn = sqlite3.connect(get_sidecar_path(data_dir), timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    _create_schema(conn)
+    return conn
+
+
+def _create_schema(conn: sqlite3.Connection) -> None:
+    has_trigram = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'chunks_trigram'"
+    ).fetchone()
+    # Older sidecars have the old chunk triggers, which don't feed the trigram index
+    if not has_trigram:
+        conn.executescript(
+            """
+            DROP TRIGGER IF EXISTS chunks_after_insert;
+            DROP TRIGGER IF EXISTS chunks_after_delete;
+            DROP TRIGGER IF EXISTS chunks_after_update;
+            """
+        )
+    conn.executescript(_SCHEMA)
+    conn.executescript(_STAGING_SCHEMA)
+    if not has_trigram:
+        with conn:
+            conn.execute("INSERT INTO chunks_trigram (chunks_trigram) VALUES ('rebuild')")
+
+
+@contextmanager
+def open_sidecar(data_dir: Optional[str]) -> Iterator[sqlite3.Connection]:
+    """Get a connection to a data directory's sidecar (or the in-memory one for None).
+
+    Use `with conn:` inside the block to group writes into one transaction.
+    """
+    global _memory_conn
+
+    if data_dir is None:
+        with _memory_lock:
+            if _memory_conn is None:
+                _memory_conn = sqlite3.connect(":memory:", check_same_thread=False)
+                _create_schema(_memory_conn)
+            yield _memory_conn
+        return
+
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(data_dir)
+    if conn is None:
+        conn = connections[data_dir] = connect(data_dir)
+    yield conn
+
+
+def _exists(data_dir: Optional[str]) -> bool:
+    return data_dir is None or os.path.exists(get_sidecar_path(data_dir))
+
+
+##### Write generations #####
+
+
+def get_generation(data_dir: Optional[str], collection_id: str) -> int:
+    """Get the current write generation of a collection (0 if never written).
+
+    Args:
+        data_dir: Chroma data directory, or None for the in-memory sidecar
+        collection_id: Collection UUID as a string
+    """
+    # Reading never creates the sidecar file
+    if not _exists(data_dir):
+        return 0
+    with open_sidecar(data_dir) as conn:
+        row = conn.execute(
+            "SELECT generation FROM collection_generations WHERE collection_id = ?",
+            (collection_id,),
+        ).fetchone()
+    return row[0] if row else 0
+
+
+def bump_generation(data_dir: Optional[str], collection_id: str, indexed: bool = False) -> int:
+    """Record a write to a collection and return its new generation.
+
+    Args:
+        data_dir: Chroma data directory, or None for the in-memory sidecar
+        collection_id: Collection UUID as a string
+        indexed: The writer applied the write to the text index as well, so an index
+            that was current before it stays current
+    """
+    with open_sidecar(data_dir) as conn:
+        with conn:
+            conn.execute(
+                """
+                INSERT INTO collection_generations (collection_id, generation)
+                VALUES (?, 1)
+                ON CONFLICT(collection_id) DO UPDATE SET
+                    generation = generation + 1,
+                    updated_at = CURRENT_TIMESTAMP
+                """,
+                (collection_id,),
+            )
+            row = conn.execute(
+                "SELECT generation FROM collection_generations WHERE collection_id = ?",
+                (collection_id,),
+            ).fetchone()
+            if indexed:
+                conn.execute(
+                    """
+                    UPDATE text_index_generations SET generation = ?
+                    WHERE collection_id = ? AND generation = ?
+                    """,
+                    (row[0], collection_id, row[0] - 1),
+                )
+    return row[0]
+
+
+def text_index_generation(data_dir: Optional[str], collection_id: str) -> Optional[int]:
+    """Get the write generation a collection's text indexes are current at.
+
+    Returns:
+        The collection's current generation, or None if the indexes are behind it
+        (or were never built)
+    """
+    if not _exists(data_dir):
+        return None
+    with open_sidecar(data_dir) as conn:
+        return _text_index_generation(conn, collection_id)
+
+
+def _text_index_generation(conn: sqlite3.Connection, collection_id: str) -> Optional[int]:
+    current, indexed = conn.execute(
+        """
+        SELECT
+            (SELECT generation FROM collection_generations WHERE collection_id = ?),
+            (SELECT generation FROM text_index_generations WHERE collection_id = ?)
+        """,
+        (collection_id, collection_id),
+    ).fetchone()
+    current = current or 0
+    return current if indexed == current else None
+
+
+##### Chunk text and full-text index #####
+
+
+def index_chunks(
+    data_dir: Optional[str],
+    collection_id: str,
+    ids: Sequence[str],
+    documents: Sequence[Optional[str]],
+) -> None:
+    """Add or replace the indexed text of chunks (chunks without text are removed)."""
+    pairs = list(zip(ids, documents, strict=True))
+    rows = [(collection_id, chunk_id, doc) for chunk_id, doc in pairs if doc is not None]
+    missing = [(collection_id, chunk_id) for chunk_id, doc in pairs if doc is None]
+    with open_sidecar(data_dir) as conn:
+        with conn:
+            conn.executemany(
+                """
+                INSERT INTO chunks (collection_id, chunk_id, document) VALUES (?, ?, ?)
+                ON CONFLICT(collection_id, chunk_id) DO UPDATE SET document = excluded.document
+                """,
+                rows,
+            )
+            conn.executemany(
+                "DELETE FROM chunks WHERE collection_id = ? AND chunk_id = ?", missing
+            )
+
+
+def remove_chunks(data_dir: Optional[str], collection_id: str, ids: Sequence[str]) -> None:
+    """Remove chunks from the text index and the document manifest."""
+    if not _exists(data_dir):
+        return
+    rows = [(collection_id, chunk_id) for chunk_id in ids]
+    with open_sidecar(data_dir) as conn:
+        with conn:
+            conn.executemany("DELETE FROM chunks WHERE collection_id = ? AND chunk_id = ?", rows)
+            sources = _chunk_sources(conn, collection_id, ids)
+            conn.executemany(
+                "DELETE FROM document_chunks WHERE collection_id = ? AND chunk_id = ?", rows
+            )
+            _refresh_documents(conn, collection_id, sources)
+
+
+def drop_collection(data_dir: Optional[str], collection_id: str) -> None:
+    """Remove everything indexed for a collection."""
+    if not _exists(data_dir):
+        return
+    with open_sidecar(data_dir) as conn:
+        with conn:
+            for table in ("chunks", "document_chunks", "documents", "text_index_generations"):
+                conn.execute(f"DELETE FROM {table} WHERE collection_id = ?", (collection_id,))
+
+
+def copy_collection(data_dir: Optional[str], source_id: str, target_id: str) -> None:
+    """Index a forked collection by copying its source's rows."""
+    if not _exists(data_dir):
+        return
+    with open_sidecar(data_dir) as conn:
+        with conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO chunks (collection_id, chunk_id, document)
+                SELECT ?, chunk_id, document FROM chunks WHERE collection_id = ?
+                """,
+                (target_id, source_id),
+            )
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO document_chunks
+                    (collection_id, chunk_id, source, chunk_index, char_count)
+                SELECT ?, chunk_id, source, chunk_index, char_count
+                FROM document_chunks WHERE collection_id = ?
+                """,
+                (target_id, source_id),
+            )
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO documents (collection_id, source, filename, sha256,
+                    chunk_count, total_chars, page_count, ingested_at)
+                SELECT ?, source, filename, sha256, chunk_count, total_chars, page_count,
+                    ingested_at
+                FROM documents WHERE collection_id = ?
+                """,
+                (target_id, source_id),
+            )
+
+
+def indexed_count(data_dir: Optional[str], collection_id: str) -> int:
+    """Count the chunks indexed for a collection."""
+    if not _exists(data_dir):
+        return 0
+    with open_sidecar(data_dir) as conn:
+        row = conn.execute(
+            "SELECT COUNT(*) FROM chunks WHERE collection_id = ?", (collection_id,)
+        ).fetchone()
+    return row[0]
+
+
+def rebuild_lock(data_dir: Optional[str], collection_id: str) -> threading.RLock:
+    """Get the lock that serializes rebuilds of a collection's indexes in this process.
+
+    Hold it to check whether a rebuild is needed and run it without another thread
+    starting the same rebuild in between.
+    """
+    with _rebuild_locks_guard:
+        lock = _rebuild_locks.get((data_dir, collection_id))
+        if lock is None:
+            lock = _rebuild_locks[(data_dir, collection_id)] = threading.RLock()
+        return lock
+
+
+def rebuild_collection(
+    data_dir: Optional[str], collection, text: bool = True, manifest: bool = True
+) -> int:
+    """Rebuild a collection's text index and/or document manifest from Chroma.
+
+    The collection is read into a staging table first, then the old rows are
+    replaced in one transaction. A rebuilt text index is recorded as current at
+    the write generation from before the read, so a write that lands during the
+    rebuild leaves it stale.
+
+    Args:
+        data_dir: Chroma data directory, or None for the in-memory sidecar
+        collection: chromadb Collection to read documents from
+        text: Rebuild the full-text and trigram indexes
+        manifest: Rebuild the document manifest
+
+    Returns:
+        Number of chunks read
+    """
+    collection_id = str(collection.id)
+    include = (["documents"] if text else []) + (["metadatas"] if manifest else [])
+    with rebuild_lock(data_dir, collection_id):
+        generation = get_generation(data_dir, collection_id)
+        try:
+            total = _stage_collection(data_dir, collection, include)
+            with open_sidecar(data_dir) as conn:
+                with conn:
+                    if text:
+                        _swap_text_index(conn, collection_id, generation)
+                    if manifest:
+                        _swap_manifest(conn, collection_id)
+        finally:
+            with open_sidecar(data_dir) as conn:
+                with conn:
+                    conn.execute(
+                        "DELETE FROM staged_chunks WHERE collection_id = ?", (collection_id,)
+                    )
+    return total
+
+
+def _stage_collection(data_dir: Optional[str], collection, include: List[str]) -> int:
+    collection_id = str(collection.id)
+    total = 0
+    offset = 0
+    while True:
+        page = collection.get(include=include, limit=REBUILD_BATCH_SIZE, offset=offset)
+        if not page["ids"]:
+            break
+        documents = page["documents"] or [None] * len(page["ids"])
+        metadatas = page["metadatas"] or [None] * len(page["ids"])
+        rows = [
+            (collection_id, chunk_id, document, json.dumps(metadata or {}))
+            for chunk_id, document, metadata in zip(page["ids"], documents, metadatas, strict=True)
+        ]
+        with open_sidecar(data_dir) as conn:
+            with conn:
+                conn.executemany("INSERT INTO staged_chunks VALUES (?, ?, ?, ?)", rows)
+        total += len(page["ids"])
+        offset += len(page["ids"])
+    return total
+
+
+def _swap_text_index(conn: sqlite3.Connection, collection_id: str, generation: int) -> None:
+    conn.execute("DELETE FROM chunks WHERE collection_id = ?", (collection_id,))
+    conn.execute(
+        """
+        INSERT INTO chunks (collection_id, chunk_id, document)
+        SELECT collection_id, chunk_id, document FROM staged_chunks
+        WHERE collection_id = ? AND document IS NOT NULL
+        """,
+        (collection_id,),
+    )
+    conn.execute(
+        """
+        INSERT INTO text_index_generations (collection_id, generation) VALUES (?, ?)
+        ON CONFLICT(collection_id) DO UPDATE SET generation = excluded.generation
+        """,
+        (collection_id, generation),
+    )
+
+
+def _swap_manifest(conn: sqlite3.Connection, collection_id: str) -> None:
+    conn.execute("DELETE FROM document_chunks WHERE collection_id = ?", (collection_id,))
+    conn.execute("DELETE FROM documents WHERE collection_id = ?", (collection_id,))
+    staged = conn.execute(
+        "SELECT chunk_id, metadata FROM staged_chunks WHERE collection_id = ?", (collection_id,)
+    )
+    while True:
+        rows = staged.fetchmany(REBUILD_BATCH_SIZE)
+        if not rows:
+            break
+        _record_chunks(
+            conn, collection_id, [row[0] for row in rows], [json.loads(row[1]) for row in rows]
+        )
+
+
+def fts_query(text: str) -> Optional[str]:
+    """Turn free text into an FTS5 query matching any of its terms.
+
+    Terms are quoted, so punctuation and FTS5 operators in user input are inert.
+    Returns None when the text has no searchable terms.
+    """
+    terms = list(dict.fromkeys(_TERM_RE.findall(text.lower())))
+    if not terms:
+        return None
+    return " OR ".join(f'"{term}"' for term in terms)
+
+
+def lexical_search(
+    data_dir: Optional[str], collection_id: str, text: str, limit: int
+) -> List[Tuple[str, float]]:
+    """Rank a collection's chunks against free text with BM25.
+
+    Returns:
+        (chunk_id, bm25 score) pairs, best first (FTS5 scores are lower-is-better)
+    """
+    query = fts_query(text)
+    if query is None or not _exists(data_dir):
+        return []
+    with open_sidecar(data_dir) as conn:
+        rows = conn.execute(
+            """
+            SELECT chunks.chunk_id, bm25(chunks_fts) AS score
+            FROM chunks_fts JOIN chunks ON chunks.rowid = chunks_fts.rowid
+            WHERE chunks_fts MATCH ? AND chunks.collection_id = ?
+            ORDER BY score
+            LIMIT ?
+            """,
+            (query, collection_id, limit),
+        ).fetchall()
+    return [(row[0], row[1]) for row in rows]
+
+
+def substring_candidates(
+    data_dir: Optional[str],
+    collection_id: str,
+    substrings: Sequence[str],
+    generation: Optional[int] = None,
+) -> Optional[Set[str]]:
+    """Find the chunks whose text contains every one of the given substrings.
+
+    Matching is case-sensitive, like Chroma's $contains. Each substring must be at
+    least TRIGRAM_LENGTH characters long.
+
+    Args:
+        generation: Only answer if the index is current at this write generation,
+            checked in the same read as the matches
+
+    Returns:
+        Ids of the matching chunks, or None if the index isn't current at generation
+    """
+    if not substrings or any(len(substring) < TRIGRAM_LENGTH for substring in substrings):
+        raise ValueError(f"Need one or more substrings of at least {TRIGRAM_LENGTH} characters")
+    if not _exists(data_dir):
+        return set() if generation is None else None
+    # Each substring becomes one phrase of consecutive trigrams; quotes are doubled
+    query = " AND ".join('"{}"'.format(substring.replace('"', '""')) for substring in substrings)
+    with open_sidecar(data_dir) as conn:
+        # One read transaction, so a rebuild or write can't land between check and matches
+        conn.execute("BEGIN")
+        try:
+            if generation is not None and _text_index_generation(conn, collection_id) != generation:
+                return None
+            rows = conn.execute(
+                """
+                SELECT chunks.chunk_id
+                FROM chunks_trigram JOIN chunks ON chunks.rowid = chunks_trigram.rowid
+                WHERE chunks_trigram MATCH ? AND chunks.collection_id = ?
+                """,
+                (query, collection_id),
+            ).fetchall()
+        finally:
+            conn.rollback()
+    return {row[0] for row in rows}
+
+
+##### Document manifest #####
+
+
+def record_chunks(
+    data_dir: Optional[str],
+    collection_id: str,
+    ids: Sequence[str],
+    metadatas: Sequence[Optional[Dict]],
+) -> None:
+    """Add or replace chunks in the document manifest.
+
+    Chunks are grouped into documents by their "source" metadata; filename, sha256,
+    page_count, chunk_index and char_count are read from the same metadata when
+    present. Chunks without a source are tracked but belong to no document.
+    """
+    with open_sidecar(data_dir) as conn:
+        with conn:
+            _record_chunks(conn, collection_id, ids, metadatas)
+
+
+def _record_chunks(
+    conn: sqlite3.Connection,
+    collection_id: str,
+    ids: Sequence[str],
+    metadatas: Sequence[Optional[Dict]],
+) -> None:
+    metadatas = [metadata or {} for metadata in metadatas]
+    # A chunk whose source changed must be taken off its old document too
+    sources = _chunk_sources(conn, collection_id, ids)
+    conn.executemany(
+        """
+        INSERT OR REPLACE INTO document_chunks
+            (collection_id, chunk_id, source, chunk_index, char_count)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        [
+            (
+                collection_id,
+                chunk_id,
+                metadata.get("source"),
+                metadata.get("chunk_index"),
+                metadata.get("char_count") or 0,
+            )
+            for chunk_id, metadata in zip(ids, metadatas, strict=True)
+        ],
+    )
+    documents = {}
+    for metadata in metadatas:
+        source = metadata.get("source")
+        if source is not None:
+            documents.setdefault(source, metadata)
+    conn.executemany(
+        """
+        INSERT INTO documents (collection_id, source, filename, sha256, page_count)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(collection_id, source) DO UPDATE SET
+            filename = excluded.filename,
+            sha256 = COALESCE(excluded.sha256, sha256),
+            page_count = COALESCE(excluded.page_count, page_count)
+        """,
+        [
+            (
+                collection_id,
+                source,
+                metadata.get("filename", os.path.basename(source)),
+                metadata.get("sha256"),
+                metadata.get("page_count"),
+            )
+            for source, metadata in documents.items()
+        ],
+    )
+    _refresh_documents(conn, collection_id, sources | set(documents))
+
+
+def _chunk_sources(conn: sqlite3.Connection, collection_id: str, ids: Sequence[str]) -> Set[str]:
+    sources = set()
+    for chunk_id in ids:
+        row = conn.execute(
+            "SELECT source FROM document_chunks WHERE collection_id = ? AND chunk_id = ?",
+            (collection_id, chunk_id),
+        ).fetchone()
+        if row and row[0] is not None:
+            sources.add(row[0])
+    return sources
+
+
+def _refresh_documents(conn: sqlite3.Connection, collection_id: str, sources: Set[str]) -> None:
+    """Recount the chunks of the given documents, dropping documents left without any."""
+    for source in sources:
+        chunk_count, total_chars = conn.execute(
+            """
+            SELECT COUNT(*), COALESCE(SUM(char_count), 0) FROM document_chunks
+            WHERE collection_id = ? AND source = ?
+            """,
+            (collection_id, source),
+        ).fetchone()
+        if chunk_count:
+            conn.execute(
+                """
+                UPDATE documents SET chunk_count = ?, total_chars = ?
+                WHERE collection_id = ? AND source = ?
+                """,
+                (chunk_count, total_chars, collection_id, source),
+            )
+        else:
+            conn.execute(
+                "DELETE FROM documents WHERE collection_id = ? AND source = ?",
+                (collection_id, source),
+            )
+
+
+def manifest_count(data_dir: Optional[str], collection_id: str) -> int:
+    """Count the chunks tracked by a collection's document manifest."""
+    if not _exists(data_dir):
+        return 0
+    with open_sidecar(data_dir) as conn:
+        row = conn.execute(
+            "SELECT COUNT(*) FROM document_chunks WHERE collection_id = ?", (collection_id,)
+        ).fetchone()
+    return row[0]
+
+
+def ensure_manifest(data_dir: Optional[str], collection) -> bool:
+    """Rebuild a collection's document manifest if it doesn't cover every chunk.
+
+    Ingest keeps the manifest current; this catches collections created before it
+    existed or written to by other means. Returns True if it was rebuilt.
+    """
+    with rebuild_lock(data_dir, str(collection.id)):
+        if manifest_count(data_dir, str(collection.id)) == collection.count():
+            return False
+        rebuild_collection(data_dir, collection, text=False)
+    return True
+
+
+_DOCUMENT_FIELDS = (
+    "source", "filename", "sha256", "chunk_count", "total_chars", "page_count", "ingested_at"
+)
+
+
+def list_documents(
+    data_dir: Optional[str],
+    collection_id: str,
+    source: Optional[str] = None,
+    sha256: Optional[str] = None,
+) -> List[Dict]:
+    """List the documents in a collection's manifest, sorted by source.
+
+    Args:
+        source: Only the document with this source path
+        sha256: Only documents with this file hash
+    """
+    if not _exists(data_dir):
+        return []
+    query = f"SELECT {', '.join(_DOCUMENT_FIELDS)} FROM documents WHERE collection_id = ?"
+    params = [collection_id]
+    if source is not None:
+        query += " AND source = ?"
+        params.append(source)
+    if sha256 is not None:
+        query += " AND sha256 = ?"
+        params.append(sha256)
+    with open_sidecar(data_dir) as conn:
+        rows = conn.execute(query + " ORDER BY source", params).fetchall()
+    return [dict(zip(_DOCUMENT_FIELDS, row, strict=True)) for row in rows]
+
+
+def document_chunk_ids(data_dir: Optional[str], collection_id: str, source: str) -> List[str]:
+    """Get the ids of a document's chunks in chunk_index order."""
+    if not _exists(data_dir):
+        return []
+    with open_sidecar(data_dir) as conn:
+        rows = conn.execute(
+            """
+            SELECT chunk_id FROM document_chunks
+            WHERE collection_id = ? AND source = ?
+            ORDER BY chunk_index, chunk_id
+            """,
+            (collection_id, source),
+        ).fetchall()
+    return [row[0] for row in rows]
+
+
+def chunk_windows(
+    data_dir: Optional[str], collection_id: str, chunk_ids: Sequence[str], before: int, after: int
+) -> Dict[str, Tuple[str, List[Tuple[str, int]]]]:
+    """Find the chunks around each given chunk in its source document.
+
+    Uses the manifest's (source, chunk_index) index, one lookup per chunk.
+
+    Returns:
+        Map of chunk id to (source, [(chunk_id, chunk_index), ...] in chunk order)
+        covering chunk_index - before .. chunk_index + after; chunks without a
+        source or chunk_index in the manifest are left out
+    """
+    if not _exists(data_dir):
+        return {}
+    windows = {}
+    with open_sidecar(data_dir) as conn:
+        for chunk_id in chunk_ids:
+            row = conn.execute(
+                """
+                SELECT source, chunk_index FROM document_chunks
+                WHERE collection_id = ? AND chunk_id = ?
+                """,
+                (collection_id, chunk_id),
+            ).fetchone()
+            if not row or row[0] is None or row[1] is None:
+                continue
+            source, chunk_index = row
+            rows = conn.execute(
+                """
+                SELECT chunk_id, chunk_index FROM document_chunks
+                WHERE collection_id = ? AND source = ? AND chunk_index BETWEEN ? AND ?
+                ORDER BY chunk_index, chunk_id
+                """,
+                (collection_id, source, chunk_index - before, chunk_index + after),
+            ).fetchall()
+            windows[chunk_id] = (source, [(row[0], row[1]) for row in rows])
+    return windows
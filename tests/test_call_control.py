@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+from chroma_mcp.call_control import (
+    CallCancelled,
+    CallControl,
+    checkpoint,
+    controlled,
+    current_control,
+    report_progress,
+)
+
+
+def test_check_raises_after_cancel():
+    control = CallControl("chroma_get_documents")
+    control.check()
+    control.cancel("was cancelled")
+    control.cancel("ran past its 1s deadline")
+    with pytest.raises(CallCancelled, match="chroma_get_documents was cancelled"):
+        control.check()
+
+
+def test_check_raises_once_deadline_passes():
+    control = CallControl("chroma_update_documents", timeout=0.01)
+    assert 0 < control.remaining() <= 0.01
+    time.sleep(0.02)
+    assert control.remaining() == 0
+    with pytest.raises(CallCancelled, match="ran past its 0.01s deadline"):
+        control.check()
+    assert control.cancelled
+
+
+def test_no_deadline_by_default():
+    control = CallControl("chroma_peek_collection")
+    assert control.remaining() is None
+    assert not control.expired
+
+
+def test_checkpoint_and_progress_use_the_thread_control():
+    reports = []
+    control = CallControl(
+        "chroma_delete_collection", on_progress=lambda done, total: reports.append((done, total))
+    )
+
+    # Outside a call both are no-ops
+    checkpoint()
+    report_progress(1, 2)
+    with controlled(control):
+        assert current_control() is control
+        report_progress(1, 2)
+        control.cancel("was cancelled")
+        with pytest.raises(CallCancelled):
+            checkpoint()
+    assert current_control() is None
+    assert reports == [(1, 2)]
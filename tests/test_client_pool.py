@@ -0,0 +1,144 @@
+import os
+from contextlib import ExitStack
+
+from chroma_mcp.client_pool import ClientPool
+
+
+class FakeClient:
+    def __init__(self, path):
+        self.path = path
+
+
+def make_pool(closed=None, **kwargs):
+    opened = []
+    released = []
+
+    def factory(path):
+        opened.append(path)
+        return FakeClient(path)
+
+    def closer(client):
+        if closed is not None:
+            closed.append(client.path)
+
+    pool = ClientPool(factory=factory, on_release=released.append, closer=closer, **kwargs)
+    return pool, opened, released
+
+
+def test_switching_back_reuses_open_client(tmp_path):
+    pool, opened, _ = make_pool(max_clients=2)
+    a, b = str(tmp_path / "a"), str(tmp_path / "b")
+
+    first = pool.get(a)
+    pool.get(b)
+    assert pool.get(a) is first
+    assert opened == [a, b]
+    assert pool.stats()["hits"] == 1
+
+
+def test_least_recently_used_client_is_released(tmp_path):
+    pool, opened, released = make_pool(max_clients=2)
+    a, b, c = (str(tmp_path / name) for name in "abc")
+
+    pool.get(a)
+    pool.get(b)
+    pool.get(a)
+    pool.get(c)
+    assert released == [b]
+    assert [entry["path"] for entry in pool.stats()["open"]] == [c, a]
+
+    pool.get(b)
+    assert opened == [a, b, c, b]
+
+
+def test_idle_clients_are_released(tmp_path, monkeypatch):
+    import chroma_mcp.client_pool as client_pool
+
+    now = [1000.0]
+    monkeypatch.setattr(client_pool.time, "monotonic", lambda: now[0])
+    pool, _, released = make_pool(max_clients=4, idle_seconds=60)
+    a, b = str(tmp_path / "a"), str(tmp_path / "b")
+
+    pool.get(a)
+    now[0] += 120
+    pool.get(b)
+    assert released == [a]
+
+
+def test_paths_are_normalized(tmp_path):
+    pool, opened, _ = make_pool()
+    pool.get(str(tmp_path / "a"))
+    pool.get(os.path.join(str(tmp_path), "x", "..", "a"))
+    assert len(opened) == 1
+
+
+def test_released_persistent_client_is_closed_and_reopens(tmp_path):
+    from chromadb.api.shared_system_client import SharedSystemClient
+
+    from chroma_mcp.embeddings import get_embedding_function
+
+    pool = ClientPool(max_clients=1)
+    a, b = str(tmp_path / "a"), str(tmp_path / "b")
+
+    client = pool.get(a)
+    collection = client.create_collection(
+        "pooled", embedding_function=get_embedding_function("hash-768")
+    )
+    collection.upsert(ids=["target"], embeddings=[[1.0] * 768])
+    pool.get(b)
+    stats = pool.stats()
+    assert (stats["evictions"], stats["closed"]) == (1, 1)
+    # The System is gone from chromadb's cache, so its memory can be freed
+    assert client._identifier not in SharedSystemClient._identifier_to_system
+
+    reopened = pool.get(a)
+    assert reopened is not client
+    found = reopened.get_collection("pooled").query(query_embeddings=[[1.0] * 768], n_results=1)
+    assert found["ids"] == [["target"]]
+    pool.clear()
+    assert pool.stats()["closed"] == 3
+
+
+def test_client_released_during_a_lease_closes_after_it(tmp_path):
+    closed = []
+    pool, opened, released = make_pool(closed, max_clients=1)
+    a, b, c = (str(tmp_path / name) for name in "abc")
+
+    with pool.lease():
+        first = pool.get(a)
+        pool.get(b)
+        assert released == [a]
+        # Still in use by the lease, so reopening takes the same client back
+        assert pool.get(a) is first
+        assert opened == [a, b]
+        assert closed == []
+        assert pool.stats()["awaiting_close"] == [b]
+    assert closed == [b]
+
+    # Leases that start after a release don't hold the released client open
+    earlier = ExitStack()
+    earlier.enter_context(pool.lease())
+    pool.get(c)
+    with pool.lease():
+        assert closed == [b]
+        earlier.close()
+        assert closed == [b, a]
+
+
+def test_pinned_client_is_never_released(tmp_path, monkeypatch):
+    import chroma_mcp.client_pool as client_pool
+
+    now = [1000.0]
+    monkeypatch.setattr(client_pool.time, "monotonic", lambda: now[0])
+    pool, opened, released = make_pool(max_clients=1, idle_seconds=60)
+    a, b, c = (str(tmp_path / name) for name in "abc")
+
+    pool.pin(a)
+    pool.get(a)
+    pool.get(b)
+    now[0] += 120
+    pool.get(c)
+    assert released == [b]
+    assert pool.stats()["pinned"] == a
+    pool.get(a)
+    assert opened == [a, b, c]
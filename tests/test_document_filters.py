@@ -0,0 +1,36 @@
+from chroma_mcp.document_filters import required_literals, resolve_candidates
+
+
+def test_required_literals():
+    assert required_literals("motion to dismiss") == ["motion to dismiss"]
+    assert required_literals(r"Case No\. \d+-cv-\d+") == ["Case No. ", "-cv-"]
+    # Optional atoms and groups are dropped, repeated ones end the literal
+    assert required_literals("colou?r") == ["colo", "r"]
+    assert required_literals("(plaintiff|defendant)'s brief") == ["'s brief"]
+    assert required_literals("ab+c") == ["ab", "c"]
+    assert required_literals("[A-Z]{2}-docket") == ["-docket"]
+
+
+def test_required_literals_gives_up_when_unsure():
+    assert required_literals("plaintiff|defendant") == []
+    assert required_literals("(?i)motion") == []
+    assert required_literals(r"\x41bc") == []
+    assert required_literals("unclosed(group") == []
+
+
+def test_resolve_candidates():
+    index = {"abc": {"1", "2"}, "def": {"2", "3"}}
+
+    def lookup(substrings):
+        return set.intersection(*(index.get(s, set()) for s in substrings))
+
+    assert resolve_candidates({"$contains": "abc"}, lookup) == {"1", "2"}
+    assert resolve_candidates({"$regex": "abc.*def"}, lookup) == {"2"}
+    both = {"$and": [{"$contains": "abc"}, {"$not_contains": "x"}]}
+    assert resolve_candidates(both, lookup) == {"1", "2"}
+    either = {"$or": [{"$contains": "abc"}, {"$contains": "def"}]}
+    assert resolve_candidates(either, lookup) == {"1", "2", "3"}
+    # Short substrings, negations and ORs with an open clause can't be narrowed
+    assert resolve_candidates({"$contains": "ab"}, lookup) is None
+    assert resolve_candidates({"$not_regex": "abc"}, lookup) is None
+    assert resolve_candidates({"$or": [{"$contains": "abc"}, {"$regex": "a|b"}]}, lookup) is None
@@ -0,0 +1,53 @@
+import threading
+
+import pytest
+
+from chroma_mcp.embedding_pool import EmbeddingWorkerPool
+from chroma_mcp.embeddings import HASH_768, embedding_function_config, get_embedding_function
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = EmbeddingWorkerPool(1, max_batch=64, preload=embedding_function_config(HASH_768))
+    pool.warm_up()
+    yield pool
+    pool.shutdown()
+
+
+def test_pool_embeddings_match_in_process(pool):
+    texts = ["summary judgment", "statute of limitations"]
+    expected = get_embedding_function(HASH_768)(texts)
+    embeddings = pool.embed(embedding_function_config(HASH_768), texts)
+    assert len(embeddings) == 2
+    for embedding, reference in zip(embeddings, expected, strict=True):
+        assert list(embedding) == pytest.approx(list(reference))
+    assert pool.embed(embedding_function_config(HASH_768), []) == []
+
+
+def test_concurrent_requests_are_batched(pool):
+    ef_config = embedding_function_config(HASH_768)
+    before = pool.stats()
+    results = {}
+    start = threading.Barrier(24)
+
+    def query(index):
+        start.wait()
+        results[index] = pool.embed(ef_config, [f"query {index}"])
+
+    threads = [threading.Thread(target=query, args=(index,)) for index in range(24)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = pool.stats()
+    assert stats["requests"] - before["requests"] == 24
+    # With one worker, queries that arrive while it is busy share a batch
+    assert stats["batches"] - before["batches"] < 24
+    expected = get_embedding_function(HASH_768)(["query 5"])[0]
+    assert list(results[5][0]) == pytest.approx(list(expected))
+
+
+def test_pool_rejects_bad_sizes():
+    with pytest.raises(ValueError):
+        EmbeddingWorkerPool(0)
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+from chromadb.utils.embedding_functions import known_embedding_functions
+
+from chroma_mcp.embeddings import (
+    HASH_768,
+    MPNET_768,
+    HashEmbeddingFunction,
+    get_embedding_function,
+    get_embedding_function_name,
+    select_embedding_function,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_selection():
+    yield
+    select_embedding_function(None)
+
+
+def test_hash_embedding_is_deterministic_and_normalized():
+    ef = HashEmbeddingFunction()
+    first = ef(["Motion to dismiss for lack of jurisdiction"])
+    second = HashEmbeddingFunction()(["Motion to dismiss for lack of jurisdiction"])
+
+    assert len(first[0]) == 768
+    assert np.array_equal(first[0], second[0])
+    assert np.isclose(np.linalg.norm(first[0]), 1.0)
+
+
+def test_hash_embedding_similar_texts_are_closer():
+    ef = HashEmbeddingFunction()
+    query, related, unrelated = ef(
+        ["breach of contract damages", "damages for breach of contract", "parrots eat seeds"]
+    )
+
+    assert float(np.dot(query, related)) > float(np.dot(query, unrelated))
+
+
+def test_hash_embedding_handles_empty_text():
+    vector = HashEmbeddingFunction()([""])[0]
+    assert np.isclose(np.linalg.norm(vector), 1.0)
+
+
+def test_hash_embedding_is_registered():
+    ef = HashEmbeddingFunction()
+    assert known_embedding_functions[ef.name()] is HashEmbeddingFunction
+
+    rebuilt = HashEmbeddingFunction.build_from_config(ef.get_config())
+    assert rebuilt.dimensions == 768
+
+
+def test_embedding_function_selection(monkeypatch):
+    monkeypatch.setenv("PARABEAGLE_EMBEDDING_FUNCTION", HASH_768)
+    assert get_embedding_function_name() == HASH_768
+    assert isinstance(get_embedding_function(), HashEmbeddingFunction)
+
+    select_embedding_function(MPNET_768)
+    assert get_embedding_function_name() == MPNET_768
+
+    with pytest.raises(ValueError, match="Unknown embedding function"):
+        select_embedding_function("word2vec")
+
+
+def test_query_embedding_cache_lru():
+    """The cache embeds only misses, batches them, and evicts least recently used."""
+    from chroma_mcp.embeddings import QueryEmbeddingCache
+
+    calls = []
+
+    def factory():
+        def embed(texts):
+            calls.append(list(texts))
+            return HashEmbeddingFunction()(texts)
+        return embed
+
+    cache = QueryEmbeddingCache(max_entries=2)
+    first = cache.embed("m", factory, ["alpha", "beta", "alpha"])
+    assert calls == [["alpha", "beta"]]
+    assert np.allclose(first[0], first[2])
+
+    cache.embed("m", factory, ["alpha"])
+    assert len(calls) == 1
+
+    # "gamma" evicts "beta", the least recently used entry
+    cache.embed("m", factory, ["gamma"])
+    cache.embed("m", factory, ["beta"])
+    assert calls[-1] == ["beta"]
+
+    # A different model never shares entries
+    cache.embed("other", factory, ["alpha"])
+    assert calls[-1] == ["alpha"]
+    assert cache.stats()["entries"] == 2
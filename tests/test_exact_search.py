@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from chroma_mcp.exact_search import EmbeddingMatrix, ExactSearchCache
+
+
+def _vectors(rows, dim=8, seed=0):
+    return np.random.default_rng(seed).normal(size=(rows, dim)).astype(np.float32)
+
+
+def _reference(embeddings, query, space):
+    if space == "cosine":
+        unit = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return 1 - unit @ (query / np.linalg.norm(query))
+    if space == "l2":
+        return ((embeddings - query) ** 2).sum(axis=1)
+    return 1 - embeddings @ query
+
+
+@pytest.mark.parametrize("space", ["cosine", "l2", "ip"])
+def test_search_matches_full_scan(space):
+    embeddings = _vectors(50)
+    queries = _vectors(2, seed=1)
+    ids = [f"c{i}" for i in range(50)]
+    matrix = EmbeddingMatrix(ids, embeddings, space)
+    assert matrix.matrix.dtype == np.float32 and matrix.matrix.flags["C_CONTIGUOUS"]
+
+    found_ids, found_distances = matrix.search(queries, 5)
+    for query, hit_ids, distances in zip(queries, found_ids, found_distances, strict=True):
+        expected = _reference(embeddings, query, space)
+        order = np.argsort(expected)[:5]
+        assert hit_ids == [ids[row] for row in order]
+        assert distances == pytest.approx(expected[order].tolist(), abs=1e-5)
+
+
+def test_search_within_allowed_ids():
+    embeddings = _vectors(20)
+    ids = [f"c{i}" for i in range(20)]
+    matrix = EmbeddingMatrix(ids, embeddings, "l2")
+    found_ids, _ = matrix.search([embeddings[3]], 10, allowed_ids=["c3", "c7", "missing"])
+    assert found_ids == [["c3", "c7"]]
+    assert matrix.search([embeddings[3]], 10, allowed_ids=[]) == ([[]], [[]])
+
+
+def test_empty_matrix_returns_no_hits():
+    matrix = EmbeddingMatrix([], [], "cosine")
+    assert len(matrix) == 0
+    assert matrix.search(_vectors(1), 3) == ([[]], [[]])
+
+
+def test_cache_reloads_on_new_generation_and_evicts_oldest():
+    cache = ExactSearchCache(max_entries=2)
+    loads = []
+
+    def loader(name):
+        def load():
+            loads.append(name)
+            return EmbeddingMatrix(["a"], _vectors(1), "cosine")
+        return load
+
+    first = cache.get(("dir", "one"), 1, loader("one"))
+    assert cache.get(("dir", "one"), 1, loader("one")) is first
+    assert cache.size(("dir", "one"), 1) == 1
+    assert cache.size(("dir", "one"), 2) is None
+    cache.get(("dir", "one"), 2, loader("one"))
+    cache.get(("dir", "two"), 1, loader("two"))
+    cache.get(("dir", "three"), 1, loader("three"))
+    assert loads == ["one", "one", "two", "three"]
+    assert cache.size(("dir", "one"), 2) is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 4, 2)
+    assert stats["bytes"] == 2 * 8 * 4
+    cache.discard_collection("two")
+    assert cache.stats()["entries"] == 1
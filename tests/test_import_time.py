@@ -0,0 +1,133 @@
+"""Import-time budget: the server and CLI helpers must not pull in chromadb at import,
+and the server must answer the MCP handshake before it opens the Chroma client."""
+
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Seconds our own modules may add on top of their unavoidable dependencies (mcp,
+# dotenv). chromadb alone costs about a second, so a regression blows well past this.
+IMPORT_BUDGET = float(os.getenv("PARABEAGLE_IMPORT_BUDGET", "0.3"))
+
+# Seconds the server may take to answer initialize beyond starting an interpreter
+# and importing mcp; opening a persistent client costs about a second.
+STARTUP_BUDGET = float(os.getenv("PARABEAGLE_STARTUP_BUDGET", "0.5"))
+
+HEAVY_MODULES = ["chromadb", "numpy", "torch", "sentence_transformers", "onnxruntime"]
+
+
+def probe_env() -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [str(ROOT / "src"), str(ROOT / "cli"), str(ROOT / "impexp"), env.get("PYTHONPATH", "")]
+    )
+    env["ANONYMIZED_TELEMETRY"] = "False"
+    return env
+
+
+def run_import_probe(setup: str, target: str) -> dict:
+    """Import setup, then time importing target in a fresh interpreter."""
+    code = f"""
+import sys, time, json
+{setup}
+start = time.perf_counter()
+{target}
+elapsed = time.perf_counter() - start
+loaded = [m for m in {HEAVY_MODULES!r} if m in sys.modules]
+print(json.dumps({{"elapsed": elapsed, "loaded": loaded}}))
+"""
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", code],
+        capture_output=True,
+        text=True,
+        env=probe_env(),
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_server_import_is_light():
+    """Importing the server must not import chromadb or embedding models."""
+    probe = run_import_probe(
+        "import mcp.server.fastmcp, dotenv", "import chroma_mcp.server"
+    )
+    assert probe["loaded"] == []
+    assert probe["elapsed"] < IMPORT_BUDGET
+
+
+def test_package_import_is_light():
+    """The console-script entry point defers the server import to main()."""
+    probe = run_import_probe("", "import chroma_mcp")
+    assert probe["loaded"] == []
+    assert probe["elapsed"] < IMPORT_BUDGET
+
+
+@pytest.mark.parametrize("module", ["common", "lscol", "manage_dirs", "mkcol", "rmcol"])
+def test_cli_import_is_light(module):
+    """Metadata-only CLI modules import without chromadb."""
+    probe = run_import_probe("", f"import {module}")
+    assert probe["loaded"] == []
+    assert probe["elapsed"] < IMPORT_BUDGET
+
+
+@pytest.mark.parametrize("module", ["export_collection", "import_collection"])
+def test_impexp_import_is_light(module):
+    """The archive tools defer chromadb and the embedding functions until they run."""
+    probe = run_import_probe("", f"import {module}")
+    assert probe["loaded"] == []
+    assert probe["elapsed"] < IMPORT_BUDGET
+
+
+def time_initialize(data_dir: str) -> float:
+    """Start the stdio server and time it until it answers an MCP initialize request."""
+    request = {
+        "jsonrpc": "2.0",
+        "id": 1,
+        "method": "initialize",
+        "params": {
+            "protocolVersion": "2024-11-05",
+            "capabilities": {},
+            "clientInfo": {"name": "startup-probe", "version": "0"},
+        },
+    }
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [
+            sys.executable, "-W", "ignore", "-m", "chroma_mcp.server",
+            "--client-type", "persistent", "--data-dir", data_dir, "--warmup", "none",
+        ],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        env=probe_env(),
+    )
+    try:
+        server.stdin.write(json.dumps(request) + "\n")
+        server.stdin.flush()
+        response = json.loads(server.stdout.readline())
+        elapsed = time.perf_counter() - started
+    finally:
+        server.kill()
+        server.wait()
+    assert response["id"] == 1 and "result" in response
+    return elapsed
+
+
+def test_server_answers_initialize_before_opening_chroma(tmp_path):
+    """Startup up to the first read of stdin must not wait for chromadb or the client."""
+    started = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", "import mcp.server.fastmcp, dotenv"],
+        env=probe_env(),
+        check=True,
+    )
+    baseline = time.perf_counter() - started
+    assert time_initialize(str(tmp_path)) - baseline < STARTUP_BUDGET
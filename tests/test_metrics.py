@@ -0,0 +1,52 @@
+import json
+
+from chroma_mcp.metrics import LatencySeries, MetricsFileWriter, ServerMetrics
+
+
+def test_latency_series_percentiles():
+    series = LatencySeries(window=100)
+    for ms in range(1, 101):
+        series.record(ms / 1000)
+    summary = series.summary()
+    assert summary["count"] == 100
+    assert summary["p50_ms"] == 50.0
+    assert summary["p95_ms"] == 95.0
+    assert summary["p99_ms"] == 99.0
+    assert summary["max_ms"] == 100.0
+
+
+def test_latency_series_window_keeps_recent_samples():
+    series = LatencySeries(window=2)
+    for seconds in (10.0, 0.001, 0.002):
+        series.record(seconds)
+    summary = series.summary()
+    assert summary["count"] == 3
+    assert summary["p99_ms"] == 2.0
+    assert summary["max_ms"] == 10000.0
+    assert LatencySeries().summary()["p50_ms"] is None
+
+
+def test_server_metrics_counts_calls_and_stages():
+    metrics = ServerMetrics()
+    metrics.begin_call("chroma_query_documents")
+    assert metrics.snapshot()["in_flight"] == {"chroma_query_documents": 1}
+    metrics.record_call("chroma_query_documents", 0.01, error=True)
+    with metrics.stage("search"):
+        pass
+
+    snapshot = metrics.snapshot()
+    assert snapshot["in_flight"] == {}
+    assert snapshot["tools"]["chroma_query_documents"]["errors"] == 1
+    assert snapshot["stages"]["search"]["count"] == 1
+
+
+def test_metrics_file_written_only_after_changes(tmp_path):
+    metrics = ServerMetrics()
+    path = tmp_path / "metrics" / "parabeagle.json"
+    writer = MetricsFileWriter(str(path), interval=1)
+
+    assert writer.maybe_write(metrics, metrics.snapshot)
+    assert not writer.maybe_write(metrics, metrics.snapshot)
+    metrics.record_stage("embedding", 0.002)
+    assert writer.maybe_write(metrics, metrics.snapshot)
+    assert json.loads(path.read_text())["stages"]["embedding"]["count"] == 1
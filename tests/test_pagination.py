@@ -0,0 +1,43 @@
+import pytest
+
+from chroma_mcp.pagination import (
+    CursorError,
+    decode_cursor,
+    encode_cursor,
+    page_size,
+    request_fingerprint,
+    slice_rows,
+    trim_to_budget,
+)
+
+
+def test_cursor_round_trip_and_validation():
+    fingerprint = request_fingerprint(None, {"kind": "order"}, None, ["documents"])
+    cursor = encode_cursor("coll-1", 3, 200, fingerprint)
+    assert decode_cursor(cursor, "coll-1", 3, fingerprint) == 200
+
+    with pytest.raises(CursorError, match="restart"):
+        decode_cursor(cursor, "coll-1", 4, fingerprint)
+    with pytest.raises(CursorError, match="different"):
+        decode_cursor(cursor, "coll-1", 3, request_fingerprint(None, None, None, ["documents"]))
+    with pytest.raises(CursorError, match="Invalid"):
+        decode_cursor("not a cursor", "coll-1", 3, fingerprint)
+
+
+def test_page_size_is_clamped():
+    assert page_size(None) == 100
+    assert page_size(5000) == 1000
+    with pytest.raises(ValueError):
+        page_size(0)
+
+
+def test_trim_to_budget_keeps_at_least_one_row():
+    result = {
+        "ids": ["a", "b", "c"],
+        "documents": ["x" * 40, "y" * 40, "z" * 40],
+        "metadatas": None,
+    }
+    assert trim_to_budget(result, 10_000) == 3
+    assert trim_to_budget(result, 100) == 1
+    assert trim_to_budget(result, 1) == 1
+    assert slice_rows(result, 1) == {"ids": ["a"], "documents": ["x" * 40], "metadatas": None}
@@ -0,0 +1,53 @@
+import pstats
+
+from chroma_mcp.profiling import PROFILE_ENV, profile_directory, profiled
+
+
+def _busy_work():
+    return sum(i * i for i in range(20000))
+
+
+def test_profiled_writes_stats_and_summary(tmp_path):
+    with profiled("unit test", str(tmp_path)):
+        _busy_work()
+
+    summaries = list(tmp_path.glob("*-unit_test-*.txt"))
+    assert len(summaries) == 1
+    summary = summaries[0].read_text()
+    assert summary.startswith("unit test: ")
+    assert "_busy_work" in summary
+    stats = pstats.Stats(str(summaries[0].with_suffix(".prof")))
+    assert any(func[2] == "_busy_work" for func in stats.stats)
+
+
+def test_profiled_blocks_run_concurrently(tmp_path):
+    import threading
+
+    entered = threading.Barrier(2, timeout=5)
+
+    def work(label):
+        with profiled(label, str(tmp_path)):
+            # Both threads are inside a profiled block at once, or this times out
+            entered.wait()
+            _busy_work()
+
+    threads = [threading.Thread(target=work, args=(f"thread {i}",)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not entered.broken
+
+
+def test_profiled_without_directory_does_nothing(tmp_path):
+    with profiled("off", None):
+        _busy_work()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_profile_directory_reads_environment(monkeypatch, tmp_path):
+    monkeypatch.delenv(PROFILE_ENV, raising=False)
+    assert profile_directory() is None
+    monkeypatch.setenv(PROFILE_ENV, str(tmp_path))
+    assert profile_directory() == str(tmp_path)
+    assert profile_directory("relative") != "relative"
@@ -0,0 +1,32 @@
+from chroma_mcp.ranking import reciprocal_rank_fusion
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["d", "b", "e"]])
+    assert fused[0] == "b"
+    assert set(fused) == {"a", "b", "c", "d", "e"}
+
+
+def test_reciprocal_rank_fusion_ties_keep_first_ranking_order():
+    assert reciprocal_rank_fusion([["a", "b"], ["b", "a"]]) == ["a", "b"]
+    assert reciprocal_rank_fusion([]) == []
+
+
+def test_diversify_mmr_skips_near_duplicates():
+    from chroma_mcp.ranking import diversify
+
+    relevance = [0.9, 0.89, 0.5]
+    embeddings = [[1.0, 0.0], [0.99, 0.01], [0.0, 1.0]]
+    assert diversify(relevance, 2) == [0, 1]
+    assert diversify(relevance, 2, embeddings=embeddings, mmr_lambda=0.5) == [0, 2]
+    assert diversify(relevance, 2, embeddings=embeddings, mmr_lambda=1.0) == [0, 1]
+
+
+def test_diversify_caps_groups():
+    from chroma_mcp.ranking import diversify
+
+    relevance = [0.9, 0.8, 0.7, 0.6]
+    groups = ["a.pdf", "a.pdf", None, "b.pdf"]
+    assert diversify(relevance, 3, groups=groups, max_per_group=1) == [0, 2, 3]
+    embeddings = [[1.0, 0.0], [0.0, 1.0], [1.0, 1.0], [1.0, -1.0]]
+    assert len(diversify(relevance, 4, embeddings=embeddings, groups=groups, max_per_group=1)) == 3
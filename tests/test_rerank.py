@@ -0,0 +1,38 @@
+import pytest
+
+from chroma_mcp.rerank import (
+    CrossEncoderReranker,
+    LexicalReranker,
+    create_reranker,
+    query_hash,
+)
+
+
+def test_lexical_reranker_scores_term_overlap():
+    reranker = LexicalReranker()
+    scores = reranker.score(
+        "statute of limitations",
+        ["the statute of limitations has run", "limitations on discovery", "unrelated text", None],
+    )
+    assert scores[0] > scores[1] > scores[2] == scores[3] == 0.0
+
+
+def test_lexical_reranker_prefers_terms_in_order():
+    documents = ["contract of breach", "breach of contract"]
+    scores = LexicalReranker().score("breach of contract", documents)
+    assert scores[1] > scores[0]
+
+
+def test_create_reranker():
+    assert create_reranker("none") is None
+    assert isinstance(create_reranker("lexical"), LexicalReranker)
+    cross_encoder = create_reranker("cross-encoder", "some/model")
+    assert isinstance(cross_encoder, CrossEncoderReranker)
+    assert cross_encoder.key == "cross-encoder:some/model"
+    with pytest.raises(ValueError, match="Unknown reranker"):
+        create_reranker("bm25")
+
+
+def test_query_hash_ignores_whitespace_differences():
+    assert query_hash("summary  judgment ") == query_hash("summary judgment")
+    assert query_hash("summary judgment") != query_hash("summary judgement")
@@ -0,0 +1,34 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "cli"))
+
+from rmpdf import match_documents  # noqa: E402
+
+
+def _document(source, sha256=None):
+    return {"source": source, "filename": os.path.basename(source), "sha256": sha256}
+
+
+def test_glob_does_not_match_nested_directories(tmp_path):
+    top = _document(str(tmp_path / "docs" / "a.pdf"))
+    nested = _document(str(tmp_path / "docs" / "sub" / "b.pdf"))
+
+    matched, unmatched = match_documents([top, nested], [str(tmp_path / "docs" / "*.pdf")])
+    assert matched == [top]
+    assert unmatched == []
+
+    matched, _ = match_documents([top, nested], [str(tmp_path / "docs" / "*" / "*.pdf")])
+    assert matched == [nested]
+
+
+def test_paths_and_sha256_values_match_manifest_documents(tmp_path):
+    digest = "ab" * 32
+    first = _document(str(tmp_path / "a.pdf"))
+    second = _document(str(tmp_path / "gone.pdf"), sha256=digest)
+
+    matched, unmatched = match_documents(
+        [first, second], [str(tmp_path / "a.pdf"), str(tmp_path / "missing.pdf")], [digest.upper()]
+    )
+    assert matched == [first, second]
+    assert unmatched == [str(tmp_path / "missing.pdf")]
@@ -7,11 +7,15 @@ from unittest.mock import patch, MagicMock
 import argparse
 from mcp.server.fastmcp.exceptions import ToolError  # Import ToolError
 import json  # Import json for parsing results
+import time
 
 
 # Add pytest-asyncio marker
 pytest_plugins = ["pytest_asyncio"]
 
+# Use the deterministic hash embeddings so tests never download or load mpnet
+os.environ.setdefault("PARABEAGLE_EMBEDDING_FUNCTION", "hash-768")
+
 
 @pytest.fixture(autouse=True)
 def setup_test_args():
@@ -1025,3 +1029,1308 @@ async def test_get_documents_collection_not_found():
         await mcp.call_tool(
             "chroma_get_documents", {"collection_name": "non_existent_collection", "ids": ["doc1"]}
         )
+
+
+@pytest.mark.asyncio
+async def test_query_with_hash_embedding_function():
+    """Test that collections created with the hash-768 stub can be queried."""
+    collection_name = "test_hash_embedding_query"
+    try:
+        await mcp.call_tool("chroma_create_collection", {"collection_name": collection_name})
+        collection = get_chroma_client().get_collection(collection_name)
+        assert collection.configuration_json["embedding_function"]["name"] == "parabeagle_hash"
+
+        collection.add(
+            documents=["The statute of limitations expired", "Parrots are colorful birds"],
+            metadatas=[{"filename": "a.pdf"}, {"filename": "b.pdf"}],
+            ids=["doc1", "doc2"],
+        )
+
+        result = await mcp.call_tool(
+            "chroma_query_with_sources",
+            {
+                "collection_name": collection_name,
+                "query_texts": ["statute of limitations"],
+                "n_results": 1,
+            },
+        )
+        assert "statute of limitations expired" in result[0].text
+        assert "a.pdf" in result[0].text
+
+    finally:
+        await mcp.call_tool("chroma_delete_collection", {"collection_name": collection_name})
+
+
+# --- Tests for tool execution on the worker pool ---
+
+
+def test_parse_tool_limits():
+    """Test parsing of per-tool concurrency limits."""
+    from chroma_mcp.server import parse_tool_limits
+
+    assert parse_tool_limits("") == {}
+    assert parse_tool_limits("chroma_query_documents=2, chroma_get_documents=1") == {
+        "chroma_query_documents": 2,
+        "chroma_get_documents": 1,
+    }
+    with pytest.raises(ValueError, match="expected tool=N"):
+        parse_tool_limits("chroma_query_documents")
+    with pytest.raises(ValueError, match="at least 1"):
+        parse_tool_limits("chroma_query_documents=0")
+
+
+@pytest.mark.asyncio
+async def test_light_tools_respond_while_heavy_tool_blocks():
+    """Test that a blocked heavy tool does not stall cheap metadata tools."""
+    import asyncio
+    import threading
+
+    from chroma_mcp import server
+
+    release = threading.Event()
+
+    def slow_query(*args, **kwargs):
+        release.wait(5)
+        return {"ids": [[]]}
+
+    with patch.object(server, "_query_documents", slow_query):
+        heavy = asyncio.create_task(
+            mcp.call_tool(
+                "chroma_query_documents",
+                {"collection_name": "any", "query_texts": ["slow"]},
+            )
+        )
+        await asyncio.sleep(0.05)
+        assert not heavy.done()
+
+        result = await asyncio.wait_for(
+            mcp.call_tool("chroma_get_active_directory", {}), timeout=2
+        )
+        assert "active directory" in result[0].text.lower()
+
+        release.set()
+        await asyncio.wait_for(heavy, timeout=5)
+
+
+@pytest.mark.asyncio
+async def test_tool_concurrency_limit():
+    """Test that a tool never runs more calls at once than its limit."""
+    import asyncio
+    import threading
+    import time as time_module
+
+    from chroma_mcp import server
+
+    lock = threading.Lock()
+    running = 0
+    peak = 0
+
+    def tracked(*args, **kwargs):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time_module.sleep(0.05)
+        with lock:
+            running -= 1
+        return "ok"
+
+    limit = server.TOOL_CONCURRENCY["chroma_delete_documents"]
+    await asyncio.gather(
+        *[server._run_blocking("chroma_delete_documents", tracked) for _ in range(4)]
+    )
+    assert peak == limit
+
+
+@pytest.mark.asyncio
+async def test_tool_concurrency_limit_holds_for_cancelled_calls():
+    """Test that a cancelled call keeps its slot until its blocking work returns."""
+    import asyncio
+    import threading
+
+    from chroma_mcp import server
+
+    started = threading.Event()
+    release = threading.Event()
+    entered = []
+
+    def writer(name):
+        entered.append(name)
+        started.set()
+        release.wait(5)
+        return name
+
+    assert server.TOOL_CONCURRENCY["chroma_update_documents"] == 1
+    try:
+        first = asyncio.create_task(server._run_blocking("chroma_update_documents", writer, "a"))
+        assert await asyncio.to_thread(started.wait, 5)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+        second = asyncio.create_task(server._run_blocking("chroma_update_documents", writer, "b"))
+        await asyncio.sleep(0.1)
+        assert entered == ["a"]
+
+        release.set()
+        assert await asyncio.wait_for(second, timeout=5) == "b"
+        assert entered == ["a", "b"]
+    finally:
+        release.set()
+
+
+# --- Tests for background warm-up ---
+
+
+@pytest.mark.asyncio
+async def test_warmup_runs_in_lifespan():
+    """Test that the lifespan warms the model and collections and reports progress."""
+    import asyncio
+
+    from chroma_mcp import server
+
+    collection_name = "test_warmup_collection"
+    await mcp.call_tool("chroma_create_collection", {"collection_name": collection_name})
+    get_chroma_client().get_collection(collection_name).add(
+        ids=["w1"], documents=["warm the segment"]
+    )
+
+    try:
+        server.configure_warmup("collections")
+        status = await mcp.call_tool("chroma_get_warmup_status", {})
+        assert json.loads(status[0].text)["state"] == "pending"
+
+        async with server.server_lifespan(mcp):
+            for _ in range(100):
+                if server.get_warmup_status()["state"] in ("ready", "failed"):
+                    break
+                await asyncio.sleep(0.05)
+
+        status = server.get_warmup_status()
+        assert status["state"] == "ready", status
+        assert status["model_seconds"] is not None
+        assert status["collections_warmed"] == status["collections_total"] >= 1
+    finally:
+        server.configure_warmup("none")
+        await mcp.call_tool("chroma_delete_collection", {"collection_name": collection_name})
+
+
+@pytest.mark.asyncio
+async def test_client_open_failure_surfaces_on_first_tool_call():
+    """Test that a client that failed to open at startup fails the first tool call."""
+    from chroma_mcp import server
+
+    def fail(args=None):
+        raise ValueError("unable to open database file")
+
+    with patch.object(server, "get_chroma_client", fail):
+        server._open_client()
+    with pytest.raises(ToolError, match="unable to open database file"):
+        await mcp.call_tool("chroma_list_collections", {})
+    # Later calls open the client again
+    await mcp.call_tool("chroma_list_collections", {})
+
+
+def test_configure_warmup_rejects_unknown_mode():
+    """Test that an unknown warm-up mode is rejected."""
+    from chroma_mcp import server
+
+    with pytest.raises(ValueError, match="Unknown warm-up mode"):
+        server.configure_warmup("everything")
+
+
+# --- Tests for the query embedding cache ---
+
+
+@pytest.mark.asyncio
+async def test_query_embedding_cache_shared_across_collections():
+    """Test that repeated queries hit the cache, including from another collection."""
+    from chroma_mcp import server
+
+    names = ["test_qcache_one", "test_qcache_two"]
+    for name in names:
+        await mcp.call_tool("chroma_create_collection", {"collection_name": name})
+        get_chroma_client().get_collection(name).add(
+            ids=["a", "b"], documents=["summary judgment motion", "discovery schedule"]
+        )
+
+    server._query_embedding_cache.clear()
+    try:
+        first = await mcp.call_tool(
+            "chroma_query_documents",
+            {"collection_name": names[0], "query_texts": ["summary judgment"], "n_results": 1},
+        )
+        assert json.loads(first[0].text)["ids"] == [["a"]]
+
+        # Same model and normalized text: served from the cache in both collections
+        await mcp.call_tool(
+            "chroma_query_with_sources",
+            {"collection_name": names[1], "query_texts": ["  summary   judgment "], "n_results": 1},
+        )
+
+        stats = await mcp.call_tool("chroma_get_cache_stats", {})
+        counters = json.loads(stats[0].text)["query_embeddings"]
+        assert counters["misses"] == 1
+        assert counters["hits"] == 1
+        assert counters["entries"] == 1
+    finally:
+        for name in names:
+            await mcp.call_tool("chroma_delete_collection", {"collection_name": name})
+
+
+# --- Tests for the query result cache ---
+
+
+@pytest.mark.asyncio
+async def test_query_result_cache_invalidated_by_writes():
+    """Test that repeats are served from the cache and writes invalidate them."""
+    from chroma_mcp import server
+
+    collection_name = "test_result_cache"
+    await mcp.call_tool("chroma_create_collection", {"collection_name": collection_name})
+    get_chroma_client().get_collection(collection_name).add(
+        ids=["a", "b"], documents=["privilege log review", "expert witness report"]
+    )
+    query = {"collection_name": collection_name, "query_texts": ["privilege log"], "n_results": 1}
+
+    server._query_result_cache.clear()
+    try:
+        first = json.loads((await mcp.call_tool("chroma_query_documents", query))[0].text)
+        assert first["documents"] == [["privilege log review"]]
+        second = json.loads((await mcp.call_tool("chroma_query_documents", query))[0].text)
+        assert first == second
+        assert server._query_result_cache.stats()["hits"] == 1
+
+        await mcp.call_tool(
+            "chroma_update_documents",
+            {
+                "collection_name": collection_name,
+                "ids": ["a"],
+                "documents": ["deposition transcript"],
+            },
+        )
+        third = json.loads((await mcp.call_tool("chroma_query_documents", query))[0].text)
+        assert third["documents"] != first["documents"]
+        assert server._query_result_cache.stats()["hits"] == 1
+
+        await mcp.call_tool(
+            "chroma_delete_documents", {"collection_name": collection_name, "ids": ["a"]}
+        )
+        fourth = json.loads((await mcp.call_tool("chroma_query_documents", query))[0].text)
+        assert fourth["ids"] == [["b"]]
+    finally:
+        await mcp.call_tool("chroma_delete_collection", {"collection_name": collection_name})
+
+
+# --- Tests for collection handle and embedding function caching ---
+
+
+@pytest.mark.asyncio
+async def test_collection_handles_cached_and_invalidated():
+    """Test that handles are reused, share one embedding function, and are dropped on rename."""
+    from chroma_mcp import server
+
+    names = ["test_handle_one", "test_handle_two"]
+    for name in names:
+        await mcp.call_tool("chroma_create_collection", {"collection_name": name})
+
+    try:
+        first = server.get_collection(names[0])
+        assert server.get_collection(names[0]) is first
+        # Both collections use hash-768, so they share a single embedding function
+        second = server.get_collection(names[1])
+        assert first._embedding_function is second._embedding_function
+
+        await mcp.call_tool(
+            "chroma_modify_collection",
+            {"collection_name": names[1], "new_name": "test_handle_renamed"},
+        )
+        names[1] = "test_handle_renamed"
+        assert "test_handle_two" not in server._collection_handles
+        assert server.get_collection(names[1]).id == second.id
+    finally:
+        for name in names:
+            await mcp.call_tool("chroma_delete_collection", {"collection_name": name})
+    assert names[0] not in server._collection_handles
+
+
+# --- Tests for federated queries ---
+
+
+@pytest.mark.asyncio
+async def test_federated_query_merges_collections():
+    """Test that hits from several collections merge into one ranked list with provenance."""
+    from chroma_mcp import server
+
+    docs = {
+        "test_fed_one": (["f1", "f2"], ["breach of contract damages", "weather report"]),
+        "test_fed_two": (["g1", "g2"], ["contract damages for breach", "lunch menu"]),
+    }
+    for name, (ids, documents) in docs.items():
+        await mcp.call_tool("chroma_create_collection", {"collection_name": name})
+        get_chroma_client().get_collection(name).add(ids=ids, documents=documents)
+    await mcp.call_tool(
+        "chroma_create_collection", {"collection_name": "test_fed_l2", "space": "l2"}
+    )
+
+    server._query_embedding_cache.clear()
+    server._metrics.reset()
+    try:
+        result = await mcp.call_tool(
+            "chroma_federated_query",
+            {
+                "query_text": "breach of contract damages",
+                "collections": list(docs) + ["test_fed_l2"],
+                "n_results": 2,
+            },
+        )
+        payload = json.loads(result[0].text)
+        assert payload["searched"] == 2
+        assert payload["skipped"] == [{"directory": "ephemeral", "collection": "test_fed_l2"}]
+        hits = payload["results"]
+        assert [(hit["collection"], hit["id"]) for hit in hits] == [
+            ("test_fed_one", "f1"),
+            ("test_fed_two", "g1"),
+        ]
+        assert hits[0]["distance"] <= hits[1]["distance"]
+        # One embedding for the query, shared by both collections
+        assert server._query_embedding_cache.stats()["misses"] == 1
+        # The whole federated call counts once, not once per collection searched
+        tool_stats = server._metrics.snapshot()["tools"]
+        assert list(tool_stats) == ["chroma_federated_query"]
+        assert tool_stats["chroma_federated_query"]["count"] == 1
+    finally:
+        for name in list(docs) + ["test_fed_l2"]:
+            await mcp.call_tool("chroma_delete_collection", {"collection_name": name})
+
+
+# --- Tests for hybrid search ---
+
+
+@pytest.mark.asyncio
+async def test_hybrid_query_ranks_exact_terms():
+    """Test that hybrid mode surfaces exact identifiers and respects filters."""
+    collection_name = "test_hybrid"
+    await mcp.call_tool("chroma_create_collection", {"collection_name": collection_name})
+    # Added through the raw client, so the lexical index is built on first use
+    get_chroma_client().get_collection(collection_name).add(
+        ids=["h1", "h2", "h3"],
+        documents=[
+            "The court granted the motion in case 24-cv-1187",
+            "The court denied the motion to compel discovery",
+            "Hearing on case 24-cv-1187 set for March",
+        ],
+        metadatas=[{"kind": "order"}, {"kind": "order"}, {"kind": "notice"}],
+    )
+    query = {
+        "collection_name": collection_name,
+        "query_texts": ["24-cv-1187"],
+        "n_results": 2,
+        "hybrid": True,
+    }
+    try:
+        result = json.loads((await mcp.call_tool("chroma_query_documents", query))[0].text)
+        assert set(result["ids"][0]) == {"h1", "h3"}
+        assert len(result["distances"][0]) == 2
+
+        filtered_query = {**query, "where": {"kind": "notice"}}
+        filtered = json.loads(
+            (await mcp.call_tool("chroma_query_documents", filtered_query))[0].text
+        )
+        assert filtered["ids"] == [["h3"]]
+    finally:
+        await mcp.call_tool("chroma_delete_collection", {"collection_name": collection_name})
+
+
+# --- Tests for indexed where_document filters ---
+
+
+@pytest.mark.asyncio
+async def test_document_filters_use_trigram_index():
+    """Test that indexed $contains/$regex filters return exactly what Chroma returns."""
+    from chroma_mcp import server
+
+    collection_name = "test_doc_filters"
+    await mcp.call_tool("chroma_create_collection", {"collection_name": collection_name})
+    collection = get_chroma_client().get_collection(collection_name)
+    collection.add(
+        ids=["d1", "d2", "d3", "d4"],
+        documents=[
+            "Case No. 24-cv-1187 order",
+            "case no. 24-cv-1187 notice",
+            "Case No. 23-cr-0042 docket",
+            "unrelated memo",
+        ],
+    )
+    filters = [
+        {"$contains": "24-cv-1187"},
+        {"$regex": r"Case No\. \d+-cv-\d+"},
+        {"$and": [{"$contains": "Case"}, {"$not_contains": "docket"}]},
+        {"$or": [{"$contains": "memo"}, {"$regex": "cr-00"}]},
+        {"$contains": "nothing like this"},
+    ]
+    try:
+        for where_document in filters:
+            expected = collection.get(where_document=where_document, include=["documents"])
+            assert server.document_filter_candidates(
+                collection, where_document, server.get_client_data_dir()
+            ) is not None
+            result = await mcp.call_tool(
+                "chroma_get_documents",
+                {
+                    "collection_name": collection_name,
+                    "where_document": where_document,
+                    "include": ["documents"],
+                },
+            )
+            assert json.loads(result[0].text)["ids"] == expected["ids"]
+
+            result = await mcp.call_tool(
+                "chroma_query_documents",
+                {
+                    "collection_name": collection_name,
+                    "query_texts": ["case number"],
+                    "n_results": 4,
+                    "where_document": where_document,
+                },
+            )
+            assert sorted(json.loads(result[0].text)["ids"][0]) == sorted(expected["ids"])
+    finally:
+        await mcp.call_tool("chroma_delete_collection", {"collection_name": collection_name})
+
+
+@pytest.mark.asyncio
+async def test_document_filters_scan_when_trigram_index_is_stale():
+    """Test that a trigram index behind its collection never narrows a query."""
+    from chroma_mcp import server, sidecar
+
+    collection_name = "test_doc_filters_stale"
+    await mcp.call_tool("chroma_create_collection", {"collection_name": collection_name})
+    collection = get_chroma_client().get_collection(collection_name)
+    collection.add(ids=["s1", "s2"], documents=["Exhibit A attached", "unrelated memo"])
+    data_dir = server.get_client_data_dir()
+    where_document = {"$contains": "Exhibit"}
+    rebuild = sidecar.rebuild_collection
+
+    def rebuild_during_write(data_dir, collection, **kwargs):
+        # A write lands while the index is being rebuilt
+        count = rebuild(data_dir, collection, **kwargs)
+        collection.add(ids=["s3"], documents=["Exhibit B attached"])
+        server.record_collection_write(str(collection.id))
+        return count
+
+    try:
+        assert server.document_filter_candidates(collection, where_document, data_dir) == ["s1"]
+
+        # A write that bypassed the index leaves it stale until the next rebuild
+        collection.add(ids=["s3"], documents=["Exhibit B attached"])
+        server.record_collection_write(str(collection.id))
+        assert sidecar.text_index_generation(data_dir, str(collection.id)) is None
+        assert server.document_filter_candidates(collection, where_document, data_dir) == [
+            "s1", "s3"
+        ]
+
+        collection.delete(ids=["s3"])
+        server.record_collection_write(str(collection.id))
+        with patch.object(sidecar, "rebuild_collection", rebuild_during_write):
+            assert server.document_filter_candidates(collection, where_document, data_dir) is None
+            result = await mcp.call_tool(
+                "chroma_get_documents",
+                {"collection_name": collection_name, "where_document": where_document},
+            )
+        assert json.loads(result[0].text)["ids"] == ["s1", "s3"]
+    finally:
+        await mcp.call_tool("chroma_delete_collection", {"collection_name": collection_name})
+
+
+# --- Tests for paged reads ---
+
+
+@pytest.mark.asyncio
+async def test_get_documents_pages_with_cursor():
+    """Test that large reads come back in bounded pages linked by cursors."""
+    from chroma_mcp import server
+
+    collection_name = "test_paging"
+    await mcp.call_tool("chroma_create_collection", {"collection_name": collection_name})
+    collection = get_chroma_client().get_collection(collection_name)
+    ids = [f"p{i:03d}" for i in range(25)]
+    collection.add(ids=ids, documents=[f"page test document {i} " + "x" * 200 for i in range(25)])
+
+    request = {"collection_name": collection_name, "include": ["documents"], "limit": 10}
+    try:
+        seen = []
+        cursor = None
+        while True:
+            args = dict(request, cursor=cursor) if cursor else request
+            page = json.loads((await mcp.call_tool("chroma_get_documents", args))[0].text)
+            assert len(page["ids"]) <= 10
+            seen.extend(page["ids"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        assert sorted(seen) == ids
+
+        # The response budget cuts pages short, and the cursor picks up where it stopped
+        server.configure_response_budget(1000)
+        page = json.loads((await mcp.call_tool("chroma_get_documents", request))[0].text)
+        assert 1 <= len(page["ids"]) < 10
+        next_page = dict(request, cursor=page["next_cursor"])
+        rest = json.loads((await mcp.call_tool("chroma_get_documents", next_page))[0].text)
+        assert rest["ids"][0] not in page["ids"]
+
+        # A write invalidates outstanding cursors
+        await mcp.call_tool(
+            "chroma_delete_documents", {"collection_name": collection_name, "ids": ["p000"]}
+        )
+        with pytest.raises(ToolError, match="restart from the first page"):
+            await mcp.call_tool("chroma_get_documents", dict(request, cursor=rest["next_cursor"]))
+
+        # Peeks leave out embeddings unless asked for them
+        peek_args = {"collection_name": collection_name}
+        peek = json.loads((await mcp.call_tool("chroma_peek_collection", peek_args))[0].text)
+        assert peek["embeddings"] is None
+        peek = json.loads(
+            (await mcp.call_tool(
+                "chroma_peek_collection",
+                {"collection_name": collection_name, "limit": 1, "include_embeddings": True},
+            ))[0].text
+        )
+        assert len(peek["embeddings"][0]) == 768
+    finally:
+        server.configure_response_budget(server.DEFAULT_RESPONSE_BUDGET)
+        await mcp.call_tool("chroma_delete_collection", {"collection_name": collection_name})
+
+
+# --- Tests for chunk context ---
+
+
+@pytest.mark.asyncio
+async def test_get_context_returns_neighboring_chunks():
+    """Test that hits expand to their neighbors in file order, also inside query_with_sources."""
+    collection_name = "test_context"
+    await mcp.call_tool("chroma_create_collection", {"collection_name": collection_name})
+    collection = get_chroma_client().get_collection(collection_name)
+    collection.add(
+        ids=[f"brief_{i}" for i in range(5)] + ["memo_0", "loose"],
+        documents=[f"brief paragraph {i}" for i in range(5)] + ["memo paragraph", "no source"],
+        metadatas=[
+            {"source": "/docs/brief.pdf", "filename": "brief.pdf", "chunk_index": i}
+            for i in range(5)
+        ] + [
+            {"source": "/docs/memo.pdf", "filename": "memo.pdf", "chunk_index": 0},
+            {"kind": "note"},
+        ],
+    )
+    try:
+        result = await mcp.call_tool(
+            "chroma_get_context",
+            {
+                "collection_name": collection_name,
+                "ids": ["brief_2", "brief_0", "loose"],
+                "window": 1,
+            },
+        )
+        payload = json.loads(result[0].text)
+        assert payload["missing"] == ["loose"]
+        assert [[chunk["id"] for chunk in ctx["chunks"]] for ctx in payload["contexts"]] == [
+            ["brief_1", "brief_2", "brief_3"],
+            ["brief_0", "brief_1"],
+        ]
+        assert payload["contexts"][0]["chunks"][0]["document"] == "brief paragraph 1"
+
+        result = await mcp.call_tool(
+            "chroma_query_with_sources",
+            {
+                "collection_name": collection_name,
+                "query_texts": ["brief paragraph 4"],
+                "n_results": 1,
+                "where": {"filename": "brief.pdf"},
+                "context_window": 1,
+            },
+        )
+        assert "[context] brief paragraph 3" in result[0].text
+        assert "brief.pdf" in result[0].text
+    finally:
+        await mcp.call_tool("chroma_delete_collection", {"collection_name": collection_name})
+
+
+# --- Tests for diversified queries ---
+
+
+@pytest.mark.asyncio
+async def test_query_with_sources_diversifies():
+    """Test that MMR and the per-source cap replace near-duplicate hits with other sources."""
+    collection_name = "test_diversify"
+    await mcp.call_tool("chroma_create_collection", {"collection_name": collection_name})
+    collection = get_chroma_client().get_collection(collection_name)
+    collection.add(
+        ids=["a0", "a1", "a2", "b0"],
+        documents=[
+            "summary judgment standard of review",
+            "summary judgment standard of review.",
+            "summary judgment standard of review!",
+            "summary judgment motion deadline",
+        ],
+        metadatas=[
+            {"source": "/docs/a.pdf", "filename": "a.pdf", "chunk_index": i} for i in range(3)
+        ] + [{"source": "/docs/b.pdf", "filename": "b.pdf", "chunk_index": 0}],
+    )
+    query = {
+        "collection_name": collection_name,
+        "query_texts": ["summary judgment standard of review"],
+        "n_results": 2,
+    }
+    try:
+        plain = (await mcp.call_tool("chroma_query_with_sources", query))[0].text
+        assert "b.pdf" not in plain
+
+        capped_query = {**query, "max_per_source": 1}
+        capped = (await mcp.call_tool("chroma_query_with_sources", capped_query))[0].text
+        assert "a.pdf" in capped and "b.pdf" in capped
+
+        diverse_query = {**query, "mmr": True, "mmr_lambda": 0.3}
+        diverse = (await mcp.call_tool("chroma_query_with_sources", diverse_query))[0].text
+        assert "motion deadline" in diverse
+    finally:
+        await mcp.call_tool("chroma_delete_collection", {"collection_name": collection_name})
+
+
+# --- Tests for reranked queries ---
+
+
+@pytest.mark.asyncio
+async def test_rerank_reorders_candidates_and_caches_scores():
+    """Test that rerank=True orders hits by reranker score and reuses cached scores."""
+    from chroma_mcp import server
+
+    collection_name = "test_rerank"
+    await mcp.call_tool("chroma_create_collection", {"collection_name": collection_name})
+    get_chroma_client().get_collection(collection_name).add(
+        ids=["r1", "r2", "r3"],
+        documents=[
+            "Deadlines for discovery motions",
+            "The statute of limitations for breach of contract is six years",
+            "Limitations on expert testimony",
+        ],
+        metadatas=[{"source": f"/docs/{i}.pdf", "filename": f"{i}.pdf"} for i in range(3)],
+    )
+    query = {
+        "collection_name": collection_name,
+        "query_texts": ["statute of limitations for breach of contract"],
+        "n_results": 2,
+        "include": ["metadatas", "distances"],
+        "rerank": True,
+    }
+    try:
+        with pytest.raises(Exception, match="--reranker"):
+            await mcp.call_tool("chroma_query_documents", query)
+
+        server.configure_reranker("lexical")
+        result = json.loads((await mcp.call_tool("chroma_query_documents", query))[0].text)
+        assert result["ids"][0][0] == "r2"
+        assert len(result["ids"][0]) == 2
+        assert result["rerank_scores"][0][0] == pytest.approx(1.06)
+        assert result["documents"] is None
+
+        stats = server._rerank_score_cache.stats()
+        await mcp.call_tool("chroma_query_documents", {**query, "n_results": 1})
+        assert server._rerank_score_cache.stats()["hits"] >= stats["hits"] + 3
+
+        sources_query = {**query, "include": None}
+        text = (await mcp.call_tool("chroma_query_with_sources", sources_query))[0].text
+        assert text.startswith("The statute of limitations")
+    finally:
+        server.configure_reranker("none")
+        await mcp.call_tool("chroma_delete_collection", {"collection_name": collection_name})
+
+
+# --- Tests for server metrics ---
+
+
+@pytest.mark.asyncio
+async def test_server_stats_report_tool_and_stage_latency(tmp_path):
+    """Test that query tools record per-tool and per-stage latency and the metrics file."""
+    from chroma_mcp import server
+
+    collection_name = "test_server_stats"
+    await mcp.call_tool("chroma_create_collection", {"collection_name": collection_name})
+    get_chroma_client().get_collection(collection_name).add(
+        ids=["s1", "s2"], documents=["alpha beta", "gamma delta"]
+    )
+    server._metrics.reset()
+    server.configure_metrics_file(str(tmp_path / "metrics.json"), interval=60)
+    try:
+        await mcp.call_tool(
+            "chroma_query_with_sources",
+            {"collection_name": collection_name, "query_texts": ["alpha"]},
+        )
+        stats = json.loads((await mcp.call_tool("chroma_server_stats", {}))[0].text)
+        query_stats = stats["tools"]["chroma_query_with_sources"]
+        assert query_stats["count"] == 1
+        assert query_stats["p50_ms"] is not None and query_stats["p99_ms"] >= query_stats["p50_ms"]
+        assert {"embedding", "search", "formatting"} <= set(stats["stages"])
+        assert "hit_rate" in stats["caches"]["query_embeddings"]
+        assert "open" in stats["caches"]["client_pool"]
+
+        server._write_metrics_file(server._metrics_writer)
+        written = json.loads((tmp_path / "metrics.json").read_text())
+        assert written["tools"]["chroma_query_with_sources"]["count"] == 1
+    finally:
+        server.configure_metrics_file(None)
+        await mcp.call_tool("chroma_delete_collection", {"collection_name": collection_name})
+
+
+# --- Tests for profiling ---
+
+
+@pytest.mark.asyncio
+async def test_profile_mode_writes_one_profile_per_tool_call(tmp_path):
+    """Test that --profile writes a cProfile summary for each blocking tool call."""
+    from chroma_mcp import server
+
+    server.configure_profiling(str(tmp_path))
+    try:
+        await mcp.call_tool("chroma_list_collections", {})
+        await mcp.call_tool("chroma_list_collections", {})
+        # Warm-up runs in the background and is left out
+        await server._run_blocking("chroma_warmup", lambda: None)
+    finally:
+        server.configure_profiling(None)
+
+    summaries = sorted(tmp_path.glob("*-chroma_list_collections-*.txt"))
+    assert len(summaries) == 2
+    assert "cumulative" in summaries[0].read_text()
+    assert len(list(tmp_path.glob("*.prof"))) == 2
+
+
+# --- Tests for explain mode ---
+
+
+@pytest.mark.asyncio
+async def test_explain_reports_stages_and_filter_candidates():
+    """Test that explain=True returns the same hits plus stage timings and filter counts."""
+    collection_name = "test_explain"
+    await mcp.call_tool("chroma_create_collection", {"collection_name": collection_name})
+    get_chroma_client().get_collection(collection_name).add(
+        ids=[f"e{i}" for i in range(6)],
+        documents=[
+            f"exhibit {i} concerns the easement" if i % 2 else f"exhibit {i} is a lease"
+            for i in range(6)
+        ],
+        metadatas=[
+            {"source": f"/docs/{i}.pdf", "filename": f"{i}.pdf", "page": i} for i in range(6)
+        ],
+    )
+    query = {
+        "collection_name": collection_name,
+        "query_texts": ["easement"],
+        "n_results": 2,
+        "where": {"page": {"$gte": 2}},
+        "where_document": {"$contains": "easement"},
+    }
+    try:
+        plain = json.loads((await mcp.call_tool("chroma_query_documents", query))[0].text)
+        explained = json.loads(
+            (await mcp.call_tool("chroma_query_documents", {**query, "explain": True}))[0].text
+        )
+        assert explained["ids"] == plain["ids"]
+        assert explained["documents"] == plain["documents"]
+        assert explained["metadatas"] == plain["metadatas"]
+        assert explained["distances"][0] == pytest.approx(plain["distances"][0])
+
+        plan = explained["explain"]
+        assert {"embedding", "filter", "search", "fetch"} <= set(plan["stages_ms"])
+        assert plan["candidates"]["collection_count"] == 6
+        assert plan["candidates"]["document_filter"] == "trigram index"
+        assert plan["candidates"]["filter_examined"] == 3
+        assert plan["candidates"]["filter_matches"] == 2
+        assert plan["candidates"]["returned"] == [2]
+
+        explain_query = {**query, "explain": True}
+        text = (await mcp.call_tool("chroma_query_with_sources", explain_query))[0].text
+        body, _, explain_json = text.partition("\n\nExplain:\n")
+        assert "easement" in body
+        assert "formatting" in json.loads(explain_json)["stages_ms"]
+    finally:
+        await mcp.call_tool("chroma_delete_collection", {"collection_name": collection_name})
+
+
+# --- Tests for the SSE transport ---
+
+
+def test_configure_transport_requires_loopback():
+    from chroma_mcp import server
+
+    with pytest.raises(ValueError, match="loopback"):
+        server.configure_transport("sse", "0.0.0.0", 8765)
+    with pytest.raises(ValueError, match="Unknown transport"):
+        server.configure_transport("websocket")
+    assert server._transport == "stdio"
+
+
+@pytest.mark.asyncio
+async def test_sse_transport_serves_concurrent_clients():
+    """Test that several SSE clients share one server and its caches."""
+    import asyncio
+    import socket
+    import threading
+
+    import uvicorn
+    from mcp import ClientSession
+    from mcp.client.sse import sse_client
+
+    from chroma_mcp import server
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server.configure_transport("sse", "127.0.0.1", port)
+    uvicorn_server = uvicorn.Server(
+        uvicorn.Config(server.create_sse_app(), host="127.0.0.1", port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=uvicorn_server.run, daemon=True)
+    thread.start()
+
+    collection_name = "test_sse_shared"
+
+    async def client(index):
+        async with sse_client(f"http://127.0.0.1:{port}/sse") as streams:
+            async with ClientSession(*streams) as session:
+                await session.initialize()
+                if index == 0:
+                    await session.call_tool(
+                        "chroma_create_collection", {"collection_name": collection_name}
+                    )
+                result = await session.call_tool("chroma_list_collections", {})
+                return result.content[0].text
+
+    try:
+        for _ in range(100):
+            if uvicorn_server.started:
+                break
+            await asyncio.sleep(0.05)
+        first = await client(0)
+        listings = await asyncio.gather(*(client(i) for i in range(1, 4)))
+        # Every client sees the collection the first one created
+        assert collection_name in first
+        assert all(collection_name in listing for listing in listings)
+    finally:
+        # Open SSE streams would hold up a graceful shutdown
+        uvicorn_server.should_exit = uvicorn_server.force_exit = True
+        thread.join(timeout=10)
+        server.configure_transport("stdio")
+        await mcp.call_tool("chroma_delete_collection", {"collection_name": collection_name})
+
+
+# --- Tests for embedding worker processes ---
+
+
+@pytest.mark.asyncio
+async def test_query_embeddings_from_worker_processes():
+    """Test that queries embedded by the worker pool return the same hits."""
+    from chroma_mcp import server
+
+    collection_name = "test_embedding_workers"
+    await mcp.call_tool("chroma_create_collection", {"collection_name": collection_name})
+    get_chroma_client().get_collection(collection_name).add(
+        ids=["w1", "w2", "w3"],
+        documents=["notice of appeal", "motion to dismiss", "appeal bond amount"],
+    )
+    query = {"collection_name": collection_name, "query_texts": ["appeal"], "n_results": 3}
+    try:
+        expected = json.loads((await mcp.call_tool("chroma_query_documents", query))[0].text)
+
+        server.configure_embedding_workers(1)
+        server._query_embedding_cache.clear()
+        server._query_result_cache.clear()
+        pooled = json.loads((await mcp.call_tool("chroma_query_documents", query))[0].text)
+        assert pooled["ids"] == expected["ids"]
+        assert pooled["distances"][0] == pytest.approx(expected["distances"][0])
+        assert server.get_server_stats()["embedding_pool"]["requests"] == 1
+    finally:
+        server.configure_embedding_workers(0)
+        await mcp.call_tool("chroma_delete_collection", {"collection_name": collection_name})
+
+
+# --- Tests for coalescing identical calls ---
+
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_queries_share_one_run():
+    """Test that identical calls in flight together run once and a write starts a new run."""
+    import asyncio
+    import time
+
+    from chroma_mcp import server
+
+    collection_name = "test_coalescing"
+    await mcp.call_tool("chroma_create_collection", {"collection_name": collection_name})
+    collection = get_chroma_client().get_collection(collection_name)
+    collection.add(ids=["c1", "c2"], documents=["notice of appeal", "motion to dismiss"])
+    query = {"collection_name": collection_name, "query_texts": ["appeal"], "n_results": 1}
+    original = server._query_with_sources
+    runs = []
+
+    def slow_query(*args):
+        runs.append(args)
+        time.sleep(0.2)
+        return original(*args)
+
+    try:
+        # The first call caches the collection handle that coalescing keys on
+        await mcp.call_tool("chroma_query_with_sources", query)
+        server._coalesced_calls.clear()
+        with patch.object(server, "_query_with_sources", slow_query):
+            results = await asyncio.gather(
+                *(mcp.call_tool("chroma_query_with_sources", query) for _ in range(3))
+            )
+            assert len(runs) == 1
+            assert len({result[0].text for result in results}) == 1
+            assert "notice of appeal" in results[0][0].text
+            assert server.get_coalescing_stats() == {
+                "joined": {"chroma_query_with_sources": 2},
+                "pending": 0,
+            }
+
+            # Calls made after a write never share a run started before it
+            server.record_collection_write(str(collection.id))
+            await asyncio.gather(
+                *(mcp.call_tool("chroma_query_with_sources", query) for _ in range(2))
+            )
+            await mcp.call_tool("chroma_query_with_sources", query)
+            assert len(runs) == 3
+    finally:
+        await mcp.call_tool("chroma_delete_collection", {"collection_name": collection_name})
+
+
+# --- Tests for deadlines, cancellation and progress ---
+
+
+def test_parse_tool_timeouts():
+    """Test parsing of per-tool deadlines."""
+    from chroma_mcp.server import parse_tool_timeouts
+
+    assert parse_tool_timeouts("") == {}
+    assert parse_tool_timeouts("chroma_delete_collection=600, chroma_get_documents=2.5") == {
+        "chroma_delete_collection": 600.0,
+        "chroma_get_documents": 2.5,
+    }
+    with pytest.raises(ValueError, match="expected tool=SECONDS"):
+        parse_tool_timeouts("chroma_get_documents")
+    with pytest.raises(ValueError, match="can't be negative"):
+        parse_tool_timeouts("chroma_get_documents=-1")
+
+
+def _wait_for_cancellation(started, stopped):
+    from chroma_mcp.call_control import CallCancelled, checkpoint
+
+    def work(collection_name):
+        started.set()
+        try:
+            while True:
+                checkpoint()
+                time.sleep(0.01)
+        except CallCancelled:
+            stopped.set()
+            raise
+
+    return work
+
+
+@pytest.mark.asyncio
+async def test_tool_deadline_fails_call_and_stops_work():
+    """Test that a call past its deadline fails and its worker stops at the next checkpoint."""
+    import threading
+
+    from chroma_mcp import server
+
+    started, stopped = threading.Event(), threading.Event()
+    server.configure_tool_timeouts(None, {"chroma_get_collection_count": 0.2})
+    try:
+        work = _wait_for_cancellation(started, stopped)
+        with patch.object(server, "_get_collection_count", work):
+            with pytest.raises(ToolError, match="ran past its 0.2s deadline"):
+                await mcp.call_tool("chroma_get_collection_count", {"collection_name": "slow"})
+        assert stopped.wait(timeout=5)
+    finally:
+        server.configure_tool_timeouts(None)
+
+
+@pytest.mark.asyncio
+async def test_timed_out_call_keeps_its_slot_until_the_worker_stops():
+    """Test that a call past its deadline holds its concurrency slot while its worker runs."""
+    import asyncio
+    import threading
+
+    from chroma_mcp import server
+    from chroma_mcp.call_control import CallCancelled
+
+    release = threading.Event()
+    lock = threading.Lock()
+    running = 0
+    peak = 0
+
+    def stuck(*args, **kwargs):
+        # Blocks without a checkpoint, like a long Chroma or SQLite call
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        release.wait(5)
+        with lock:
+            running -= 1
+        return "ok"
+
+    assert server.TOOL_CONCURRENCY["chroma_delete_collection"] == 1
+    server.configure_tool_timeouts(None, {"chroma_delete_collection": 0.2})
+    try:
+        with pytest.raises(CallCancelled, match="ran past its 0.2s deadline"):
+            await server._run_blocking("chroma_delete_collection", stuck)
+        assert running == 1
+
+        # The worker is still going, so the next call waits for the slot
+        server.configure_tool_timeouts(None)
+        second = asyncio.create_task(server._run_blocking("chroma_delete_collection", stuck))
+        await asyncio.sleep(0.2)
+        assert not second.done()
+        assert peak == 1
+
+        release.set()
+        assert await asyncio.wait_for(second, timeout=5) == "ok"
+        assert peak == 1
+    finally:
+        release.set()
+        server.configure_tool_timeouts(None)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_call_stops_work():
+    """Test that cancelling a tool call stops its blocking work."""
+    import asyncio
+    import threading
+
+    from chroma_mcp import server
+
+    started, stopped = threading.Event(), threading.Event()
+    with patch.object(server, "_get_collection_count", _wait_for_cancellation(started, stopped)):
+        call = asyncio.create_task(
+            mcp.call_tool("chroma_get_collection_count", {"collection_name": "slow"})
+        )
+        assert await asyncio.to_thread(started.wait, 5)
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        assert await asyncio.to_thread(stopped.wait, 5)
+
+
+@pytest.mark.asyncio
+async def test_coalesced_call_stops_when_every_caller_cancels():
+    """Test that a shared call keeps running for its remaining callers and stops with the last."""
+    import asyncio
+    import threading
+
+    from chroma_mcp import server
+
+    collection_name = "test_coalesced_cancel"
+    await mcp.call_tool("chroma_create_collection", {"collection_name": collection_name})
+    arguments = {"collection_name": collection_name}
+    started, stopped = threading.Event(), threading.Event()
+    try:
+        # The first call caches the collection handle that coalescing keys on
+        await mcp.call_tool("chroma_get_collection_count", arguments)
+        work = _wait_for_cancellation(started, stopped)
+        with patch.object(server, "_get_collection_count", work):
+            calls = [
+                asyncio.create_task(mcp.call_tool("chroma_get_collection_count", arguments))
+                for _ in range(2)
+            ]
+            assert await asyncio.to_thread(started.wait, 5)
+            assert server.get_coalescing_stats()["pending"] == 1
+
+            calls[0].cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await calls[0]
+            assert not await asyncio.to_thread(stopped.wait, 0.2)
+
+            calls[1].cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await calls[1]
+            assert await asyncio.to_thread(stopped.wait, 5)
+            assert server.get_coalescing_stats()["pending"] == 0
+    finally:
+        await mcp.call_tool("chroma_delete_collection", {"collection_name": collection_name})
+
+
+@pytest.mark.asyncio
+async def test_coalesced_call_reports_progress_to_every_caller():
+    """Test that progress from a shared call reaches each caller waiting on it."""
+    import asyncio
+    import threading
+
+    from chroma_mcp import server
+    from chroma_mcp.call_control import report_progress
+
+    collection_name = "test_coalesced_progress"
+    await mcp.call_tool("chroma_create_collection", {"collection_name": collection_name})
+    arguments = {"collection_name": collection_name}
+    release = threading.Event()
+    reports = []
+
+    def counted(collection_name):
+        release.wait(5)
+        report_progress(1, 1)
+        return 0
+
+    def sender():
+        caller_reports = []
+        reports.append(caller_reports)
+
+        def send(done, total):
+            caller_reports.append((done, total))
+
+        return send
+
+    try:
+        await mcp.call_tool("chroma_get_collection_count", arguments)
+        with patch.object(server, "_get_collection_count", counted), patch.object(
+            server, "_progress_sender", sender
+        ):
+            calls = [
+                asyncio.create_task(mcp.call_tool("chroma_get_collection_count", arguments))
+                for _ in range(2)
+            ]
+            while len(reports) < 2:
+                await asyncio.sleep(0.01)
+            release.set()
+            await asyncio.gather(*calls)
+        assert reports == [[(1, 1)], [(1, 1)]]
+    finally:
+        await mcp.call_tool("chroma_delete_collection", {"collection_name": collection_name})
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_reports_progress_per_batch():
+    """Test that a bulk update reports progress after each batch of documents."""
+    from chroma_mcp import server
+
+    collection_name = "test_update_progress"
+    await mcp.call_tool("chroma_create_collection", {"collection_name": collection_name})
+    ids = [f"u{i}" for i in range(250)]
+    get_chroma_client().get_collection(collection_name).add(
+        ids=ids, documents=[f"document {i}" for i in range(250)]
+    )
+    reports = []
+
+    def sender():
+        return lambda done, total: reports.append((done, total))
+
+    try:
+        with patch.object(server, "_progress_sender", sender):
+            await mcp.call_tool(
+                "chroma_update_documents",
+                {
+                    "collection_name": collection_name,
+                    "ids": ids,
+                    "documents": [f"updated {i}" for i in range(250)],
+                },
+            )
+        assert reports == [(100, 250), (200, 250), (250, 250)]
+        stored = get_chroma_client().get_collection(collection_name).get(ids=["u249"])
+        assert stored["documents"] == ["updated 249"]
+    finally:
+        await mcp.call_tool("chroma_delete_collection", {"collection_name": collection_name})
+
+
+# --- Tests for exact search ---
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("space", ["cosine", "l2", "ip"])
+async def test_exact_search_matches_hnsw_on_small_collection(space):
+    """Test that exact search finds neighbors as near as HNSW's on a small collection."""
+    from chroma_mcp import server
+
+    collection_name = f"test_exact_search_{space}"
+    await mcp.call_tool(
+        "chroma_create_collection", {"collection_name": collection_name, "space": space}
+    )
+    import random
+
+    words = "lease sale loan court notice appeal bond order motion trust deed lien".split()
+    rng = random.Random(7)
+    documents = [" ".join(rng.sample(words, 4)) for _ in range(30)]
+    get_chroma_client().get_collection(collection_name).add(
+        ids=[f"e{i}" for i in range(len(documents))],
+        documents=documents,
+        metadatas=[{"part": i % 2} for i in range(len(documents))],
+    )
+    query = {
+        "collection_name": collection_name,
+        "query_texts": ["lease agreement", "loan"],
+        "n_results": 4,
+    }
+    server._exact_matrices.clear()
+    try:
+        hnsw_query = {**query, "exact": False}
+        hnsw = json.loads((await mcp.call_tool("chroma_query_documents", hnsw_query))[0].text)
+        exact = json.loads((await mcp.call_tool("chroma_query_documents", query))[0].text)
+        # Bag-of-words hash embeddings tie often, so compare distances rather than ids
+        for exact_distances, hnsw_distances in zip(
+            exact["distances"], hnsw["distances"], strict=True
+        ):
+            assert exact_distances == pytest.approx(hnsw_distances, rel=1e-4, abs=1e-4)
+        assert server._exact_matrices.stats()["misses"] == 1
+
+        filtered = json.loads(
+            (await mcp.call_tool("chroma_query_documents", {**query, "where": {"part": 1}}))[0].text
+        )
+        assert all(meta["part"] == 1 for metas in filtered["metadatas"] for meta in metas)
+        # The filter is applied to the matrix already in memory
+        stats = server._exact_matrices.stats()
+        assert (stats["hits"], stats["misses"], stats["rows"]) == (1, 1, 30)
+    finally:
+        await mcp.call_tool("chroma_delete_collection", {"collection_name": collection_name})
+
+
+@pytest.mark.asyncio
+async def test_exact_search_reloads_after_write_and_follows_threshold():
+    """Test that a write invalidates the matrix and collections over the threshold use HNSW."""
+    from chroma_mcp import server
+
+    collection_name = "test_exact_search_threshold"
+    await mcp.call_tool("chroma_create_collection", {"collection_name": collection_name})
+    get_chroma_client().get_collection(collection_name).add(
+        ids=["t1", "t2", "t3"], documents=["notice of appeal", "motion to dismiss", "appeal bond"]
+    )
+    query = {"collection_name": collection_name, "query_texts": ["appeal"], "n_results": 2}
+    server._exact_matrices.clear()
+    try:
+        await mcp.call_tool("chroma_query_documents", query)
+        await mcp.call_tool(
+            "chroma_update_documents",
+            {
+                "collection_name": collection_name,
+                "ids": ["t2"],
+                "documents": ["appeal of the order"],
+            },
+        )
+        await mcp.call_tool("chroma_query_documents", query)
+        assert server._exact_matrices.stats()["misses"] == 2
+
+        server.configure_exact_search(2)
+        explained = json.loads(
+            (await mcp.call_tool("chroma_query_documents", {**query, "explain": True}))[0].text
+        )
+        assert explained["explain"]["mode"] == "vector"
+        forced_query = {**query, "exact": True, "explain": True}
+        forced = json.loads((await mcp.call_tool("chroma_query_documents", forced_query))[0].text)
+        assert forced["explain"]["mode"] == "exact"
+        assert forced["explain"]["candidates"]["exact_rows"] == 3
+        assert forced["ids"] == explained["ids"]
+
+        with pytest.raises(ToolError, match="can't be combined with hybrid"):
+            await mcp.call_tool("chroma_query_documents", {**query, "exact": True, "hybrid": True})
+    finally:
+        server.configure_exact_search(server.DEFAULT_EXACT_SEARCH_MAX_ROWS)
+        await mcp.call_tool("chroma_delete_collection", {"collection_name": collection_name})
@@ -0,0 +1,209 @@
+import os
+
+from chroma_mcp import sidecar
+
+
+def test_generation_starts_at_zero(tmp_path):
+    assert sidecar.get_generation(str(tmp_path), "missing") == 0
+    # Reading never creates the sidecar database
+    assert not os.path.exists(sidecar.get_sidecar_path(str(tmp_path)))
+
+
+def test_bump_generation_is_shared_on_disk(tmp_path):
+    data_dir = str(tmp_path)
+    assert sidecar.bump_generation(data_dir, "coll-1") == 1
+    assert sidecar.bump_generation(data_dir, "coll-1") == 2
+    assert sidecar.bump_generation(data_dir, "coll-2") == 1
+
+    # A fresh connection (as from another process) sees the same stamps
+    assert sidecar.get_generation(data_dir, "coll-1") == 2
+    assert sidecar.get_generation(data_dir, "coll-2") == 1
+
+
+def test_in_memory_generations():
+    before = sidecar.get_generation(None, "memory-coll")
+    assert sidecar.bump_generation(None, "memory-coll") == before + 1
+    assert sidecar.get_generation(None, "memory-coll") == before + 1
+
+
+def test_lexical_index_maintenance(tmp_path):
+    data_dir = str(tmp_path)
+    sidecar.index_chunks(
+        data_dir, "coll-1", ["a", "b", "c"],
+        ["Docket 24-cv-1187 filed", "motion to dismiss", "order on the motion"],
+    )
+    assert sidecar.indexed_count(data_dir, "coll-1") == 3
+    assert [cid for cid, _ in sidecar.lexical_search(data_dir, "coll-1", "24-cv-1187", 5)] == ["a"]
+    assert {cid for cid, _ in sidecar.lexical_search(data_dir, "coll-1", "motion", 5)} == {"b", "c"}
+
+    # Upserts replace text, and a None document removes the chunk
+    sidecar.index_chunks(data_dir, "coll-1", ["b", "c"], ["summary judgment", None])
+    assert sidecar.lexical_search(data_dir, "coll-1", "motion", 5) == []
+    assert sidecar.indexed_count(data_dir, "coll-1") == 2
+
+    sidecar.copy_collection(data_dir, "coll-1", "coll-2")
+    sidecar.remove_chunks(data_dir, "coll-1", ["a"])
+    assert sidecar.lexical_search(data_dir, "coll-1", "docket", 5) == []
+    assert [cid for cid, _ in sidecar.lexical_search(data_dir, "coll-2", "docket", 5)] == ["a"]
+
+    sidecar.drop_collection(data_dir, "coll-2")
+    assert sidecar.indexed_count(data_dir, "coll-2") == 0
+
+
+def test_fts_query_quotes_terms():
+    assert sidecar.fts_query('NEAR("x") OR -y*') == '"near" OR "x" OR "or" OR "y"'
+    assert sidecar.fts_query("  ...  ") is None
+
+
+def test_substring_candidates(tmp_path):
+    data_dir = str(tmp_path)
+    sidecar.index_chunks(
+        data_dir, "coll-1", ["a", "b", "c"],
+        ['Exhibit "A" attached', "exhibit b attached", "see Exhibit C"],
+    )
+    # Case-sensitive like $contains, and quotes in the substring are safe
+    assert sidecar.substring_candidates(data_dir, "coll-1", ["Exhibit"]) == {"a", "c"}
+    assert sidecar.substring_candidates(data_dir, "coll-1", ['"A"']) == {"a"}
+    assert sidecar.substring_candidates(data_dir, "coll-1", ["Exhibit", "attached"]) == {"a"}
+    assert sidecar.substring_candidates(data_dir, "coll-2", ["Exhibit"]) == set()
+    # Asked for a generation the index isn't current at, it has no answer
+    assert sidecar.substring_candidates(data_dir, "coll-1", ["Exhibit"], generation=0) is None
+
+
+def _chunk_metadata(source, index, chars, sha="abc123"):
+    return {
+        "source": source,
+        "filename": os.path.basename(source),
+        "chunk_index": index,
+        "char_count": chars,
+        "sha256": sha,
+        "page_count": 4,
+    }
+
+
+def test_document_manifest(tmp_path):
+    data_dir = str(tmp_path)
+    sidecar.record_chunks(
+        data_dir, "coll-1", ["b1", "a0", "a1"],
+        [
+            _chunk_metadata("/docs/b.pdf", 1, 50, sha="bbb"),
+            _chunk_metadata("/docs/a.pdf", 0, 100),
+            _chunk_metadata("/docs/a.pdf", 1, 20),
+        ],
+    )
+    # Recording a chunk again replaces it rather than counting it twice
+    sidecar.record_chunks(data_dir, "coll-1", ["a1"], [_chunk_metadata("/docs/a.pdf", 1, 30)])
+
+    documents = sidecar.list_documents(data_dir, "coll-1")
+    assert [doc["source"] for doc in documents] == ["/docs/a.pdf", "/docs/b.pdf"]
+    assert documents[0]["filename"] == "a.pdf"
+    first = documents[0]
+    assert (first["chunk_count"], first["total_chars"], first["page_count"]) == (2, 130, 4)
+    by_hash = sidecar.list_documents(data_dir, "coll-1", sha256="bbb")
+    assert [doc["source"] for doc in by_hash] == ["/docs/b.pdf"]
+    assert sidecar.document_chunk_ids(data_dir, "coll-1", "/docs/a.pdf") == ["a0", "a1"]
+
+    sidecar.remove_chunks(data_dir, "coll-1", ["a0"])
+    assert sidecar.list_documents(data_dir, "coll-1", source="/docs/a.pdf")[0]["chunk_count"] == 1
+    sidecar.remove_chunks(data_dir, "coll-1", ["a1"])
+    assert [doc["source"] for doc in sidecar.list_documents(data_dir, "coll-1")] == ["/docs/b.pdf"]
+    assert sidecar.manifest_count(data_dir, "coll-1") == 1
+
+
+class _FakeCollection:
+    """Just enough of a chromadb Collection for rebuilding the sidecar."""
+
+    def __init__(self, collection_id, ids, documents, metadatas):
+        self.id = collection_id
+        self.rows = list(zip(ids, documents, metadatas, strict=True))
+
+    def count(self):
+        return len(self.rows)
+
+    def get(self, include, limit, offset):
+        page = self.rows[offset:offset + limit]
+        return {
+            "ids": [row[0] for row in page],
+            "documents": [row[1] for row in page] if "documents" in include else None,
+            "metadatas": [row[2] for row in page] if "metadatas" in include else None,
+        }
+
+
+def test_ensure_manifest_backfills(tmp_path):
+    data_dir = str(tmp_path)
+    collection = _FakeCollection(
+        "coll-1", ["x0", "x1", "y0"], ["one", "two", "three"],
+        [_chunk_metadata("/x.pdf", 0, 3), _chunk_metadata("/x.pdf", 1, 3), None],
+    )
+    assert sidecar.ensure_manifest(data_dir, collection) is True
+    assert sidecar.ensure_manifest(data_dir, collection) is False
+    # The chunk without a source is tracked but belongs to no document
+    assert sidecar.manifest_count(data_dir, "coll-1") == 3
+    documents = sidecar.list_documents(data_dir, "coll-1")
+    assert [(doc["source"], doc["chunk_count"]) for doc in documents] == [("/x.pdf", 2)]
+    # Rebuilding the manifest leaves the text index alone
+    assert sidecar.indexed_count(data_dir, "coll-1") == 0
+
+
+def test_text_index_generation_follows_writes(tmp_path):
+    data_dir = str(tmp_path)
+    collection = _FakeCollection("coll-1", ["a", "b"], ["motion to dismiss", None], [None, None])
+    assert sidecar.text_index_generation(data_dir, "coll-1") is None
+
+    sidecar.bump_generation(data_dir, "coll-1")
+    assert sidecar.rebuild_collection(data_dir, collection, manifest=False) == 2
+    # Chunks without text aren't indexed, but the index is still current
+    assert sidecar.indexed_count(data_dir, "coll-1") == 1
+    assert sidecar.text_index_generation(data_dir, "coll-1") == 1
+
+    # A write that kept the index in step leaves it current; one that didn't makes it stale
+    sidecar.bump_generation(data_dir, "coll-1", indexed=True)
+    assert sidecar.text_index_generation(data_dir, "coll-1") == 2
+    sidecar.bump_generation(data_dir, "coll-1")
+    assert sidecar.text_index_generation(data_dir, "coll-1") is None
+    sidecar.bump_generation(data_dir, "coll-1", indexed=True)
+    assert sidecar.text_index_generation(data_dir, "coll-1") is None
+
+    sidecar.drop_collection(data_dir, "coll-1")
+    assert sidecar.text_index_generation(data_dir, "coll-1") is None
+
+
+def test_rebuild_swaps_rows_in_at_once(tmp_path, monkeypatch):
+    import threading
+
+    data_dir = str(tmp_path)
+    monkeypatch.setattr(sidecar, "REBUILD_BATCH_SIZE", 2)
+    sidecar.index_chunks(data_dir, "coll-1", ["old"], ["stale text"])
+    collection = _FakeCollection(
+        "coll-1", ["a", "b", "c"], ["one", "two", "three"],
+        [_chunk_metadata("/x.pdf", i, 3) for i in range(3)],
+    )
+    paused, resume = threading.Event(), threading.Event()
+    read_page = collection.get
+
+    def get(include, limit, offset):
+        if offset:
+            paused.set()
+            resume.wait(5)
+        return read_page(include, limit, offset)
+
+    collection.get = get
+    rebuild = threading.Thread(target=sidecar.rebuild_collection, args=(data_dir, collection))
+    rebuild.start()
+    try:
+        assert paused.wait(5)
+        # Halfway through reading Chroma, other connections still see the old rows
+        assert sidecar.indexed_count(data_dir, "coll-1") == 1
+        assert sidecar.manifest_count(data_dir, "coll-1") == 0
+        # A second rebuild of the same collection waits for the first
+        second = threading.Thread(target=sidecar.rebuild_collection, args=(data_dir, collection))
+        second.start()
+        second.join(0.2)
+        assert second.is_alive()
+    finally:
+        resume.set()
+        rebuild.join(5)
+    second.join(5)
+    assert sidecar.indexed_count(data_dir, "coll-1") == 3
+    assert sidecar.manifest_count(data_dir, "coll-1") == 3
+    assert sidecar.substring_candidates(data_dir, "coll-1", ["two"]) == {"b"}